@@ -0,0 +1,111 @@
+# auth_cache.py
+#
+# Validated bearer tokens → user records, so an authenticated request costs a
+# dictionary lookup instead of a JWT decode plus a users query. Entries live
+# TOKEN_CACHE_TTL seconds (never past the token's own exp) in an LRU of at
+# most TOKEN_CACHE_SIZE tokens. Any ORM update or delete of a user drops that
+# user's tokens, so a change or deactivation takes effect on the next request
+# served by the same process; see TOKEN_CACHE_TTL for everywhere else.
+#
+# The cache keeps detached copies of the user's columns; get() merges one
+# into the request's session without loading, so callers get an ordinary
+# persistent User.
+
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+import models
+
+# The ORM listeners below only see changes made through this process. A user
+# deactivated by another uvicorn worker, or directly in the database, keeps
+# authenticating here until their entry expires, so this TTL bounds how long a
+# revoked account stays usable: keep it short.
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "15"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+_lock = threading.Lock()
+_entries: "OrderedDict[str, tuple]" = OrderedDict()   # token → (user copy, expires_at)
+_tokens_of = defaultdict(set)                         # user id → its cached tokens
+_stats = {"hits": 0, "misses": 0, "expired": 0, "invalidated": 0}
+
+
+def _detached_copy(user: models.User) -> models.User:
+    copy = models.User(**{c.key: getattr(user, c.key) for c in models.User.__table__.columns})
+    make_transient_to_detached(copy)
+    return copy
+
+
+def _drop(token: str) -> None:
+    user, _ = _entries.pop(token)
+    tokens = _tokens_of[user.id]
+    tokens.discard(token)
+    if not tokens:
+        del _tokens_of[user.id]
+
+
+async def get(db: AsyncSession, token: str) -> Optional[models.User]:
+    """The cached user for a token, attached to `db`, or None on a miss."""
+    with _lock:
+        entry = _entries.get(token)
+        if entry is None:
+            _stats["misses"] += 1
+            return None
+        user, expires_at = entry
+        if expires_at <= time.time():
+            _drop(token)
+            _stats["expired"] += 1
+            _stats["misses"] += 1
+            return None
+        _entries.move_to_end(token)
+        _stats["hits"] += 1
+    return await db.merge(user, load=False)
+
+
+def put(token: str, user: models.User, token_exp: Optional[float] = None) -> None:
+    expires_at = time.time() + TOKEN_CACHE_TTL
+    if token_exp is not None:
+        expires_at = min(expires_at, token_exp)
+    copy = _detached_copy(user)
+    with _lock:
+        if token in _entries:
+            _drop(token)
+        _entries[token] = (copy, expires_at)
+        _tokens_of[user.id].add(token)
+        while len(_entries) > TOKEN_CACHE_SIZE:
+            _drop(next(iter(_entries)))
+
+
+def invalidate_user(user_id: int) -> None:
+    with _lock:
+        for token in list(_tokens_of.get(user_id, ())):
+            _drop(token)
+            _stats["invalidated"] += 1
+
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
+        _tokens_of.clear()
+
+
+def stats() -> dict:
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {
+            **_stats,
+            "size": len(_entries),
+            "hit_rate": round(_stats["hits"] / lookups, 4) if lookups else None,
+        }
+
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _user_changed(mapper, connection, target) -> None:
+    invalidate_user(target.id)
@@ -1,5 +1,8 @@
 from loadenv import Settings
+import os
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 # SQLALCHEMY_DATABASE_URL = "sqlite:///./database.db"
@@ -7,11 +10,59 @@ from sqlalchemy.ext.declarative import declarative_base
 
 settings = Settings()
 
+# Connection pool sizing, per engine (the sync engine serves the threadpool
+# endpoints and the ingest workers, the async one the async endpoints).
+# Recycle below MySQL's wait_timeout so idle connections are never stale.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# sync driver → its asyncio counterpart (aiomysql in production, aiosqlite in tests)
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "mysql+mysqldb": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+
+def async_url(url: str):
+    """The DATABASE_URI with its driver swapped for the asyncio one."""
+    url = make_url(url)
+    if url.drivername not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for '{url.drivername}'")
+    return url.set(drivername=ASYNC_DRIVERS[url.drivername])
+
+
+def pool_args(url: str) -> dict:
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}   # SQLite's default pools don't take QueuePool sizing
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+
+
 # NEW (for MySQL)
 engine = create_engine(
     settings.DATABASE_URI,
     echo=True,        
-    pool_pre_ping=True
+    pool_pre_ping=True,
+    **pool_args(settings.DATABASE_URI),
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+async_engine = create_async_engine(
+    async_url(settings.DATABASE_URI),
+    pool_pre_ping=True,
+    **pool_args(settings.DATABASE_URI),
+)
+# no expiry on commit: attributes can't lazy-load under asyncio
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
\ No newline at end of file
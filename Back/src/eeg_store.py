@@ -0,0 +1,203 @@
+# eeg_store.py
+#
+# Columnar EEG storage. A session's samples are cut into blocks of
+# BLOCK_SAMPLES (10 s at 128 Hz); each block is one eeg_blocks row holding a
+# zlib-compressed, channel-major float32 array (float32 is what the old
+# eeg_data FLOAT columns kept). Reading a time range only fetches and
+# decompresses the blocks that overlap it. Sessions ingested before blocks
+# existed are still read from eeg_data.
+#
+# Identical recordings are stored once: a session whose upload matched an
+# existing eeg_payloads fingerprint reads the blocks of the payload's owner.
+
+import zlib
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+import models
+
+CHANNELS = [
+    "af3","f7","f3","fc5","t7","p7",
+    "o1","o2","p8","t8","fc6","f4","f8","af4"
+]
+FS = 128
+BLOCK_SAMPLES = 10 * FS
+N_CHANNELS = len(CHANNELS)
+
+
+def encode_block(arr: np.ndarray) -> bytes:
+    """[n, 14] samples → compressed channel-major float32 bytes."""
+    return zlib.compress(np.ascontiguousarray(arr.T, dtype="<f4").tobytes(), 6)
+
+
+def decode_block(blob: bytes, n_samples: int) -> np.ndarray:
+    """Inverse of encode_block, as a [n, 14] float64 array."""
+    flat = np.frombuffer(zlib.decompress(blob), dtype="<f4")
+    return flat.reshape(N_CHANNELS, n_samples).T.astype(np.float64)
+
+
+def fingerprint_update(hasher, arr: np.ndarray) -> None:
+    """Feed [n, 14] samples to a hash as little-endian float32 rows (the stored precision)."""
+    hasher.update(np.ascontiguousarray(arr, dtype="<f4").tobytes())
+
+
+def data_session_id(db: Session, session_id: int) -> int:
+    """The session whose blocks hold this session's samples."""
+    owner = db.execute(
+        select(models.EegPayload.owner_session_id)
+        .join(models.Session, models.Session.eeg_payload_id == models.EegPayload.id)
+        .where(models.Session.id == session_id)
+    ).scalar_one_or_none()
+    return owner if owner is not None else session_id
+
+
+def stored_samples(db: Session, session_id: int) -> int:
+    return db.execute(
+        select(func.coalesce(func.sum(models.EegBlock.n_samples), 0))
+        .where(models.EegBlock.session_id == session_id)
+    ).scalar_one()
+
+
+def has_eeg(db: Session, session_id: int) -> bool:
+    session_id = data_session_id(db, session_id)
+    for model in (models.EegBlock, models.EegData):
+        if db.execute(select(model.id).where(model.session_id == session_id).limit(1)).first():
+            return True
+    return False
+
+
+class BlockWriter:
+    """
+    Append samples to a session in arbitrary chunk sizes; full blocks are
+    inserted as soon as they fill up, the tail on close(). Nothing is
+    committed here, so a whole upload stays one transaction.
+    """
+
+    def __init__(self, db: Session, session_id: int):
+        self.db = db
+        self.session_id = session_id
+        self.next_start = stored_samples(db, session_id)
+        self.pending = np.empty((0, N_CHANNELS))
+        self.written = 0
+
+    def append(self, arr: np.ndarray) -> None:
+        buf = np.concatenate([self.pending, arr]) if self.pending.size else arr
+        n_full = buf.shape[0] // BLOCK_SAMPLES * BLOCK_SAMPLES
+        self._insert(buf[:n_full])
+        self.pending = buf[n_full:]
+
+    def close(self) -> int:
+        self._insert(self.pending)
+        self.pending = np.empty((0, N_CHANNELS))
+        return self.written
+
+    def _insert(self, arr: np.ndarray) -> None:
+        if arr.shape[0] == 0:
+            return
+        rows = []
+        for lo in range(0, arr.shape[0], BLOCK_SAMPLES):
+            block = arr[lo:lo + BLOCK_SAMPLES]
+            rows.append({
+                "session_id":   self.session_id,
+                "start_sample": self.next_start,
+                "n_samples":    block.shape[0],
+                "data":         encode_block(block),
+            })
+            self.next_start += block.shape[0]
+        self.db.execute(insert(models.EegBlock), rows)
+        self.written += arr.shape[0]
+
+
+def read_range(
+    db: Session,
+    session_id: int,
+    start: int = 0,
+    stop: Optional[int] = None,
+) -> np.ndarray:
+    """Samples [start, stop) of a session as a [n, 14] float64 array."""
+    session_id = data_session_id(db, session_id)
+    B = models.EegBlock
+    stmt = (
+        select(B.start_sample, B.n_samples, B.data)
+        .where(
+            B.session_id == session_id,
+            # blocks are never longer than BLOCK_SAMPLES: keeps the range on the index
+            B.start_sample > start - BLOCK_SAMPLES,
+            B.start_sample + B.n_samples > start,
+        )
+        .order_by(B.start_sample)
+    )
+    if stop is not None:
+        stmt = stmt.where(B.start_sample < stop)
+    parts, first = [], None
+    for block_start, n, blob in db.execute(stmt):
+        if first is None:
+            first = block_start
+        parts.append(decode_block(blob, n))
+    if not parts:
+        return _read_rows(db, session_id, start, stop)
+    arr = np.concatenate(parts)
+    lo = start - first
+    hi = None if stop is None else stop - first
+    return arr[lo:hi]
+
+
+def _read_rows(db: Session, session_id: int, start: int, stop: Optional[int]) -> np.ndarray:
+    """Fallback for sessions stored one eeg_data row per sample."""
+    stmt = (
+        select(*[getattr(models.EegData, ch) for ch in CHANNELS])
+        .where(models.EegData.session_id == session_id)
+        .order_by(models.EegData.id)
+    )
+    if start:
+        stmt = stmt.offset(start)
+    if stop is not None:
+        stmt = stmt.limit(max(stop - start, 0))
+    return np.array(db.execute(stmt).all(), dtype=np.float64).reshape(-1, N_CHANNELS)
+
+
+def rows_to_blocks(db: Session, session_id: int) -> int:
+    """
+    Rewrite a session's legacy eeg_data rows as blocks (not committed), so
+    samples appended later follow them. Returns the number of samples moved.
+    """
+    B = models.EegBlock
+    if db.execute(select(B.id).where(B.session_id == session_id).limit(1)).first():
+        return 0
+    writer = BlockWriter(db, session_id)
+    start = 0
+    while True:
+        arr = _read_rows(db, session_id, start, start + 100 * BLOCK_SAMPLES)
+        if arr.shape[0] == 0:
+            break
+        writer.append(arr)
+        start += arr.shape[0]
+    writer.close()
+    db.execute(delete(models.EegData).where(models.EegData.session_id == session_id))
+    return start
+
+
+def sample_count_expr():
+    """
+    Correlated subqueries for a session's sample count: its shared payload's
+    size, else its own blocks + legacy rows.
+    """
+    shared = (
+        select(models.EegPayload.n_samples)
+        .where(models.EegPayload.id == models.Session.eeg_payload_id)
+        .scalar_subquery()
+    )
+    blocks = (
+        select(func.coalesce(func.sum(models.EegBlock.n_samples), 0))
+        .where(models.EegBlock.session_id == models.Session.id)
+        .scalar_subquery()
+    )
+    rows = (
+        select(func.count(models.EegData.id))
+        .where(models.EegData.session_id == models.Session.id)
+        .scalar_subquery()
+    )
+    return func.coalesce(shared, blocks + rows)
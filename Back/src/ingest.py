@@ -0,0 +1,216 @@
+# ingest.py
+#
+# EEG CSV ingestion, in two passes so memory stays bounded whatever the
+# recording length. The first parses the upload CHUNK_ROWS rows at a time,
+# validates each chunk on whole columns, fingerprints the samples, fills the
+# session's summary row (session_summary) and spills them as float32 to a
+# temp file. If the fingerprint matches a stored recording, nothing is
+# written: the session just references that payload. Otherwise the second
+# pass appends the spilled samples to the session's compressed blocks
+# (eeg_store). Everything is one transaction.
+#
+# Uploading to a session that already has EEG appends to it. Only a first
+# upload is deduplicated: before appending, the session is given its own
+# copy of any payload it shares (see _make_own), so shared samples never
+# change under the other sessions.
+
+import hashlib
+import tempfile
+import time
+from typing import BinaryIO, Dict, Iterator
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert, literal, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import eeg_store
+import models
+import session_summary
+
+REQUIRED = eeg_store.CHANNELS
+CHUNK_ROWS = 50_000   # rows parsed at a time when streaming
+
+
+class IngestError(ValueError):
+    """The upload is not a usable 14-channel EEG table."""
+
+
+def frame_to_array(df: pd.DataFrame) -> np.ndarray:
+    """
+    Pick the 14 EEG channels out of a parsed CSV (with or without a header
+    row) and return them as a [n_samples, 14] float64 array.
+    """
+    # if the first column is numeric we probably have NO header
+    if list(df.columns) == list(range(len(df.columns))):
+        if len(df.columns) != 14:
+            raise IngestError("CSV must have 14 EEG columns")
+        df.columns = REQUIRED
+    else:
+        # normal case: check that all required names are present (case-insensitive)
+        df.columns = df.columns.str.lower()
+        if not set(REQUIRED).issubset(df.columns):
+            raise IngestError("CSV missing EEG columns")
+
+    try:
+        arr = df[REQUIRED].to_numpy(dtype=np.float64)
+    except (TypeError, ValueError):
+        bad = [c for c in REQUIRED if not pd.api.types.is_numeric_dtype(df[c])]
+        raise IngestError(f"Non-numeric values in EEG columns {bad}")
+    finite = np.isfinite(arr).all(axis=1)
+    if not finite.all():
+        first = int(np.argmin(finite))
+        raise IngestError(f"{int((~finite).sum())} rows have missing or non-finite values (first at row {first})")
+    return arr
+
+
+def _has_header(fileobj: BinaryIO) -> bool:
+    """Peek at the first line: a header starts with a channel name, data with a number."""
+    pos = fileobj.tell()
+    first = fileobj.readline().split(b",")[0].strip().strip(b'"')
+    fileobj.seek(pos)
+    try:
+        float(first)
+    except ValueError:
+        return True
+    return False
+
+
+def _find_payload(db: Session, fingerprint: str):
+    return db.query(models.EegPayload).filter(models.EegPayload.fingerprint == fingerprint).first()
+
+
+def _claim_payload(db: Session, session_id: int, fingerprint: str, n_samples: int) -> bool:
+    """
+    Register the blocks just written as the payload with this fingerprint.
+    Returns True if a concurrent upload of the same recording registered it
+    first; the blocks are then rolled back and the session shares that one.
+    """
+    payload = models.EegPayload(fingerprint=fingerprint, owner_session_id=session_id, n_samples=n_samples)
+    db.add(payload)
+    try:
+        db.flush()
+        shared = False
+    except IntegrityError:
+        db.rollback()
+        payload, shared = _find_payload(db, fingerprint), True
+    db.get(models.Session, session_id).eeg_payload_id = payload.id
+    return shared
+
+
+def _parse(fileobj: BinaryIO, spill, hasher, summary: session_summary.SummaryBuilder) -> int:
+    """
+    First pass: parse and validate the CSV CHUNK_ROWS rows at a time, feed
+    the fingerprint and the summary, and spill the samples to `spill` as
+    float32 rows (the stored precision). Returns the number of samples.
+    """
+    header = 0 if _has_header(fileobj) else None
+    parsed = 0
+    for df in pd.read_csv(fileobj, header=header, chunksize=CHUNK_ROWS):
+        try:
+            arr = frame_to_array(df)
+        except IngestError as e:
+            raise IngestError(f"{e} (in rows {parsed}-{parsed + len(df) - 1})")
+        eeg_store.fingerprint_update(hasher, arr)
+        summary.update(arr)
+        spill.write(np.ascontiguousarray(arr, dtype="<f4").tobytes())
+        parsed += arr.shape[0]
+    return parsed
+
+
+def _spilled(spill) -> Iterator[np.ndarray]:
+    """The samples _parse spilled, CHUNK_ROWS rows at a time."""
+    spill.seek(0)
+    row_bytes = eeg_store.N_CHANNELS * 4
+    while True:
+        buf = spill.read(CHUNK_ROWS * row_bytes)
+        if not buf:
+            return
+        yield np.frombuffer(buf, dtype="<f4").reshape(-1, eeg_store.N_CHANNELS).astype(np.float64)
+
+
+def _copy_blocks(db: Session, from_session: int, to_session: int) -> None:
+    B = models.EegBlock
+    db.execute(insert(B).from_select(
+        ["session_id", "start_sample", "n_samples", "data"],
+        select(literal(to_session), B.start_sample, B.n_samples, B.data).where(B.session_id == from_session),
+    ))
+
+
+def _make_own(db: Session, session_id: int) -> None:
+    """
+    Give a session that is about to be appended to sole ownership of its
+    samples. A session reading another's payload gets a copy of the owner's
+    blocks; a payload owner hands the payload (and a copy of its blocks) to
+    the next session sharing it, or drops it if there is none. Legacy
+    eeg_data rows are rewritten as blocks. Nothing is committed.
+    """
+    sess = db.get(models.Session, session_id)
+    payload = db.get(models.EegPayload, sess.eeg_payload_id) if sess and sess.eeg_payload_id else None
+    if payload is not None:
+        sess.eeg_payload_id = None
+        if payload.owner_session_id != session_id:
+            _copy_blocks(db, payload.owner_session_id, session_id)
+        else:
+            heir = db.execute(
+                select(models.Session.id)
+                .where(models.Session.eeg_payload_id == payload.id, models.Session.id != session_id)
+                .order_by(models.Session.id)
+                .limit(1)
+            ).scalar_one_or_none()
+            if heir is None:
+                db.delete(payload)
+            else:
+                _copy_blocks(db, session_id, heir)
+                payload.owner_session_id = heir
+        db.flush()
+    eeg_store.rows_to_blocks(db, session_id)
+
+
+def ingest_stream(db: Session, session_id: int, fileobj: BinaryIO) -> Dict[str, float]:
+    """
+    Parse a CSV from a binary file and store it as blocks, in one
+    transaction. On a first upload, a recording that is already stored is
+    not written; the session references the existing payload instead. Later
+    uploads are appended after the session's samples.
+    """
+    start = time.perf_counter()
+    appending = eeg_store.has_eeg(db, session_id)
+    hasher = hashlib.sha256()
+    summary = session_summary.SummaryBuilder()
+    try:
+        if appending:
+            _make_own(db, session_id)
+            # the summary covers the whole session, not just this upload
+            session_summary.feed_stored(db, session_id, summary)
+        with tempfile.TemporaryFile() as spill:
+            inserted = _parse(fileobj, spill, hasher, summary)
+            if inserted == 0:
+                raise IngestError("CSV has no samples")
+            fingerprint = None if appending else hasher.hexdigest()
+            payload = None if appending else _find_payload(db, fingerprint)
+            if payload is not None:
+                # a stored recording: nothing is written, the session shares it
+                db.get(models.Session, session_id).eeg_payload_id = payload.id
+                deduplicated = True
+            else:
+                writer = eeg_store.BlockWriter(db, session_id)
+                for arr in _spilled(spill):
+                    writer.append(arr)
+                writer.close()
+                deduplicated = not appending and _claim_payload(db, session_id, fingerprint, inserted)
+        session_summary.store(db, session_id, summary)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    elapsed = time.perf_counter() - start
+    return {
+        "inserted": inserted,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(inserted / elapsed) if elapsed > 0 else None,
+        "fingerprint": fingerprint,
+        "deduplicated": deduplicated,
+        "appended": appending,
+    }
@@ -0,0 +1,150 @@
+# ingest_worker.py
+#
+# Background ingestion. An upload is moved into INGEST_SPOOL_DIR, recorded as
+# an eeg_uploads row in status "queued", and parsed + stored by a small
+# thread pool, so the HTTP request returns straight away. Status goes
+# queued → parsing → stored (or failed, with the error); uploads of different
+# sessions are ingested concurrently, uploads of the same session one after
+# the other so their blocks stay in order. Spooled uploads that were still
+# pending at shutdown are picked up again by start().
+
+import os
+import shutil
+import threading
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Optional
+
+import pandas as pd
+
+import ingest
+import models
+import request_cache
+from database import SessionLocal
+
+INGEST_SPOOL_DIR = os.getenv(
+    "INGEST_SPOOL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "ingest_spool")
+)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_session_locks = defaultdict(threading.Lock)
+
+
+def _spool_path(upload_id: int) -> str:
+    return os.path.join(INGEST_SPOOL_DIR, f"upload_{upload_id}.csv")
+
+
+def _set(db, upload: models.EegUpload, **fields) -> None:
+    for key, value in fields.items():
+        setattr(upload, key, value)
+    db.commit()
+
+
+def _run(upload_id: int) -> None:
+    db = SessionLocal()
+    try:
+        upload = db.get(models.EegUpload, upload_id)
+        if upload is None:
+            return
+        with _session_locks[upload.session_id]:
+            _set(db, upload, status="parsing")
+            try:
+                with open(_spool_path(upload_id), "rb") as fh:
+                    stats = ingest.ingest_stream(db, upload.session_id, fh)
+            except (ingest.IngestError, pd.errors.ParserError, OSError) as e:
+                _set(db, upload, status="failed", error=str(e)[:1024])
+                return
+            except Exception as e:
+                db.rollback()
+                _set(db, upload, status="failed", error=f"{type(e).__name__}: {e}"[:1024])
+                print(f"💥 ingestion of upload {upload_id} failed: {e}")
+                return
+            _set(db, upload, status="stored", rows=stats["inserted"])
+            # the session's size and summary changed in its owner's listings
+            request_cache.invalidate_blocking(
+                db.query(models.Patient.user_id)
+                .join(models.Session, models.Session.patient_id == models.Patient.id)
+                .filter(models.Session.id == upload.session_id)
+                .scalar()
+            )
+            print(f"📦 session {upload.session_id}: {stats['inserted']} rows in {stats['seconds']}s "
+                  f"({stats['rows_per_second']} rows/s)"
+                  + (f", same recording as payload {stats['fingerprint'][:12]}" if stats["deduplicated"] else ""))
+    finally:
+        db.close()
+        try:
+            os.unlink(_spool_path(upload_id))
+        except FileNotFoundError:
+            pass
+
+
+def spool(src: BinaryIO) -> str:
+    """Copy `src` into the spool directory; returns the path for submit_file()."""
+    os.makedirs(INGEST_SPOOL_DIR, exist_ok=True)
+    tmp = os.path.join(INGEST_SPOOL_DIR, f".{uuid.uuid4().hex}.part")
+    with open(tmp, "wb") as fh:
+        shutil.copyfileobj(src, fh, 1024 * 1024)
+    return tmp
+
+
+def submit(db, session_id: int, src: BinaryIO, filename: Optional[str] = None) -> models.EegUpload:
+    """Spool `src` to disk, record it as queued and hand it to the worker pool."""
+    return submit_file(db, session_id, spool(src), filename)
+
+
+def submit_file(db, session_id: int, path: str, filename: Optional[str] = None) -> models.EegUpload:
+    """Like submit(), but takes ownership of a file already on local disk."""
+    upload = models.EegUpload(session_id=session_id, filename=filename, status="queued")
+    db.add(upload)
+    db.commit()
+    db.refresh(upload)
+    os.makedirs(INGEST_SPOOL_DIR, exist_ok=True)
+    shutil.move(path, _spool_path(upload.id))
+    _executor.submit(_run, upload.id)
+    return upload
+
+
+def start() -> None:
+    global _executor
+    if _executor is not None:
+        return
+    _executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+    db = SessionLocal()
+    try:
+        pending = (
+            db.query(models.EegUpload)
+            .filter(models.EegUpload.status.in_(("queued", "parsing")))
+            .order_by(models.EegUpload.id)
+            .all()
+        )
+        for upload in pending:
+            if os.path.exists(_spool_path(upload.id)):
+                upload.status = "queued"
+                _executor.submit(_run, upload.id)
+            else:
+                upload.status, upload.error = "failed", "spooled file lost before ingestion"
+        db.commit()
+    finally:
+        db.close()
+
+
+def stop() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def as_dict(upload: models.EegUpload) -> dict:
+    return {
+        "upload_id": upload.id,
+        "session_id": upload.session_id,
+        "filename": upload.filename,
+        "status": upload.status,
+        "rows": upload.rows,
+        "error": upload.error,
+        "created_at": upload.created_at,
+        "updated_at": upload.updated_at,
+    }
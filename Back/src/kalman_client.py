@@ -0,0 +1,189 @@
+# kalman_client.py
+#
+# Async client for the Kalman service (port 8001). One pooled httpx client is
+# shared by all requests; a semaphore caps how many variants of one analysis
+# are in flight at once, and results are yielded in completion order.
+# Runs come back as .npz (see the Kalman service's transport.py) instead of
+# multi-megabyte JSON; they are turned back into the JSON shape for the browser.
+
+import asyncio
+import io
+import json
+import os
+import time
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+KALMAN_URL = os.getenv("KALMAN_URL", "http://localhost:8001")
+KALMAN_TIMEOUT = float(os.getenv("KALMAN_TIMEOUT", "600"))          # seconds per variant
+KALMAN_CONCURRENCY = int(os.getenv("KALMAN_CONCURRENCY", "4"))      # variants in flight
+KALMAN_MAX_RETRIES = int(os.getenv("KALMAN_MAX_RETRIES", "2"))      # on 429 only
+MAX_RETRY_WAIT = 30.0
+# "1" asks the Kalman service for a deflated .npz (smaller, slightly more CPU)
+KALMAN_NPZ_COMPRESSED = os.getenv("KALMAN_NPZ_COMPRESSED", "0") == "1"
+
+NPZ_MEDIA_TYPE = "application/x-npz"
+RUN_ARRAYS = [
+    "y_all", "y_winningcomb", "y_nonwinning",
+    "amplitude_all", "amplitude_winning", "amplitude_nonwinning", "amplitude_original",
+]
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            base_url=KALMAN_URL,
+            headers={
+                "Accept": f"{NPZ_MEDIA_TYPE}; compressed=1" if KALMAN_NPZ_COMPRESSED
+                else f"{NPZ_MEDIA_TYPE}, application/json;q=0.5",
+            },
+            timeout=httpx.Timeout(KALMAN_TIMEOUT, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=2 * KALMAN_CONCURRENCY,
+                max_keepalive_connections=KALMAN_CONCURRENCY,
+            ),
+        )
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def decode_run_npz(raw: bytes) -> dict:
+    """Turn a /run-kalman .npz body back into the RunResponseWithId JSON shape."""
+    with np.load(io.BytesIO(raw), allow_pickle=False) as npz:
+        data = {name: npz[name].tolist() for name in RUN_ARRAYS}
+        data["welch"] = {
+            "frequencies": npz["welch_frequencies"].tolist(),
+            "power": {
+                key[len("welch_power_"):]: npz[key].tolist()
+                for key in npz.files if key.startswith("welch_power_")
+            },
+        }
+        data["session_run_id"] = int(npz["session_run_id"])
+        data["job_id"] = str(npz["job_id"]) if "job_id" in npz.files else None
+        data["partial"] = bool(npz["partial"]) if "partial" in npz.files else False
+        data["eeg_fingerprint"] = str(npz["eeg_fingerprint"]) if "eeg_fingerprint" in npz.files else None
+    return data
+
+
+async def _post_with_retry(client: httpx.AsyncClient, data: dict) -> httpx.Response:
+    """POST /run-kalman, waiting out 429 responses as told by Retry-After."""
+    for attempt in range(KALMAN_MAX_RETRIES + 1):
+        response = await client.post("/run-kalman", data=data)
+        if response.status_code != 429 or attempt == KALMAN_MAX_RETRIES:
+            return response
+        try:
+            wait = float(response.headers.get("Retry-After", "1"))
+        except ValueError:
+            wait = 1.0
+        print(f"⏳ Kalman service busy, retrying in {min(wait, MAX_RETRY_WAIT):.0f}s")
+        await asyncio.sleep(min(wait, MAX_RETRY_WAIT))
+    return response
+
+
+async def _cancel_job(client: httpx.AsyncClient, job_id: Optional[str]) -> None:
+    """Ask the Kalman service to stop a job we stopped waiting for, freeing its slot."""
+    if not job_id:
+        return
+    try:
+        await client.post(f"/jobs/{job_id}/cancel", timeout=10.0)
+    except httpx.HTTPError as e:
+        print(f"⚠️ Could not cancel Kalman job {job_id}: {e}")
+
+
+_cancellations = set()   # keeps fire-and-forget cancel requests alive
+
+
+async def run_model(
+    client: httpx.AsyncClient,
+    limit: asyncio.Semaphore,
+    model_name: str,
+    data: dict,
+) -> dict:
+    """Run one Kalman variant and return the per-model result entry."""
+    async with limit:
+        print(f"🧠 Running model: {model_name}")
+        start_time = time.time()
+        try:
+            response = await _post_with_retry(client, data)
+        except asyncio.CancelledError:
+            # the analysis was abandoned; don't leave the job computing
+            task = asyncio.create_task(_cancel_job(client, data.get("job_id")))
+            _cancellations.add(task)
+            task.add_done_callback(_cancellations.discard)
+            raise
+        except httpx.TimeoutException:
+            await _cancel_job(client, data.get("job_id"))
+            return {
+                "model": model_name,
+                "status": "failed",
+                "error": f"Timed out after {KALMAN_TIMEOUT:.0f}s",
+                "processing_time": time.time() - start_time,
+            }
+        except Exception as e:
+            print(f"💥 Exception for model {model_name}: {e}")
+            return {"model": model_name, "status": "failed", "error": str(e)}
+        processing_time = time.time() - start_time
+
+    print(f"📥 {model_name}: Kalman API response {response.status_code} in {processing_time:.2f}s")
+    if response.status_code != 200:
+        return {
+            "model": model_name,
+            "status": "failed",
+            "error": f"HTTP {response.status_code}: {response.text}",
+            "processing_time": processing_time,
+        }
+    try:
+        if response.headers.get("content-type", "").startswith(NPZ_MEDIA_TYPE):
+            response_data = decode_run_npz(response.content)
+        else:
+            response_data = response.json()
+    except (json.JSONDecodeError, ValueError, KeyError) as e:
+        return {
+            "model": model_name,
+            "status": "failed",
+            "error": f"Invalid response body: {e}",
+            "processing_time": processing_time,
+        }
+    return {
+        "model": model_name,
+        "status": "success",
+        "session_run_id": response_data.get("session_run_id"),
+        "processing_time": processing_time,
+        "data": response_data,
+    }
+
+
+async def run_models(
+    models_list: List[str],
+    data_for: Dict[str, dict],
+) -> AsyncIterator[dict]:
+    """
+    Dispatch every model concurrently (at most KALMAN_CONCURRENCY at a time)
+    and yield each result as soon as it completes. data_for maps a model
+    name to its form fields; the Kalman service loads the EEG of
+    data["session_id"] from the database itself. A run that times out or is
+    abandoned is cancelled on the Kalman service via its job_id.
+    """
+    client = get_client()
+    limit = asyncio.Semaphore(KALMAN_CONCURRENCY)
+    tasks = [
+        asyncio.create_task(run_model(client, limit, name, data_for[name]))
+        for name in models_list
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
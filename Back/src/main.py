@@ -6,26 +6,35 @@ import schemas
 import services
 import models
 import pandas as pd, io
-import requests
+import kalman_client
+import ingest_worker
+import eeg_store
+import session_summary
+import auth_cache
+import password_pool
+import request_cache
+import uploads
+from database import SessionLocal
 import json
-import tempfile
-import csv
 import os
-import time
+import uuid
 
-from typing import List
+from typing import List, Optional
 from loadenv import Settings
 from datetime import timedelta, datetime
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, status, UploadFile
 
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 from fastapi import UploadFile, File, Form, Depends, HTTPException
 from pydantic import BaseModel
 
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
-KALMAN_URL = os.getenv("KALMAN_URL", "http://localhost:8001")
 app = FastAPI()
 app.add_middleware(
     CORSMiddleware,
@@ -36,20 +45,50 @@ app.add_middleware(
 )
 
 services.create_database()
+
+@app.on_event("startup")
+def start_ingest_worker():
+    ingest_worker.start()
+    password_pool.start()
+
+@app.on_event("shutdown")
+async def close_kalman_client():
+    await kalman_client.close_client()
+    ingest_worker.stop()
+    password_pool.stop()
+
+
+@app.exception_handler(password_pool.PoolBusy)
+async def password_pool_busy(request: Request, exc: password_pool.PoolBusy):
+    return JSONResponse(
+        status_code=503, content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/loginApi")  # used by FastAPI's dependency later
 
+
+@app.get("/metrics")
+async def get_metrics():
+    """In-process counters: token cache hit rate, bcrypt pool latency."""
+    return {
+        "auth_cache": auth_cache.stats(),
+        "password_hashing": password_pool.stats(),
+        "request_cache": request_cache.stats(),
+    }
+
 @app.post("/users/", response_model=schemas.User)
-def create_user_endpoint(
+async def create_user_endpoint(
     user_in: schemas.UserCreate,
-    db: Session = Depends(services.get_db),
+    db: AsyncSession = Depends(services.get_async_db),
 ):
-    existing = services.get_user_by_email(db, user_in.email)
+    existing = await services.get_user_by_email(db, user_in.email)
     if existing:
         raise HTTPException(
             status_code=400,
             detail="The entered email is already in use"
         )
-    created_user = services.create_user(db=db, user=user_in)
+    created_user = await services.create_user(db=db, user=user_in)
     return created_user
 
 
@@ -75,24 +114,29 @@ def create_patient_for_user(
 
     # 3) Delegate to our service
     new_patient = services.create_patient(db, user_id, patient_in)
+    request_cache.invalidate_blocking(user_id)
     return new_patient
 
 
 @app.get("/users/{user_id}/patients", response_model=List[schemas.Patient], summary="Get all patients for a specific user")
-def read_patients_for_user(
+async def read_patients_for_user(
     user_id: int,
-    db: Session = Depends(services.get_db)
+    db: AsyncSession = Depends(services.get_async_db)
 ):
-    user_obj = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user_obj:
-        raise HTTPException(status_code=404, detail=f"User with id {user_id} not found")
+    async def load():
+        user_obj = await db.get(models.User, user_id)
+        if not user_obj:
+            raise HTTPException(status_code=404, detail=f"User with id {user_id} not found")
+
+        patients = (
+            await db.execute(select(models.Patient).where(models.Patient.user_id == user_id))
+        ).scalars().all()
+        return [schemas.Patient.model_validate(p).model_dump(mode="json") for p in patients]
 
-    patients = services.get_patients_by_user(db, user_id)
-    return patients
+    return await request_cache.cached(user_id, "patients", load)
 
 @app.get("/users/me", response_model=schemas.User)
-def get_current_user_endpoint(
-    db: Session = Depends(services.get_db),
+async def get_current_user_endpoint(
     current_user: models.User = Depends(services.get_current_user)
 ):
     """
@@ -102,16 +146,16 @@ def get_current_user_endpoint(
     return current_user
 
 @app.post("/loginApi", response_model=schemas.Token)
-def login_for_access_token(
+async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(services.get_db),
+    db: AsyncSession = Depends(services.get_async_db),
 ):
     """
     Accepts form-encoded fields: username (our email) and password.
     If authentication succeeds, returns a JWT access_token.
     """
     # form_data.username is the "username" field in the OAuth2 form; we'll treat that as email
-    user = services.authenticate_user(db, form_data.username, form_data.password)
+    user = await services.authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=401,
@@ -132,92 +176,221 @@ def login_for_access_token(
 class EegUploadMeta(BaseModel):
     session_id: int   # you can add more fields later
 
-REQUIRED = [
-    "af3","f7","f3","fc5","t7","p7",
-    "o1","o2","p8","t8","fc6","f4","f8","af4"
-]
-
-@app.post("/upload/csv")
+@app.post("/upload/csv", status_code=202)
 async def upload_csv(
     session_id: int = Form(...),
     file: UploadFile = File(...),
-    db: Session = Depends(services.get_db),
+    db: AsyncSession = Depends(services.get_async_db),
+    current_user: models.User = Depends(services.get_current_user),
+):
+    """
+    Queue a CSV for background ingestion and return immediately; follow it
+    with GET /sessions/{session_id}/uploads.
+    """
+    await _owned_session(db, session_id, current_user)
+    try:
+        path = await run_in_threadpool(ingest_worker.spool, file.file)
+    finally:
+        await file.close()
+    upload = await db.run_sync(ingest_worker.submit_file, session_id, path, file.filename)
+    await request_cache.invalidate(current_user.id)
+    return ingest_worker.as_dict(upload)
+
+
+@app.get("/sessions/{session_id}/uploads")
+async def get_session_uploads(
+    session_id: int,
+    db: AsyncSession = Depends(services.get_async_db),
+    current_user: models.User = Depends(services.get_current_user),
+):
+    """Ingestion status of every upload of a session, newest first."""
+    await _owned_session(db, session_id, current_user)
+    rows = (
+        await db.execute(
+            select(models.EegUpload)
+            .where(models.EegUpload.session_id == session_id)
+            .order_by(models.EegUpload.id.desc())
+        )
+    ).scalars().all()
+    return [ingest_worker.as_dict(u) for u in rows]
+
+
+def _backfill_summary(session_id: int) -> Optional[dict]:
+    with SessionLocal() as db:
+        summary = session_summary.backfill(db, session_id)
+        return session_summary.as_dict(summary) if summary is not None else None
+
+
+@app.get("/sessions/{session_id}/summary")
+async def get_session_summary(
+    session_id: int,
+    db: AsyncSession = Depends(services.get_async_db),
     current_user: models.User = Depends(services.get_current_user),
 ):
-    raw = await file.read()
-
-    # try reading with header first
-    df = pd.read_csv(io.BytesIO(raw))
-
-    # if the first column is numeric we probably have NO header
-    if list(df.columns) == list(range(len(df.columns))):
-        if len(df.columns) != 14:
-            raise HTTPException(400, "CSV must have 14 EEG columns")
-        df.columns = REQUIRED                      # slap the names on
-    else:
-        # normal case: check that all required names are present (case-insensitive)
-        df.columns = df.columns.str.lower()
-        if not set(REQUIRED).issubset(df.columns):
-            raise HTTPException(400, "CSV missing EEG columns")
-
-    rows = [
-        models.EegData(session_id=session_id, **row[REQUIRED].astype(float))
-        for _, row in df.iterrows()
-    ]
-    db.add_all(rows)
-    db.commit()
-    return {"inserted": len(rows)}
+    """Upload-time summary of a session's EEG (counts, channel stats, flat channels)."""
+    await _owned_session(db, session_id, current_user)
+    summary = await db.get(models.SessionSummary, session_id)
+    if summary is not None:
+        return session_summary.as_dict(summary)
+    # older sessions: summarise the stored samples once, off the event loop
+    summary = await run_in_threadpool(_backfill_summary, session_id)
+    if summary is None:
+        raise HTTPException(404, "No EEG data found for this session")
+    return summary
+
+
+# ────────────────────────────────────────────────────────────────────────────
+# Resumable chunked uploads (see uploads.py)
+# ────────────────────────────────────────────────────────────────────────────
+async def _owned_session(db: AsyncSession, session_id: int, user: models.User) -> None:
+    owned = (
+        await db.execute(
+            select(models.Session.id)
+            .join(models.Patient)
+            .where(models.Session.id == session_id, models.Patient.user_id == user.id)
+        )
+    ).first()
+    if not owned:
+        raise HTTPException(404, "Session not found")
+
+
+def _owned_upload(upload_id: str, user: models.User) -> dict:
+    state = uploads.get(upload_id)
+    if not state or state["user_id"] != user.id:
+        raise HTTPException(404, "Upload not found")
+    return state
+
+
+@app.post("/uploads")
+async def start_upload(
+    session_id: int = Form(...),
+    total_size: Optional[int] = Form(None),
+    db: AsyncSession = Depends(services.get_async_db),
+    current_user: models.User = Depends(services.get_current_user),
+):
+    await _owned_session(db, session_id, current_user)
+    return uploads.create(session_id, current_user.id, total_size)
+
+
+@app.get("/uploads/{upload_id}")
+def get_upload(
+    upload_id: str,
+    current_user: models.User = Depends(services.get_current_user),
+):
+    return _owned_upload(upload_id, current_user)
+
+
+@app.put("/uploads/{upload_id}")
+async def append_upload(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0),
+    current_user: models.User = Depends(services.get_current_user),
+):
+    """Append the raw request body at `offset`; 409 tells the client where to resume."""
+    _owned_upload(upload_id, current_user)
+    try:
+        new_offset = await uploads.append(upload_id, offset, request.stream())
+    except uploads.OffsetMismatch as e:
+        raise HTTPException(409, str(e), headers={"Upload-Offset": str(e.expected)})
+    except ValueError as e:
+        raise HTTPException(413, str(e))
+    except FileNotFoundError:
+        # completed or discarded while this request waited for the lock
+        raise HTTPException(404, "Upload not found")
+    return {"upload_id": upload_id, "offset": new_offset}
+
+
+def _submit_upload(upload_id: str, session_id: int) -> dict:
+    with SessionLocal() as db:
+        upload = ingest_worker.submit_file(db, session_id, uploads.part_path(upload_id))
+        uploads.discard(upload_id)
+        return ingest_worker.as_dict(upload)
+
+
+@app.post("/uploads/{upload_id}/complete", status_code=202)
+async def complete_upload(
+    upload_id: str,
+    offset: Optional[int] = Query(None, ge=0),
+    current_user: models.User = Depends(services.get_current_user),
+):
+    """
+    Queue the assembled upload for ingestion. The final size is checked
+    against total_size, or against `offset` when the upload was started
+    without one; a 409 tells the client where to resume.
+    """
+    _owned_upload(upload_id, current_user)
+    # no append may still be writing the part file while it is handed off
+    async with uploads.lock(upload_id):
+        state = await run_in_threadpool(_owned_upload, upload_id, current_user)
+        expected = state["total_size"] if state["total_size"] is not None else offset
+        if expected is None:
+            raise HTTPException(400, "Pass the final size as ?offset= for an upload without total_size")
+        if state["offset"] != expected:
+            raise HTTPException(
+                409, f"Upload has {state['offset']} of {expected} bytes",
+                headers={"Upload-Offset": str(state["offset"])},
+            )
+        return await run_in_threadpool(_submit_upload, upload_id, state["session_id"])
+
+
+def _format_size(eeg_count: int) -> str:
+    size_bytes = eeg_count * 14 * 8
+    if size_bytes < 1024:
+        return f"{size_bytes} B"
+    elif size_bytes < 1024 * 1024:
+        return f"{size_bytes // 1024} KB"
+    return f"{size_bytes // (1024 * 1024)} MB"
+
+
+def _format_session(row) -> dict:
+    return {
+        "id": str(row.id),
+        "name": f"Session {row.id} - {row.patient_name} {row.patient_father_surname}",
+        "description": f"EEG session for patient {row.patient_name}, recorded on {row.session_timestamp.strftime('%Y-%m-%d')}",
+        "size": _format_size(row.eeg_count),
+        "lastUpdated": row.session_timestamp.strftime('%Y-%m-%d %H:%M'),
+        "algorithm_name": row.algorithm_name or "",
+        "processing_time": float(row.processing_time or 0.0),
+        "duration_seconds": row.duration_seconds,
+        "flat_channels": row.flat_channels or [],
+    }
+
+
+def _set_next_cursor(response: Response, sessions: List[dict], limit: Optional[int]) -> None:
+    if limit and len(sessions) == limit:
+        response.headers["X-Next-Cursor"] = sessions[-1]["id"]
 
 
 @app.get("/sessions")
-def get_sessions_for_user(
-    db: Session = Depends(services.get_db),
+async def get_sessions_for_user(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    after: Optional[int] = None,
+    db: AsyncSession = Depends(services.get_async_db),
     current_user: models.User = Depends(services.get_current_user)
 ):
     """
     Get all sessions for the current authenticated user.
     Returns sessions from all patients belonging to this user.
+    With `limit`, returns one page and sets X-Next-Cursor; pass it back
+    as `after` for the next page.
     """
-    # 1) Gather all Session rows for this user
-    sessions = (
-        db.query(models.Session)
-        .join(models.Patient)
-        .filter(models.Patient.user_id == current_user.id)
-        .all()
-    )
+    async def load():
+        rows = await services.list_session_rows(db, current_user.id, after=after, limit=limit)
+        return [_format_session(row) for row in rows]
 
-    formatted_sessions = []
-    for session in sessions:
-        # Count EEG data points for this session to calculate size
-        eeg_count = db.query(models.EegData).filter(
-            models.EegData.session_id == session.id
-        ).count()
-
-        size_bytes = eeg_count * 14 * 8
-        if size_bytes < 1024:
-            size = f"{size_bytes} B"
-        elif size_bytes < 1024 * 1024:
-            size = f"{size_bytes // 1024} KB"
-        else:
-            size = f"{size_bytes // (1024 * 1024)} MB"
-
-        formatted_session = {
-            "id": str(session.id),
-            "name": f"Session {session.id} - {session.patient.name} {session.patient.father_surname}",
-            "description": f"EEG session for patient {session.patient.name}, recorded on {session.session_timestamp.strftime('%Y-%m-%d')}",
-            "size": size,
-            "lastUpdated": session.session_timestamp.strftime('%Y-%m-%d %H:%M'),
-             "algorithm_name": session.algorithm_name or "",        
-            "processing_time": float(session.processing_time or 0.0)
-        }
-        formatted_sessions.append(formatted_session)
-    return formatted_sessions
+    sessions = await request_cache.cached(
+        current_user.id, f"sessions?after={after}&limit={limit}", load, changed_by_runs=True
+    )
+    _set_next_cursor(response, sessions, limit)
+    return sessions
 
 
 @app.post("/create-session-for-patient")
-def create_session_for_patient(
+async def create_session_for_patient(
     request: dict,  # {"patient_id": 123, "session_name": "..."}
-    db: Session = Depends(services.get_db),
+    db: AsyncSession = Depends(services.get_async_db),
     current_user: models.User = Depends(services.get_current_user)
 ):
     """
@@ -227,10 +400,10 @@ def create_session_for_patient(
     session_name = request.get("session_name", f"Session {datetime.now().strftime('%Y-%m-%d %H:%M')}")
     
     # Verify the patient belongs to the current user
-    patient = db.query(models.Patient).filter(
+    patient = (await db.execute(select(models.Patient).where(
         models.Patient.id == patient_id,
         models.Patient.user_id == current_user.id
-    ).first()
+    ))).scalars().first()
     
     if not patient:
         raise HTTPException(
@@ -247,15 +420,16 @@ def create_session_for_patient(
         processing_time=0.0
     )
     db.add(session)
-    db.commit()
-    db.refresh(session)
+    await db.commit()
+    await db.refresh(session)
+    await request_cache.invalidate(current_user.id)
     
     return {"session_id": session.id, "patient_id": patient.id}
 
 @app.post("/trigger-kalman-analysis")
 async def trigger_kalman_analysis(
     request: dict,  # Now includes "models" list and "winning_combination"
-    db: Session = Depends(services.get_db),
+    db: AsyncSession = Depends(services.get_async_db),
     current_user: models.User = Depends(services.get_current_user)
 ):
     session_id = request["session_id"]
@@ -267,225 +441,155 @@ async def trigger_kalman_analysis(
         "winning_combination",
         [1,0,1,0,1,0,1,0,1,0,1,0,1,0]
     )
+    # "interactive" (default) or "batch"; used by the Kalman admission control
+    priority = request.get("priority", "interactive")
+    # Each model runs as job "<job_prefix>-<model>" on the Kalman service, so a
+    # client that picks the prefix can follow /jobs/{id}/events while it waits
+    job_prefix = request.get("job_prefix") or uuid.uuid4().hex
+    # optional per-model compute budget in seconds; results cover the prefix done
+    time_budget = request.get("time_budget")
     
     print(f"🔍 Starting analysis for session {session_id}")
     print(f"🧠 Models: {models_list}")
     print(f"⚡ User winning combination: {winning_combination}")
     
     # 1. Verify session belongs to current user
-    session = db.query(models.Session).join(models.Patient).filter(
-        models.Session.id == session_id,
-        models.Patient.user_id == current_user.id
-    ).first()
-    
-    if not session:
-        raise HTTPException(404, "Session not found or access denied")
-    
-    # 2. Get EEG data for this session
-    eeg_data = db.query(models.EegData).filter(
-        models.EegData.session_id == session_id
-    ).all()
+    await _owned_session(db, session_id, current_user)
     
-    if not eeg_data:
+    # 2. Make sure the session has EEG data; the Kalman service reads the
+    #    samples itself from the shared database using the session id
+    summary = await db.get(models.SessionSummary, session_id)
+    if summary is None and not await db.run_sync(eeg_store.has_eeg, session_id):
         raise HTTPException(404, "No EEG data found for this session")
-    
-    print(f"📊 Found {len(eeg_data)} EEG data points")
-    
-    # 3. Create temporary CSV file with EEG data
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False) as tmp_file:
-        csv_writer = csv.writer(tmp_file)
-        
-        # Write header
-        csv_writer.writerow([
-            'af3', 'f7', 'f3', 'fc5', 't7', 'p7', 'o1', 'o2',
-            'p8', 't8', 'fc6', 'f4', 'f8', 'af4'
-        ])
-        
-        # Write data rows
-        for eeg in eeg_data:
-            csv_writer.writerow([
-                eeg.af3, eeg.f7, eeg.f3, eeg.fc5, eeg.t7, eeg.p7, eeg.o1, eeg.o2,
-                eeg.p8, eeg.t8, eeg.fc6, eeg.f4, eeg.f8, eeg.af4
-            ])
-        
-        tmp_csv_path = tmp_file.name
-    
-    print(f"📁 Created CSV file: {tmp_csv_path} ({os.path.getsize(tmp_csv_path)} bytes)")
-    try:
-        results = []
-        successful_runs = 0
-        
-        for model_name in models_list:
-            print(f"🧠 Running model: {model_name}")
-            try:
-                kalman_api_url = f"{KALMAN_URL}/run-kalman"
-                
-                request_data = {
-                    "variant": model_name,
-                    "wC": json.dumps(winning_combination),
-                    "session_id": session_id
-                }
-                print(f"📤 Request data: {request_data}")
-                
-                with open(tmp_csv_path, 'rb') as csv_file:
-                    print(f"📤 Sending request to Kalman API...")
-                    start_time = time.time()
-                    
-                    response = requests.post(
-                        kalman_api_url,
-                        data=request_data,
-                        files={"file": csv_file},
-                        timeout=600
-                    )
-                    end_time = time.time()
-                    processing_time = end_time - start_time
-                    print(f"⏱️ Processing time: {processing_time:.2f} seconds")
-                
-                print(f"📥 Kalman API response: {response.status_code}")
-                
-                if response.status_code == 200:
-                    try:
-                        response_data = response.json()
-                        # Now includes "session_run_id"
-                        run_id = response_data.get("session_run_id")
-                        print(f"✅ Model {model_name} completed successfully in {processing_time:.2f}s (new run: {run_id})")
-                        successful_runs += 1
-                        results.append({
-                            "model": model_name,
-                            "status": "success",
-                            "session_run_id": run_id,
-                            "processing_time": processing_time,
-                            "data": response_data
-                        })
-                    except json.JSONDecodeError as e:
-                        print(f"❌ Model {model_name} - Invalid JSON response: {e}")
-                        results.append({
-                            "model": model_name,
-                            "status": "failed",
-                            "error": f"Invalid JSON response: {e}",
-                            "processing_time": processing_time
-                        })
-                else:
-                    # HTTP error from Kalman service
-                    error_text = response.text
-                    print(f"❌ Model {model_name} failed with status {response.status_code}")
-                    print(f"📝 Error details: {error_text}")
-                    results.append({
-                        "model": model_name,
-                        "status": "failed",
-                        "error": f"HTTP {response.status_code}: {error_text}",
-                        "processing_time": processing_time
-                    })
-                    
-            except Exception as e:
-                print(f"💥 Exception for model {model_name}: {str(e)}")
-                results.append({
-                    "model": model_name,
-                    "status": "failed",
-                    "error": str(e)
-                })
-        
-        print(f"🏁 Analysis complete: {successful_runs}/{len(models_list)} successful")
-        return {
-            "message": f"Analysis completed for {successful_runs} out of {len(models_list)} models",
+    if summary is not None and summary.flat_channels:
+        print(f"⚠️ Session {session_id} has flat-lined channels: {summary.flat_channels}")
+
+    # 3. Fan the models out concurrently and collect results as they complete
+    data_for = {}
+    for model_name in models_list:
+        request_data = {
+            "variant": model_name,
+            "wC": json.dumps(winning_combination),
             "session_id": session_id,
-            "patient_id": patient_id,
-            "total_models": len(models_list),
-            "successful_runs": successful_runs,
-            "results": results
+            "priority": priority,
+            "job_id": f"{job_prefix}-{model_name}",
         }
-        
-    finally:
-        # Clean up temporary file
-        if os.path.exists(tmp_csv_path):
-            os.unlink(tmp_csv_path)
-            print(f"🗑️ Cleaned up CSV file")
+        if time_budget is not None:
+            request_data["time_budget"] = time_budget
+        data_for[model_name] = request_data
+
+    results = []
+    successful_runs = 0
+    async for result in kalman_client.run_models(models_list, data_for):
+        if result["status"] == "success":
+            successful_runs += 1
+            print(f"✅ Model {result['model']} completed in {result['processing_time']:.2f}s (new run: {result['session_run_id']})")
+        else:
+            print(f"❌ Model {result['model']} failed: {result['error']}")
+        results.append(result)
+
+    print(f"🏁 Analysis complete: {successful_runs}/{len(models_list)} successful")
+    # every run added a session to this user's listings
+    await request_cache.invalidate(current_user.id)
+    return {
+        "message": f"Analysis completed for {successful_runs} out of {len(models_list)} models",
+        "session_id": session_id,
+        "patient_id": patient_id,
+        "job_prefix": job_prefix,
+        "total_models": len(models_list),
+        "successful_runs": successful_runs,
+        "results": results
+    }
+
+
+async def _count_points(db: AsyncSession, model, session_id: int, *group):
+    """(algorithm_id, algorithm name, *group, points) rows of one results table for a session."""
+    columns = [model.algorithm_id, models.Algorithm.name, *group]
+    return (
+        await db.execute(
+            select(*columns, func.count())
+            .join(models.Algorithm, models.Algorithm.id == model.algorithm_id)
+            .where(model.session_id == session_id)
+            .group_by(*columns)
+        )
+    ).all()
 
 
 @app.get("/sessions/{session_id}/results")
-def get_session_results(
+async def get_session_results(
     session_id: int,
-    db: Session = Depends(services.get_db),
+    db: AsyncSession = Depends(services.get_async_db),
     current_user: models.User = Depends(services.get_current_user)
 ):
-    """Get analysis results for a session"""
-    
-    # Verify session belongs to user
-    session = db.query(models.Session).join(models.Patient).filter(
-        models.Session.id == session_id,
-        models.Patient.user_id == current_user.id
-    ).first()
-    
-    if not session:
-        raise HTTPException(404, "Session not found")
-    
-    # Get results (assuming you have a ResData table to store aggregated results)
-    results = db.query(models.ResData).filter(
-        models.ResData.session_id == session_id
-    ).all()
-    
-    return {
-        "session_id": session_id,
-        "results": [
-            {
-                "id": r.id,
-                "algorithm": r.algorithm.name if r.algorithm else "Unknown",
-                "amplitude": r.amplitude,
-                "welch": r.welch,
-                "y_all": r.time,
-                "y_wc": r.wilcoxon,
-            }
-            for r in results
-        ]
-    }
+    """
+    Which Kalman results a session has: per algorithm, the number of stored
+    points of each y / amplitude series and of the Welch spectrum. The
+    series themselves are served by the Kalman service.
+    """
+    async def load():
+        # Verify session belongs to user
+        owned = (
+            await db.execute(
+                select(models.Session.id)
+                .join(models.Patient, models.Patient.id == models.Session.patient_id)
+                .where(models.Session.id == session_id, models.Patient.user_id == current_user.id)
+            )
+        ).first()
+        if not owned:
+            raise HTTPException(404, "Session not found")
+
+        results = {}
+
+        def entry(algorithm_id, name):
+            return results.setdefault(algorithm_id, {
+                "algorithm_id": algorithm_id, "algorithm": name,
+                "y_points": {}, "amplitude_points": {}, "welch_points": 0,
+            })
+
+        for algorithm_id, name, label, n in await _count_points(db, models.ResultsY, session_id, models.ResultsY.label):
+            entry(algorithm_id, name)["y_points"][label] = n
+        for algorithm_id, name, label, n in await _count_points(db, models.ResultsAmp, session_id, models.ResultsAmp.label):
+            entry(algorithm_id, name)["amplitude_points"][label] = n
+        for algorithm_id, name, n in await _count_points(db, models.ResultsWelch, session_id):
+            entry(algorithm_id, name)["welch_points"] = n
+        return {"session_id": session_id, "results": [results[k] for k in sorted(results)]}
+
+    return await request_cache.cached(
+        current_user.id, f"sessions/{session_id}/results", load, changed_by_runs=True
+    )
 
 # ────────────────────────────────────────────────────────────────────────────
 # Get all sessions for a specific patient (must belong to current user)
 # ────────────────────────────────────────────────────────────────────────────
 @app.get("/patients/{patient_id}/sessions", response_model=List[schemas.SessionSummary])
-def get_sessions_for_patient(
+async def get_sessions_for_patient(
     patient_id: int,
-    db: Session = Depends(services.get_db),
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    after: Optional[int] = None,
+    db: AsyncSession = Depends(services.get_async_db),
     current_user: models.User = Depends(services.get_current_user)
 ):
-    # 1) Verify the patient belongs to the current user
-    patient = (
-        db.query(models.Patient)
-        .filter(models.Patient.id == patient_id, models.Patient.user_id == current_user.id)
-        .first()
-    )
-    if not patient:
-        raise HTTPException(status_code=404, detail="Patient not found or access denied")
+    async def load():
+        # 1) Verify the patient belongs to the current user
+        patient = (
+            await db.execute(
+                select(models.Patient.id)
+                .where(models.Patient.id == patient_id, models.Patient.user_id == current_user.id)
+            )
+        ).first()
+        if not patient:
+            raise HTTPException(status_code=404, detail="Patient not found or access denied")
+
+        # 2) Sessions of that patient with their EEG counts, in one query
+        rows = await services.list_session_rows(
+            db, current_user.id, patient_id=patient_id, after=after, limit=limit
+        )
+        return [_format_session(row) for row in rows]
 
-    # 2) Gather all Session rows for that patient
-    sessions = (
-        db.query(models.Session)
-        .filter(models.Session.patient_id == patient_id)
-        .all()
+    sessions = await request_cache.cached(
+        current_user.id, f"patients/{patient_id}/sessions?after={after}&limit={limit}", load,
+        changed_by_runs=True,
     )
-
-    formatted_sessions: List[dict] = []
-    for session in sessions:
-        eeg_count = db.query(models.EegData).filter(
-            models.EegData.session_id == session.id
-        ).count()
-
-        size_bytes = eeg_count * 14 * 8
-        if size_bytes < 1024:
-            size = f"{size_bytes} B"
-        elif size_bytes < 1024 * 1024:
-            size = f"{size_bytes // 1024} KB"
-        else:
-            size = f"{size_bytes // (1024 * 1024)} MB"
-
-        formatted_sessions.append({
-            "id": str(session.id),
-            "name": f"Session {session.id} - {patient.name} {patient.father_surname}",
-            "description": f"EEG session for patient {patient.name}, recorded on {session.session_timestamp.strftime('%Y-%m-%d')}",
-            "size": size,
-            "lastUpdated": session.session_timestamp.strftime('%Y-%m-%d %H:%M'),
-            "algorithm_name": session.algorithm_name or "",
-            "processing_time": float(session.processing_time or 0.0)
-        })
-
-    return formatted_sessions
+    _set_next_cursor(response, sessions, limit)
+    return sessions
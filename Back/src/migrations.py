@@ -0,0 +1,169 @@
+# migrations.py  ────────────────────────────────────────────────────────────
+# Versioned schema changes for the shared `datamed` database.
+#
+# create_all() only creates missing tables, so anything added to an existing
+# table (an index, a column) is a migration here. Applied versions are kept
+# in `schema_migrations`; every step is idempotent, so concurrent upgrade()
+# calls from several backend workers are safe. This is the only runner: the
+# Kalman service (ASSESMENT/migrations.py) just lists the versions it needs
+# and checks at startup that they are applied.
+#
+#   python migrations.py           apply pending migrations
+#   python migrations.py --check   EXPLAIN the hot queries, exit 1 on a scan
+#                                  (SQLite and MySQL; other dialects are skipped)
+import sys
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, func, inspect, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+
+from database import engine
+from models import EegBlock, EegData, Patient, ResultsAmp, ResultsWelch, ResultsY, Session as SessionModel
+
+_meta = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _meta,
+    Column("version", String(64), primary_key=True),
+    Column("applied_at", DateTime, nullable=False, server_default=func.now()),
+)
+
+
+def _create_indexes(conn, *models) -> None:
+    """Create the Index objects declared in each model's __table_args__."""
+    for model in models:
+        existing = {ix["name"] for ix in inspect(conn).get_indexes(model.__tablename__)}
+        for index in model.__table__.indexes:
+            if index.name in existing:
+                continue
+            try:
+                index.create(conn)
+            except DBAPIError:
+                # another worker created it in the meantime
+                if index.name not in {ix["name"] for ix in inspect(conn).get_indexes(model.__tablename__)}:
+                    raise
+
+
+def _add_column(conn, model, name: str) -> None:
+    """ALTER TABLE ADD COLUMN for a column declared on the model, if missing."""
+    table = model.__tablename__
+    if name in {c["name"] for c in inspect(conn).get_columns(table)}:
+        return
+    column = model.__table__.c[name]
+    ddl = f"ALTER TABLE {table} ADD COLUMN {name} {column.type.compile(conn.dialect)}"
+    try:
+        conn.execute(text(ddl + ("" if column.nullable else " NOT NULL")))
+    except DBAPIError:
+        if name not in {c["name"] for c in inspect(conn).get_columns(table)}:
+            raise
+
+
+def _0001_hot_path_indexes(conn) -> None:
+    _create_indexes(conn, Patient, SessionModel, EegData, ResultsY, ResultsAmp, ResultsWelch)
+
+
+def _0002_session_eeg_payload(conn) -> None:
+    _add_column(conn, SessionModel, "eeg_payload_id")
+    _create_indexes(conn, SessionModel)
+
+
+MIGRATIONS: List[Tuple[str, Callable]] = [
+    ("0001_hot_path_indexes", _0001_hot_path_indexes),
+    ("0002_session_eeg_payload", _0002_session_eeg_payload),
+]
+
+
+def upgrade(bind: Engine = engine) -> List[str]:
+    """Apply every migration not yet recorded; returns the versions applied."""
+    _meta.create_all(bind)
+    applied = []
+    for version, step in MIGRATIONS:
+        with bind.begin() as conn:
+            done = conn.execute(
+                select(schema_migrations.c.version).where(schema_migrations.c.version == version)
+            ).first()
+            if done:
+                continue
+            step(conn)
+            try:
+                conn.execute(schema_migrations.insert().values(version=version))
+            except DBAPIError:
+                pass  # recorded concurrently by another worker
+        applied.append(version)
+    return applied
+
+
+# ── query-plan check ──────────────────────────────────────────────────────
+def hot_queries():
+    """The reads every results page and listing issues, with sample parameters."""
+    return {
+        "eeg by session":          select(EegData.af3).where(EegData.session_id == 1).order_by(EegData.id),
+        "eeg blocks in range":     select(EegBlock.data)
+                                   .where(EegBlock.session_id == 1, EegBlock.start_sample > 0)
+                                   .order_by(EegBlock.start_sample),
+        "y series":                select(ResultsY.y_value)
+                                   .where(ResultsY.session_id == 1, ResultsY.label == "All")
+                                   .order_by(ResultsY.time),
+        "amplitude series":        select(ResultsAmp.amplitude)
+                                   .where(ResultsAmp.session_id == 1, ResultsAmp.label == "All")
+                                   .order_by(ResultsAmp.time),
+        "welch by session":        select(ResultsWelch.frequency)
+                                   .where(ResultsWelch.session_id == 1)
+                                   .order_by(ResultsWelch.frequency),
+        "patients of user":        select(Patient.id).where(Patient.user_id == 1),
+        "sessions of patient":     select(SessionModel.id).where(SessionModel.patient_id == 1),
+    }
+
+
+PLAN_DIALECTS = ("sqlite", "mysql")
+
+
+def _uses_index(dialect: str, plan_rows) -> bool:
+    """Whether a plan reaches every table through an index lookup."""
+    if dialect == "sqlite":
+        # rows: (id, parent, notused, detail). Every table access must be a
+        # "SEARCH <table> USING [COVERING] INDEX ..." (or the rowid key); any
+        # "SCAN", even "SCAN <table> USING COVERING INDEX", reads it whole.
+        details = [row[-1] for row in plan_rows]
+        access = [d for d in details if d.startswith(("SCAN", "SEARCH"))]
+        return bool(access) and all(
+            d.startswith("SEARCH") and ("USING INDEX" in d or "USING COVERING INDEX" in d
+                                        or "USING INTEGER PRIMARY KEY" in d)
+            for d in access
+        )
+    if dialect == "mysql":
+        # type ALL is a table scan, type index a full index scan
+        rows = [dict(row._mapping) for row in plan_rows]
+        return all(r.get("key") and r.get("type") not in ("ALL", "index") for r in rows)
+    raise ValueError(f"no plan check for dialect {dialect!r}")
+
+
+def check_query_plans(bind: Engine = engine) -> List[Tuple[str, Optional[bool], list]]:
+    """
+    EXPLAIN each hot query; returns (name, uses an index, raw plan rows).
+    On a dialect without a plan check the verdict is None and the plan empty.
+    """
+    dialect = bind.dialect.name
+    if dialect not in PLAN_DIALECTS:
+        return [(name, None, []) for name in hot_queries()]
+    prefix = "EXPLAIN QUERY PLAN " if dialect == "sqlite" else "EXPLAIN "
+    report = []
+    with bind.connect() as conn:
+        for name, stmt in hot_queries().items():
+            sql = str(stmt.compile(bind, compile_kwargs={"literal_binds": True}))
+            rows = conn.execute(text(prefix + sql)).fetchall()
+            report.append((name, _uses_index(dialect, rows), [tuple(r) for r in rows]))
+    return report
+
+
+if __name__ == "__main__":
+    if "--check" in sys.argv[1:]:
+        upgrade()
+        if engine.dialect.name not in PLAN_DIALECTS:
+            print(f"unsupported dialect {engine.dialect.name!r}: query plans not checked")
+            sys.exit(0)
+        report = check_query_plans()
+        for name, ok, plan in report:
+            print(f"{'ok  ' if ok else 'SCAN'} {name}: {plan}")
+        sys.exit(0 if all(ok for _, ok, _ in report) else 1)
+    print("applied:", upgrade() or "nothing to do")
@@ -8,7 +8,10 @@ from sqlalchemy import (
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
+    JSON,
+    LargeBinary,
     String,
 )
 from sqlalchemy.orm import relationship
@@ -30,6 +33,7 @@ class User(Base):
 
 class Patient(Base):
     __tablename__ = "patients"
+    __table_args__ = (Index("ix_patients_user_id", "user_id"),)
     id             = Column(Integer, primary_key=True, index=True, nullable=False)
     user_id        = Column(Integer, ForeignKey("users.id"), nullable=False)
     name           = Column(String(100), nullable=False)
@@ -45,6 +49,7 @@ class Patient(Base):
 
 class Session(Base):
     __tablename__ = "sessions"
+    __table_args__ = (Index("ix_sessions_patient_id_timestamp", "patient_id", "session_timestamp"),)
 
     id                = Column(Integer, primary_key=True, index=True, nullable=False)
     patient_id        = Column(Integer, ForeignKey("patients.id"), nullable=False)
@@ -56,9 +61,14 @@ class Session(Base):
 
     # NEW: how long (in seconds) the Kalman run took
     processing_time = Column(Float, nullable=False, default=0.0)
+    # recording shared by reference when the same EEG was uploaded before
+    # (eeg_payloads.id; no FK so the two tables don't reference each other)
+    eeg_payload_id    = Column(Integer, nullable=True, index=True)
+
     # → existing relationships…
     patient      = relationship("Patient", back_populates="sessions")
     eeg_data     = relationship("EegData", back_populates="session")
+    eeg_blocks   = relationship("EegBlock", back_populates="session", order_by="EegBlock.start_sample")
     results_y         = relationship("ResultsY",    back_populates="session",    cascade="all, delete-orphan")
     results_amplitude = relationship("ResultsAmp",  back_populates="session",    cascade="all, delete-orphan")
     results_welch     = relationship("ResultsWelch", back_populates="session",    cascade="all, delete-orphan")
@@ -74,6 +84,7 @@ class Session(Base):
 
 class EegData(Base):
     __tablename__ = "eeg_data"
+    __table_args__ = (Index("ix_eeg_data_session_id_id", "session_id", "id"),)
     id         = Column(Integer, primary_key=True, index=True, nullable=False)
     session_id = Column(Integer, ForeignKey("sessions.id"), nullable=False)
     af3        = Column(Float, nullable=False)
@@ -94,6 +105,69 @@ class EegData(Base):
     session = relationship("Session", back_populates="eeg_data")
 
 
+class EegBlock(Base):
+    """
+    A session's EEG stored columnar: every block holds up to BLOCK_SAMPLES
+    consecutive samples as a zlib-compressed, channel-major float32 array.
+    """
+    __tablename__ = "eeg_blocks"
+    __table_args__ = (
+        Index("ux_eeg_blocks_session_start", "session_id", "start_sample", unique=True),
+    )
+    id           = Column(Integer, primary_key=True, index=True, nullable=False)
+    session_id   = Column(Integer, ForeignKey("sessions.id"), nullable=False)
+    start_sample = Column(Integer, nullable=False)
+    n_samples    = Column(Integer, nullable=False)
+    data         = Column(LargeBinary(length=2**24 - 1), nullable=False)   # MEDIUMBLOB on MySQL
+
+    session = relationship("Session", back_populates="eeg_blocks")
+
+
+class EegPayload(Base):
+    """
+    One distinct recording, identified by the SHA-256 of its samples as
+    little-endian float32 rows. The samples are stored once, as the blocks of
+    owner_session_id; every session uploading the same recording points here.
+    """
+    __tablename__ = "eeg_payloads"
+    id               = Column(Integer, primary_key=True, index=True, nullable=False)
+    fingerprint      = Column(String(64), unique=True, nullable=False)
+    owner_session_id = Column(Integer, ForeignKey("sessions.id"), nullable=False)
+    n_samples        = Column(Integer, nullable=False)
+    created_at       = Column(DateTime, nullable=False, default=datetime.now)
+
+
+class EegUpload(Base):
+    """One CSV handed to the background ingestion worker, and how it went."""
+    __tablename__ = "eeg_uploads"
+    __table_args__ = (Index("ix_eeg_uploads_session_id", "session_id", "id"),)
+    id          = Column(Integer, primary_key=True, index=True, nullable=False)
+    session_id  = Column(Integer, ForeignKey("sessions.id"), nullable=False)
+    filename    = Column(String(255), nullable=True)
+    status      = Column(String(16), nullable=False, default="queued")   # queued | parsing | stored | failed
+    rows        = Column(Integer, nullable=False, default=0)
+    error       = Column(String(1024), nullable=True)
+    created_at  = Column(DateTime, nullable=False, default=datetime.now)
+    updated_at  = Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+
+
+class SessionSummary(Base):
+    """
+    Facts about a session's EEG computed once at upload, so listings,
+    validation and Kalman initialisation don't rescan the samples.
+    channel_stats maps each channel to its mean, var, min, max and
+    longest_run (longest stretch of one repeated value, in samples).
+    """
+    __tablename__ = "session_summaries"
+    session_id       = Column(Integer, ForeignKey("sessions.id"), primary_key=True, nullable=False)
+    n_samples        = Column(Integer, nullable=False)
+    duration_seconds = Column(Float, nullable=False)
+    channel_stats    = Column(JSON, nullable=False)
+    first_second_cov = Column(JSON, nullable=True)    # 14×14, None if shorter than one second
+    flat_channels    = Column(JSON, nullable=False)   # channels flat for at least FLAT_SAMPLES
+    computed_at      = Column(DateTime, nullable=False, default=datetime.now)
+
+
 class Algorithm(Base):
     __tablename__ = "algorithm"
     id          = Column(Integer, primary_key=True, index=True, nullable=False)
@@ -107,6 +181,7 @@ class Algorithm(Base):
 
 class ResultsY(Base):
     __tablename__ = "results_y"
+    __table_args__ = (Index("ix_results_y_session_label_time", "session_id", "label", "time", "y_value"),)
     id           = Column(Integer, primary_key=True, index=True, nullable=False)
     session_id   = Column(Integer, ForeignKey("sessions.id"), nullable=False)
     algorithm_id = Column(Integer, ForeignKey("algorithm.id"), nullable=False)
@@ -121,6 +196,7 @@ class ResultsY(Base):
 
 class ResultsAmp(Base):
     __tablename__ = "results_amplitude"
+    __table_args__ = (Index("ix_results_amp_session_label_time", "session_id", "label", "time", "amplitude"),)
     id           = Column(Integer, primary_key=True, index=True, nullable=False)
     session_id   = Column(Integer, ForeignKey("sessions.id"), nullable=False)
     algorithm_id = Column(Integer, ForeignKey("algorithm.id"), nullable=False)
@@ -135,6 +211,7 @@ class ResultsAmp(Base):
 
 class ResultsWelch(Base):
     __tablename__ = "results_welch"
+    __table_args__ = (Index("ix_results_welch_session_frequency", "session_id", "frequency"),)
     id           = Column(Integer, primary_key=True, index=True, nullable=False)
     session_id   = Column(Integer, ForeignKey("sessions.id"), nullable=False)
     algorithm_id = Column(Integer, ForeignKey("algorithm.id"), nullable=False)
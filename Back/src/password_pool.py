@@ -0,0 +1,98 @@
+# password_pool.py
+#
+# bcrypt off the request path. Hashing and verifying a password costs tens
+# to hundreds of milliseconds of CPU, so both run on a dedicated pool of
+# HASH_WORKERS threads (bcrypt releases the GIL while it works) instead of
+# the threadpool the other endpoints share. At most HASH_MAX_PENDING
+# operations may be running or queued; past that, callers get PoolBusy and
+# the endpoint answers 503 instead of piling up logins.
+#
+# Latency is recorded per operation, split into queue wait and bcrypt time,
+# over the last LATENCY_WINDOW calls; stats() feeds GET /metrics.
+
+import asyncio
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", "64"))
+LATENCY_WINDOW = 1024
+
+_executor: Optional[ThreadPoolExecutor] = None
+_pending = 0   # only touched from the event loop
+_rejected = 0
+_latency = {"hash": deque(maxlen=LATENCY_WINDOW), "verify": deque(maxlen=LATENCY_WINDOW)}
+
+
+class PoolBusy(Exception):
+    def __init__(self, retry_after: int = 1):
+        super().__init__("Too many password operations in progress, try again shortly")
+        self.retry_after = retry_after
+
+
+def start() -> None:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+
+
+def stop() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def run(op: str, fn, *args):
+    """Run fn(*args) on the bcrypt pool, recording its latency under `op`."""
+    global _pending, _rejected
+    if _pending >= HASH_MAX_PENDING:
+        _rejected += 1
+        raise PoolBusy()
+    start()
+    _pending += 1
+    queued = time.perf_counter()
+
+    def timed():
+        began = time.perf_counter()
+        return fn(*args), began, time.perf_counter()
+
+    try:
+        result, began, done = await asyncio.get_running_loop().run_in_executor(_executor, timed)
+    finally:
+        _pending -= 1
+    _latency[op].append((began - queued, done - began))
+    return result
+
+
+def _percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def stats() -> dict:
+    ops = {}
+    for op, samples in _latency.items():
+        if not samples:
+            ops[op] = {"count": 0}
+            continue
+        samples = list(samples)
+        wait = [w for w, _ in samples]
+        total = [w + c for w, c in samples]
+        ops[op] = {
+            "count": len(samples),
+            "p50_ms": round(_percentile(total, 0.50) * 1000, 1),
+            "p95_ms": round(_percentile(total, 0.95) * 1000, 1),
+            "max_ms": round(max(total) * 1000, 1),
+            "wait_p95_ms": round(_percentile(wait, 0.95) * 1000, 1),
+        }
+    return {
+        "workers": HASH_WORKERS,
+        "max_pending": HASH_MAX_PENDING,
+        "pending": _pending,
+        "rejected": _rejected,
+        **ops,
+    }
@@ -0,0 +1,181 @@
+# request_cache.py
+#
+# Cache for the read-mostly GET endpoints (patient and session listings,
+# session results). Entries are keyed by user and resource and live
+# REQUEST_CACHE_TTL seconds in an in-process LRU of REQUEST_CACHE_SIZE
+# entries, or in Redis (or any Redis-compatible server) when
+# REQUEST_CACHE_REDIS_URL is set and the redis package is installed.
+#
+# Invalidation is by generation: every user has a counter that is part of
+# each key, and invalidate(user_id) bumps it, so everything cached for that
+# user is missed from then on and simply ages out. Writes call it for the
+# user whose listings they change. In Redis the counter lives at
+# rc:gen:<user_id>, so the Kalman service can invalidate too.
+#
+# The Kalman service can only reach a shared counter. Without Redis, the
+# resources its runs change (session listings, results; cached with
+# changed_by_runs=True) are not cached at all, so they are never stale;
+# the rest still use the in-process LRU.
+#
+# Values must be JSON-serialisable; they are stored as JSON either way, so a
+# hit hands back a fresh copy.
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Optional
+
+try:
+    import redis
+    import redis.asyncio
+except ImportError:   # optional: without it the cache is in-process only
+    redis = None
+
+REQUEST_CACHE_TTL = float(os.getenv("REQUEST_CACHE_TTL", "30"))
+REQUEST_CACHE_SIZE = int(os.getenv("REQUEST_CACHE_SIZE", "2048"))
+REQUEST_CACHE_REDIS_URL = os.getenv("REQUEST_CACHE_REDIS_URL")
+
+
+class _MemoryBackend:
+    name = "memory"
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()   # key → (json, expires_at)
+        self._gen = defaultdict(int)
+
+    async def generation(self, user_id: int) -> int:
+        return self._gen[user_id]
+
+    async def bump(self, user_id: int) -> None:
+        self.bump_blocking(user_id)
+
+    def bump_blocking(self, user_id: int) -> None:
+        with self._lock:
+            self._gen[user_id] += 1
+
+    async def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    async def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.time() + REQUEST_CACHE_TTL)
+            self._entries.move_to_end(key)
+            while len(self._entries) > REQUEST_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def size(self) -> Optional[int]:
+        return len(self._entries)
+
+
+class _RedisBackend:
+    """redis.asyncio on the event loop; a blocking client for worker threads."""
+    name = "redis"
+    shared = True
+
+    def __init__(self, url: str):
+        self._client = redis.asyncio.Redis.from_url(url, decode_responses=True)
+        self._blocking = redis.Redis.from_url(url, decode_responses=True)
+
+    async def generation(self, user_id: int) -> int:
+        return int(await self._client.get(f"rc:gen:{user_id}") or 0)
+
+    async def bump(self, user_id: int) -> None:
+        await self._client.incr(f"rc:gen:{user_id}")
+
+    def bump_blocking(self, user_id: int) -> None:
+        self._blocking.incr(f"rc:gen:{user_id}")
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._client.get(key)
+
+    async def set(self, key: str, value: str) -> None:
+        await self._client.set(key, value, ex=max(1, int(REQUEST_CACHE_TTL)))
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+if REQUEST_CACHE_REDIS_URL and redis is not None:
+    _backend = _RedisBackend(REQUEST_CACHE_REDIS_URL)
+else:
+    _backend = _MemoryBackend()
+
+_stats = {"hits": 0, "misses": 0, "bypassed": 0, "invalidations": 0, "errors": 0}
+
+
+async def cached(user_id: int, resource: str, compute: Callable, changed_by_runs: bool = False) -> Any:
+    """
+    The cached value of `resource` for a user, or `await compute()` stored.
+    Resources the Kalman service changes (`changed_by_runs`) are only cached
+    in a backend it can invalidate.
+    """
+    if changed_by_runs and not _backend.shared:
+        _stats["bypassed"] += 1
+        return await compute()
+    key = None
+    try:
+        key = f"rc:{user_id}:{await _backend.generation(user_id)}:{resource}"
+        hit = await _backend.get(key)
+    except Exception as e:   # a cache outage must not fail the request
+        _stats["errors"] += 1
+        print(f"⚠️ request cache unavailable: {e}")
+        hit = None
+    if hit is not None:
+        _stats["hits"] += 1
+        return json.loads(hit)
+    _stats["misses"] += 1
+    value = await compute()
+    if key is not None:
+        try:
+            await _backend.set(key, json.dumps(value, default=str))
+        except Exception as e:
+            _stats["errors"] += 1
+            print(f"⚠️ request cache unavailable: {e}")
+    return value
+
+
+async def invalidate(user_id: Optional[int]) -> None:
+    """Drop everything cached for a user (after a write that changes their data)."""
+    if user_id is None:
+        return
+    try:
+        await _backend.bump(user_id)
+        _stats["invalidations"] += 1
+    except Exception as e:
+        _stats["errors"] += 1
+        print(f"⚠️ request cache invalidation failed for user {user_id}: {e}")
+
+
+def invalidate_blocking(user_id: Optional[int]) -> None:
+    """invalidate() for worker threads (ingestion), off the event loop."""
+    if user_id is None:
+        return
+    try:
+        _backend.bump_blocking(user_id)
+        _stats["invalidations"] += 1
+    except Exception as e:
+        _stats["errors"] += 1
+        print(f"⚠️ request cache invalidation failed for user {user_id}: {e}")
+
+
+def stats() -> dict:
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "backend": _backend.name,
+        "shared": _backend.shared,
+        "size": _backend.size(),
+        "hit_rate": round(_stats["hits"] / lookups, 4) if lookups else None,
+    }
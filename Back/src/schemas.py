@@ -1,6 +1,6 @@
 from datetime import date, datetime
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 
 # User Classes
@@ -63,6 +63,8 @@ class SessionSummary(BaseModel):
     lastUpdated: str
     algorithm_name: Optional[str]
     processing_time: float
+    duration_seconds: Optional[float] = None   # from the upload-time summary
+    flat_channels: List[str] = []
 
     class Config:
         orm_mode = True
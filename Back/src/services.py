@@ -3,9 +3,15 @@
 import os
 import models
 import schemas
+import migrations
+import eeg_store
+import auth_cache
+import password_pool
 
-from database import Base, engine, SessionLocal
+from database import AsyncSessionLocal, Base, engine, SessionLocal
 from loadenv import Settings
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from jose import jwt, JWTError
 from dotenv import load_dotenv
@@ -22,7 +28,8 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 def create_database():
-    return Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    migrations.upgrade(engine)
 
 
 def get_db():
@@ -33,14 +40,19 @@ def get_db():
         db.close()
 
 
-def get_user_by_email(db: Session, email: str):
-    return db.query(models.User).filter(models.User.email == email).first()
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    return (await db.execute(select(models.User).where(models.User.email == email))).scalars().first()
 
 def get_patient_by_email(db: Session, email: str):
     return db.query(models.Patient).filter(models.Patient.email == email).first()
 
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed_pass = get_password_hash(user.password)
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
+    hashed_pass = await password_pool.run("hash", get_password_hash, user.password)
     db_user = models.User(
         name=user.name,
         father_surname=user.father_surname,
@@ -50,8 +62,8 @@ def create_user(db: Session, user: schemas.UserCreate):
         hashed_password=hashed_pass
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 
@@ -59,6 +71,46 @@ def get_patients_by_user(db: Session, user_id: int) -> List[models.Patient]:
     return db.query(models.Patient).filter(models.Patient.user_id == user_id).all()
 
 
+async def list_session_rows(
+    db: AsyncSession,
+    user_id: int,
+    patient_id: Optional[int] = None,
+    after: Optional[int] = None,
+    limit: Optional[int] = None,
+):
+    """
+    Sessions of a user (optionally of one patient) with their patient's name
+    and EEG sample count, in a single query ordered by session id. `after`
+    and `limit` page through them by keyset (id > after). The count comes
+    from the session's summary row; only sessions without one are counted.
+    """
+    eeg_count = func.coalesce(models.SessionSummary.n_samples, eeg_store.sample_count_expr())
+    stmt = (
+        select(
+            models.Session.id,
+            models.Session.session_timestamp,
+            models.Session.algorithm_name,
+            models.Session.processing_time,
+            models.Patient.name.label("patient_name"),
+            models.Patient.father_surname.label("patient_father_surname"),
+            eeg_count.label("eeg_count"),
+            models.SessionSummary.duration_seconds,
+            models.SessionSummary.flat_channels,
+        )
+        .join(models.Patient, models.Patient.id == models.Session.patient_id)
+        .outerjoin(models.SessionSummary, models.SessionSummary.session_id == models.Session.id)
+        .where(models.Patient.user_id == user_id)
+        .order_by(models.Session.id)
+    )
+    if patient_id is not None:
+        stmt = stmt.where(models.Session.patient_id == patient_id)
+    if after is not None:
+        stmt = stmt.where(models.Session.id > after)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return (await db.execute(stmt)).all()
+
+
 def create_patient(db: Session, user_id: int, patient_in: schemas.PatientCreate) -> models.Patient:
     new_patient = models.Patient(
         user_id=user_id,
@@ -78,6 +130,7 @@ def create_patient(db: Session, user_id: int, patient_in: schemas.PatientCreate)
 def get_password_hash(plain_password: str) -> str:
     """
     Hashes plain_password with bcrypt and returns the hash string.
+    Blocking; request handlers run it through password_pool.
     """
     return pwd_context.hash(plain_password)
 
@@ -85,6 +138,7 @@ def get_password_hash(plain_password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Returns True if plain_password matches the hashed_password.
+    Blocking; request handlers run it through password_pool.
     """
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -110,27 +164,33 @@ def create_access_token(
     return encoded_jwt
 
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[models.User]:
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[models.User]:
     """
     Verify that a user with email exists and that password matches
     their stored hashed_password. Return the User object on success, or None.
     """
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = await get_user_by_email(db, email)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await password_pool.run("verify", verify_password, password, user.hashed_password):
         return None
     return user
 
 
-def get_current_user(
+async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> models.User:
     """
     Decode the JWT, find the user by email, and return the ORM user object.
-    Raise 401 if token is invalid or user not found.
+    Raise 401 if token is invalid or user not found or deactivated.
+    Validated tokens are remembered for a short while (auth_cache), so
+    repeat requests skip both the decode and the query.
     """
+    cached = await auth_cache.get(db, token)
+    if cached is not None:
+        return cached
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -145,7 +205,10 @@ def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    user = db.query(models.User).filter(models.User.email == token_data.email).first()
-    if user is None:
+    user = (
+        await db.execute(select(models.User).where(models.User.email == token_data.email))
+    ).scalars().first()
+    if user is None or not user.is_active:
         raise credentials_exception
+    auth_cache.put(token, user, payload.get("exp"))
     return user
\ No newline at end of file
@@ -0,0 +1,162 @@
+# session_summary.py
+#
+# Upload-time session summary. While a CSV is ingested, every chunk is fed to
+# a SummaryBuilder, which keeps running per-channel moments (merged chunk by
+# chunk, so the pass stays streaming), the first second of samples and the
+# longest run of one repeated value per channel. The result is one
+# session_summaries row: sample count, duration, per-channel mean/var/min/max,
+# the first-second covariance the Kalman variants start from, and the
+# channels that flat-line for FLAT_SAMPLES or more.
+#
+# Statistics are taken on the samples as stored (float32), so they match what
+# readers get back from eeg_store. Sessions ingested before summaries existed
+# are summarised from their stored samples by backfill() / `python -m`.
+
+import os
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import eeg_store
+import models
+
+# 300 s at 128 Hz, the threshold Filtering.detect_repeated_values uses
+FLAT_SAMPLES = int(os.getenv("FLAT_SAMPLES", str(300 * eeg_store.FS)))
+
+
+class SummaryBuilder:
+    """Accumulates a session summary over [n, 14] chunks fed in order."""
+
+    def __init__(self):
+        n = eeg_store.N_CHANNELS
+        self.count = 0
+        self.mean = np.zeros(n)
+        self.m2 = np.zeros(n)            # sum of squared deviations from the mean
+        self.min = np.full(n, np.inf)
+        self.max = np.full(n, -np.inf)
+        self.head = np.empty((0, n))     # first second, for the initial covariance
+        self.last = np.full(n, np.nan)   # last value seen, and how long it has repeated
+        self.run = np.zeros(n, dtype=np.int64)
+        self.longest = np.zeros(n, dtype=np.int64)
+
+    def update(self, arr: np.ndarray) -> None:
+        arr = np.asarray(arr, dtype="<f4").astype(np.float64)
+        n = arr.shape[0]
+        if n == 0:
+            return
+        # Chan et al. pairwise merge of (count, mean, M2)
+        mean = arr.mean(axis=0)
+        m2 = ((arr - mean) ** 2).sum(axis=0)
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean = self.mean + delta * n / total
+        self.m2 = self.m2 + m2 + delta ** 2 * self.count * n / total
+        self.count = total
+        self.min = np.minimum(self.min, arr.min(axis=0))
+        self.max = np.maximum(self.max, arr.max(axis=0))
+        if self.head.shape[0] < eeg_store.FS:
+            self.head = np.concatenate([self.head, arr[:eeg_store.FS - self.head.shape[0]]])
+        for c in range(arr.shape[1]):
+            self._runs(c, arr[:, c])
+
+    def _runs(self, c: int, col: np.ndarray) -> None:
+        # lengths of the runs of equal consecutive values in this chunk
+        edges = np.flatnonzero(col[1:] != col[:-1]) + 1
+        lengths = np.diff(np.concatenate([[0], edges, [col.size]]))
+        first = lengths[0]
+        if col[0] == self.last[c]:
+            first += self.run[c]      # the chunk continues the previous run
+        self.longest[c] = max(self.longest[c], first, lengths.max())
+        self.run[c] = first if lengths.size == 1 else lengths[-1]
+        self.last[c] = col[-1]
+
+    def result(self) -> dict:
+        var = self.m2 / (self.count - 1) if self.count > 1 else np.zeros_like(self.m2)
+        stats = {
+            ch: {
+                "mean": float(self.mean[i]),
+                "var": float(var[i]),
+                "min": float(self.min[i]),
+                "max": float(self.max[i]),
+                "longest_run": int(self.longest[i]),
+            }
+            for i, ch in enumerate(eeg_store.CHANNELS)
+        }
+        cov = np.cov(self.head.T).tolist() if self.head.shape[0] == eeg_store.FS else None
+        return {
+            "n_samples": self.count,
+            "duration_seconds": self.count / eeg_store.FS,
+            "channel_stats": stats,
+            "first_second_cov": cov,
+            "flat_channels": [ch for i, ch in enumerate(eeg_store.CHANNELS) if self.longest[i] >= FLAT_SAMPLES],
+        }
+
+
+def store(db: Session, session_id: int, builder: SummaryBuilder) -> models.SessionSummary:
+    """Add or replace the session's summary row (not committed)."""
+    summary = db.get(models.SessionSummary, session_id)
+    if summary is None:
+        summary = models.SessionSummary(session_id=session_id)
+        db.add(summary)
+    for key, value in builder.result().items():
+        setattr(summary, key, value)
+    return summary
+
+
+def get(db: Session, session_id: int) -> Optional[models.SessionSummary]:
+    return db.get(models.SessionSummary, session_id)
+
+
+def as_dict(summary: models.SessionSummary) -> dict:
+    return {
+        "session_id": summary.session_id,
+        "n_samples": summary.n_samples,
+        "duration_seconds": summary.duration_seconds,
+        "channel_stats": summary.channel_stats,
+        "first_second_cov": summary.first_second_cov,
+        "flat_channels": summary.flat_channels,
+        "computed_at": summary.computed_at,
+    }
+
+
+def feed_stored(db: Session, session_id: int, builder: SummaryBuilder) -> None:
+    """Feed a session's stored samples to `builder`, in order."""
+    start = 0
+    while True:
+        arr = eeg_store.read_range(db, session_id, start, start + 100 * eeg_store.BLOCK_SAMPLES)
+        if arr.shape[0] == 0:
+            break
+        builder.update(arr)
+        start += arr.shape[0]
+
+
+def backfill(db: Session, session_id: int) -> Optional[models.SessionSummary]:
+    """Summarise a session from its stored samples; None if it has no EEG."""
+    builder = SummaryBuilder()
+    feed_stored(db, session_id, builder)
+    if builder.count == 0:
+        return None
+    summary = store(db, session_id, builder)
+    db.commit()
+    return summary
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        missing = db.execute(
+            select(models.Session.id)
+            .where(~select(models.SessionSummary.session_id)
+                   .where(models.SessionSummary.session_id == models.Session.id)
+                   .exists())
+            .order_by(models.Session.id)
+        ).scalars().all()
+        for sid in missing:
+            if backfill(db, sid) is not None:
+                print(f"📝 summarised session {sid}")
+    finally:
+        db.close()
@@ -0,0 +1,123 @@
+# uploads.py
+#
+# Resumable chunked uploads for recordings too large for one request.
+#
+#   POST /uploads                       → {"upload_id", "offset": 0}
+#   PUT  /uploads/{id}?offset=N  <body> → append bytes at N, returns new offset
+#   GET  /uploads/{id}                  → current offset, to resume after a drop
+#   POST /uploads/{id}/complete         → ingest the assembled CSV
+#
+# Parts are appended to a file under UPLOAD_DIR next to a small JSON state
+# file, so an interrupted upload survives a backend restart. Appends to one
+# upload and its completion are serialised by a per-upload lock (lock()), and
+# the file I/O runs in worker threads, buffered to WRITE_BUFFER bytes per write.
+
+import asyncio
+import json
+import os
+import uuid
+import weakref
+from typing import Optional
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads"))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(8 * 1024 ** 3)))
+WRITE_BUFFER = 1024 * 1024
+
+# upload id → lock; an entry lives as long as some append holds or awaits it
+_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+class OffsetMismatch(Exception):
+    def __init__(self, expected: int):
+        super().__init__(f"Upload is at offset {expected}")
+        self.expected = expected
+
+
+def _paths(upload_id: str):
+    base = os.path.join(UPLOAD_DIR, upload_id)
+    return base + ".part", base + ".json"
+
+
+def create(session_id: int, user_id: int, total_size: Optional[int] = None) -> dict:
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    upload_id = uuid.uuid4().hex
+    part, meta = _paths(upload_id)
+    open(part, "wb").close()
+    state = {"upload_id": upload_id, "session_id": session_id, "user_id": user_id,
+             "total_size": total_size}
+    with open(meta, "w") as fh:
+        json.dump(state, fh)
+    return {**state, "offset": 0}
+
+
+def get(upload_id: str) -> Optional[dict]:
+    """State of an upload plus its current offset, or None if unknown."""
+    if not upload_id.isalnum():
+        return None
+    part, meta = _paths(upload_id)
+    try:
+        with open(meta) as fh:
+            state = json.load(fh)
+    except FileNotFoundError:
+        return None
+    state["offset"] = os.path.getsize(part)
+    return state
+
+
+def lock(upload_id: str) -> asyncio.Lock:
+    """The lock held while an upload's part file is appended to or handed off."""
+    lock = _locks.get(upload_id)
+    if lock is None:
+        lock = _locks[upload_id] = asyncio.Lock()
+    return lock
+
+
+async def append(upload_id: str, offset: int, stream) -> int:
+    """
+    Append an async byte stream at `offset`; returns the new offset. The
+    offset check and the write happen under the upload's lock, so two
+    requests resuming from the same offset can't both write.
+    """
+    part, _ = _paths(upload_id)
+    async with lock(upload_id):
+        current = await asyncio.to_thread(os.path.getsize, part)
+        if offset != current:
+            raise OffsetMismatch(current)
+        fh = await asyncio.to_thread(open, part, "ab")
+        buffered = []
+        size = 0
+
+        async def flush():
+            nonlocal current, buffered, size
+            if buffered:
+                await asyncio.to_thread(fh.write, b"".join(buffered))
+                current += size
+                buffered, size = [], 0
+
+        try:
+            async for piece in stream:
+                if current + size + len(piece) > MAX_UPLOAD_BYTES:
+                    buffered, size = [], 0
+                    await asyncio.to_thread(fh.truncate, offset)
+                    raise ValueError(f"Upload exceeds {MAX_UPLOAD_BYTES} bytes")
+                buffered.append(piece)
+                size += len(piece)
+                if size >= WRITE_BUFFER:
+                    await flush()
+        finally:
+            # a dropped connection keeps what arrived, so the client resumes from there
+            await flush()
+            await asyncio.to_thread(fh.close)
+    return current
+
+
+def part_path(upload_id: str) -> str:
+    return _paths(upload_id)[0]
+
+
+def discard(upload_id: str) -> None:
+    for path in _paths(upload_id):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,12 @@
+# The backend is a flat set of modules run from Back/src; make them importable.
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+# loadenv.Settings reads these at import time: point the app at a throwaway SQLite file.
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ.setdefault("DATABASE_URI", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "backend_test.db"))
@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("pydantic_settings")   # loadenv.Settings
+pytest.importorskip("greenlet")            # AsyncSession
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+import auth_cache
+import models
+from database import Base
+
+
+@pytest.fixture
+def urls(tmp_path):
+    path = tmp_path / "auth.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    auth_cache.clear()
+    for counter in auth_cache._stats:
+        auth_cache._stats[counter] = 0
+    yield f"sqlite:///{path}", f"sqlite+aiosqlite:///{path}"
+    engine.dispose()
+    auth_cache.clear()
+
+
+@pytest.fixture
+def db(urls):
+    engine = create_engine(urls[0])
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def user(db):
+    user = models.User(
+        name="Ada", father_surname="L", mother_surname="B", medical_department="Neuro",
+        email="ada@example.com", hashed_password="x", is_active=True,
+    )
+    db.add(user)
+    db.commit()
+    return user
+
+
+def _get(urls, token):
+    """auth_cache.get() on a fresh AsyncSession: (user or None, attached to it)."""
+    async def run():
+        engine = create_async_engine(urls[1])
+        try:
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                cached = await auth_cache.get(session, token)
+                return cached, cached is not None and cached in session
+        finally:
+            await engine.dispose()
+    return asyncio.run(run())
+
+
+def test_hit_is_attached_to_the_callers_session(urls, user):
+    auth_cache.put("t1", user)
+    cached, attached = _get(urls, "t1")
+    assert cached is not None and attached
+    assert cached.id == user.id and cached.email == "ada@example.com"
+
+
+def test_deactivation_evicts_tokens(urls, db, user):
+    auth_cache.put("t1", user)
+    auth_cache.put("t2", user)
+    user.is_active = False
+    db.commit()   # after_update
+    assert _get(urls, "t1")[0] is None
+    assert _get(urls, "t2")[0] is None
+    assert auth_cache.stats()["invalidated"] == 2
+
+
+def test_delete_evicts_tokens(urls, db, user):
+    auth_cache.put("t1", user)
+    db.delete(user)
+    db.commit()   # after_delete
+    assert _get(urls, "t1")[0] is None
+
+
+def test_other_users_tokens_survive(urls, db, user):
+    other = models.User(
+        name="Bo", father_surname="L", mother_surname="B", medical_department="Neuro",
+        email="bo@example.com", hashed_password="x", is_active=True,
+    )
+    db.add(other)
+    db.commit()
+    auth_cache.put("mine", user)
+    auth_cache.put("theirs", other)
+    other.is_active = False
+    db.commit()
+    assert _get(urls, "mine")[0] is not None
+    assert _get(urls, "theirs")[0] is None
+
+
+def test_entry_never_outlives_token_exp(urls, user, monkeypatch):
+    monkeypatch.setattr(auth_cache, "TOKEN_CACHE_TTL", 3600)
+    exp = time.time() + 0.2
+    auth_cache.put("t1", user, token_exp=exp)
+    assert auth_cache._entries["t1"][1] == exp
+    assert _get(urls, "t1")[0] is not None
+    time.sleep(0.3)
+    assert _get(urls, "t1")[0] is None
+    assert auth_cache.stats()["expired"] == 1
+
+
+def test_ttl_applies_when_token_lives_longer(urls, user, monkeypatch):
+    monkeypatch.setattr(auth_cache, "TOKEN_CACHE_TTL", 0.1)
+    auth_cache.put("t1", user, token_exp=time.time() + 3600)
+    time.sleep(0.2)
+    assert _get(urls, "t1")[0] is None
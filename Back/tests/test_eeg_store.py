@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("pydantic_settings")   # loadenv.Settings
+pytest.importorskip("greenlet")            # database.py builds the async engine too
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+import eeg_store
+import models
+from database import Base
+
+B = eeg_store.BLOCK_SAMPLES
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'eeg.db'}")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _samples(n, seed=0):
+    # float32-representable values, so the round trip is exact
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(n, eeg_store.N_CHANNELS)).astype("<f4").astype(np.float64)
+
+
+def _write(db, session_id, arr, chunk):
+    writer = eeg_store.BlockWriter(db, session_id)
+    for lo in range(0, arr.shape[0], chunk):
+        writer.append(arr[lo:lo + chunk])
+    assert writer.close() == arr.shape[0]
+    db.flush()
+
+
+def test_encode_decode_block():
+    arr = _samples(37)
+    np.testing.assert_array_equal(eeg_store.decode_block(eeg_store.encode_block(arr), 37), arr)
+
+
+@pytest.mark.parametrize("chunk", [1, 100, B, 3 * B + 5])
+def test_read_range_round_trip(db, chunk):
+    arr = _samples(2 * B + 300)
+    _write(db, 1, arr, chunk)
+    assert eeg_store.stored_samples(db, 1) == arr.shape[0]
+    np.testing.assert_array_equal(eeg_store.read_range(db, 1), arr)
+    for start, stop in [(0, 1), (5, B), (B - 3, B + 3), (B, 2 * B), (2 * B + 299, None), (17, 2 * B + 300)]:
+        np.testing.assert_array_equal(eeg_store.read_range(db, 1, start, stop), arr[start:stop])
+
+
+def test_read_range_outside_recording(db):
+    _write(db, 1, _samples(50), 50)
+    assert eeg_store.read_range(db, 1, 50).shape == (0, eeg_store.N_CHANNELS)
+    assert eeg_store.read_range(db, 1, 10, 10).shape == (0, eeg_store.N_CHANNELS)
+    assert eeg_store.read_range(db, 2).shape == (0, eeg_store.N_CHANNELS)
+
+
+def test_appended_upload_continues_after_short_tail(db):
+    first, second = _samples(B + 10, seed=1), _samples(B + 20, seed=2)
+    _write(db, 1, first, 64)
+    _write(db, 1, second, 64)
+    both = np.concatenate([first, second])
+    np.testing.assert_array_equal(eeg_store.read_range(db, 1), both)
+    np.testing.assert_array_equal(eeg_store.read_range(db, 1, B, B + 40), both[B:B + 40])
+
+
+def test_shared_payload_reads_owner_blocks(db):
+    arr = _samples(B + 1)
+    _write(db, 1, arr, B)
+    payload = models.EegPayload(fingerprint="f" * 64, owner_session_id=1, n_samples=arr.shape[0])
+    db.add(payload)
+    db.flush()
+    db.add(models.Session(id=2, patient_id=1, flag="x", eeg_payload_id=payload.id))
+    db.flush()
+    np.testing.assert_array_equal(eeg_store.read_range(db, 2, 3, 9), arr[3:9])
+    assert eeg_store.has_eeg(db, 2)
+
+
+def test_legacy_rows_fallback(db):
+    arr = _samples(20)
+    db.execute(insert(models.EegData), [
+        {"session_id": 3, **{ch: float(v) for ch, v in zip(eeg_store.CHANNELS, row)}} for row in arr
+    ])
+    np.testing.assert_array_equal(eeg_store.read_range(db, 3), arr)
+    np.testing.assert_array_equal(eeg_store.read_range(db, 3, 4, 11), arr[4:11])
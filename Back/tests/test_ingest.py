@@ -0,0 +1,107 @@
+import io
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pydantic_settings")   # loadenv.Settings
+pytest.importorskip("greenlet")            # database.py builds the async engine too
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import eeg_store
+import ingest
+import models
+import session_summary
+from database import Base
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ingest.db'}")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    for sid in (1, 2, 3):
+        session.add(models.Session(id=sid, patient_id=1, flag="x"))
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _samples(n, seed):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(n, eeg_store.N_CHANNELS)).astype("<f4").astype(np.float64)
+
+
+def _csv(arr):
+    buf = io.StringIO()
+    buf.write(",".join(eeg_store.CHANNELS) + "\n")
+    np.savetxt(buf, arr, delimiter=",", fmt="%.9g")
+    return io.BytesIO(buf.getvalue().encode())
+
+
+def test_duplicate_first_upload_shares_payload(db):
+    arr = _samples(300, seed=1)
+    first = ingest.ingest_stream(db, 1, _csv(arr))
+    second = ingest.ingest_stream(db, 2, _csv(arr))
+    assert not first["deduplicated"] and second["deduplicated"]
+    assert second["fingerprint"] == first["fingerprint"]
+    assert eeg_store.stored_samples(db, 2) == 0
+    np.testing.assert_array_equal(eeg_store.read_range(db, 2), arr)
+
+
+def test_duplicate_is_never_written(db, monkeypatch):
+    arr = _samples(300, seed=1)
+    ingest.ingest_stream(db, 1, _csv(arr))
+
+    def no_writes(*args, **kwargs):
+        raise AssertionError("a duplicate recording must not be written")
+
+    monkeypatch.setattr(eeg_store, "BlockWriter", no_writes)
+    assert ingest.ingest_stream(db, 2, _csv(arr))["deduplicated"]
+    assert session_summary.get(db, 2).n_samples == 300
+
+
+def test_second_upload_appends(db):
+    a, b = _samples(200, seed=1), _samples(150, seed=2)
+    ingest.ingest_stream(db, 1, _csv(a))
+    stats = ingest.ingest_stream(db, 1, _csv(b))
+    assert stats["appended"] and not stats["deduplicated"]
+    assert stats["inserted"] == 150
+    np.testing.assert_array_equal(eeg_store.read_range(db, 1), np.concatenate([a, b]))
+    assert session_summary.get(db, 1).n_samples == 350
+
+
+def test_appending_to_a_sharing_session_leaves_the_owner_alone(db):
+    a, b = _samples(200, seed=1), _samples(50, seed=2)
+    ingest.ingest_stream(db, 1, _csv(a))
+    ingest.ingest_stream(db, 2, _csv(a))
+    ingest.ingest_stream(db, 2, _csv(b))
+    np.testing.assert_array_equal(eeg_store.read_range(db, 1), a)
+    np.testing.assert_array_equal(eeg_store.read_range(db, 2), np.concatenate([a, b]))
+    assert db.get(models.Session, 2).eeg_payload_id is None
+
+
+def test_appending_to_the_owner_hands_the_payload_on(db):
+    a, b = _samples(200, seed=1), _samples(50, seed=2)
+    ingest.ingest_stream(db, 1, _csv(a))
+    ingest.ingest_stream(db, 2, _csv(a))
+    ingest.ingest_stream(db, 3, _csv(a))
+    ingest.ingest_stream(db, 1, _csv(b))
+    np.testing.assert_array_equal(eeg_store.read_range(db, 1), np.concatenate([a, b]))
+    for sid in (2, 3):
+        np.testing.assert_array_equal(eeg_store.read_range(db, sid), a)
+    payload = db.get(models.EegPayload, db.get(models.Session, 3).eeg_payload_id)
+    assert payload.owner_session_id == 2
+
+
+def test_appending_after_legacy_rows(db):
+    a, b = _samples(30, seed=1), _samples(20, seed=2)
+    for row in a:
+        db.add(models.EegData(session_id=1, **{ch: float(v) for ch, v in zip(eeg_store.CHANNELS, row)}))
+    db.commit()
+    ingest.ingest_stream(db, 1, _csv(b))
+    np.testing.assert_array_equal(eeg_store.read_range(db, 1), np.concatenate([a, b]))
+    assert db.query(models.EegData).count() == 0
@@ -0,0 +1,146 @@
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+import kalman_client
+
+
+def _form(request) -> dict:
+    return {k: v[0] for k, v in parse_qs(request.content.decode()).items()}
+
+
+def _client(handler) -> httpx.AsyncClient:
+    return httpx.AsyncClient(base_url="http://kalman.test", transport=httpx.MockTransport(handler))
+
+
+def _ok(request):
+    return httpx.Response(200, json={"session_run_id": 100 + int(_form(request)["session_id"])})
+
+
+@pytest.fixture
+def use_client(monkeypatch):
+    def install(handler):
+        monkeypatch.setattr(kalman_client, "_client", _client(handler))
+    yield install
+    monkeypatch.setattr(kalman_client, "_client", None)
+
+
+async def _collect(models_list, data_for):
+    return [result async for result in kalman_client.run_models(models_list, data_for)]
+
+
+def test_one_failing_model_does_not_drop_the_others(use_client):
+    def handler(request):
+        if _form(request)["variant"] == "B":
+            return httpx.Response(500, text="boom")
+        return _ok(request)
+
+    use_client(handler)
+    data_for = {name: {"variant": name, "session_id": i} for i, name in enumerate("ABC")}
+    results = {r["model"]: r for r in asyncio.run(_collect(list("ABC"), data_for))}
+
+    assert results["A"]["status"] == "success" and results["A"]["session_run_id"] == 100
+    assert results["C"]["status"] == "success" and results["C"]["session_run_id"] == 102
+    assert results["B"]["status"] == "failed" and "HTTP 500" in results["B"]["error"]
+
+
+def test_models_run_concurrently(use_client, monkeypatch):
+    monkeypatch.setattr(kalman_client, "KALMAN_CONCURRENCY", 3)
+    in_flight, peak = 0, 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return _ok(request)
+
+    use_client(handler)
+    data_for = {name: {"variant": name, "session_id": i} for i, name in enumerate("ABCDE")}
+    results = asyncio.run(_collect(list("ABCDE"), data_for))
+    assert len(results) == 5 and all(r["status"] == "success" for r in results)
+    assert peak == 3
+
+
+def test_429_is_retried_after_retry_after(use_client, monkeypatch):
+    calls, waits = [], []
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(seconds):
+        waits.append(seconds)
+        await real_sleep(0)
+
+    def handler(request):
+        calls.append(request.url.path)
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"Retry-After": "7"}, json={"detail": "busy"})
+        return _ok(request)
+
+    monkeypatch.setattr(kalman_client.asyncio, "sleep", fake_sleep)
+    use_client(handler)
+    results = asyncio.run(_collect(["A"], {"A": {"variant": "A", "session_id": 1}}))
+
+    assert results[0]["status"] == "success"
+    assert calls == ["/run-kalman", "/run-kalman"]
+    assert waits == [7.0]
+
+
+def test_429_gives_up_after_max_retries(use_client, monkeypatch):
+    monkeypatch.setattr(kalman_client, "KALMAN_MAX_RETRIES", 1)
+    monkeypatch.setattr(kalman_client, "MAX_RETRY_WAIT", 0.0)
+    calls = []
+
+    def handler(request):
+        calls.append(1)
+        return httpx.Response(429, headers={"Retry-After": "1"})
+
+    use_client(handler)
+    results = asyncio.run(_collect(["A"], {"A": {"variant": "A", "session_id": 1}}))
+    assert results[0]["status"] == "failed" and "429" in results[0]["error"]
+    assert len(calls) == 2
+
+
+def test_timeout_cancels_the_job(use_client):
+    cancelled = []
+
+    def handler(request):
+        if request.url.path == "/run-kalman":
+            raise httpx.ReadTimeout("too slow", request=request)
+        cancelled.append(request.url.path)
+        return httpx.Response(200, json={"status": "cancelling"})
+
+    use_client(handler)
+    data = {"variant": "A", "session_id": 1, "job_id": "job-a"}
+    results = asyncio.run(_collect(["A"], {"A": data}))
+    assert results[0]["status"] == "failed" and "Timed out" in results[0]["error"]
+    assert cancelled == ["/jobs/job-a/cancel"]
+
+
+def test_abandoned_analysis_cancels_running_jobs(use_client):
+    cancelled = []
+
+    async def handler(request):
+        if request.url.path == "/run-kalman":
+            await asyncio.sleep(10)
+            return _ok(request)
+        cancelled.append(request.url.path)
+        return httpx.Response(200, json={"status": "cancelling"})
+
+    use_client(handler)
+
+    async def scenario():
+        data_for = {name: {"variant": name, "session_id": 1, "job_id": f"job-{name}"} for name in "AB"}
+        task = asyncio.create_task(_collect(["A", "B"], data_for))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.gather(*kalman_client._cancellations)
+
+    asyncio.run(scenario())
+    assert sorted(cancelled) == ["/jobs/job-A/cancel", "/jobs/job-B/cancel"]
@@ -0,0 +1,54 @@
+import pytest
+
+pytest.importorskip("pydantic_settings")   # loadenv.Settings
+pytest.importorskip("greenlet")            # database.py builds the async engine too
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import create_engine
+
+import migrations
+from database import Base
+
+
+@pytest.fixture
+def bind(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'plans.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def test_upgrade_is_idempotent(bind):
+    assert migrations.upgrade(bind) == [version for version, _ in migrations.MIGRATIONS]
+    assert migrations.upgrade(bind) == []
+
+
+def test_hot_queries_use_indexes_on_sqlite(bind):
+    migrations.upgrade(bind)
+    report = migrations.check_query_plans(bind)
+    assert len(report) == len(migrations.hot_queries())
+    scans = [(name, plan) for name, ok, plan in report if not ok]
+    assert scans == []
+
+
+@pytest.mark.parametrize("detail, ok", [
+    ("SEARCH results_y USING INDEX ix_results_y_session_label_time (session_id=? AND label=?)", True),
+    ("SEARCH sessions USING COVERING INDEX ix_sessions_patient_id (patient_id=?)", True),
+    ("SEARCH users USING INTEGER PRIMARY KEY (rowid=?)", True),
+    ("SCAN results_y", False),
+    ("SCAN results_y USING COVERING INDEX ix_results_y_session_label_time", False),
+    ("SCAN results_y USING INDEX ix_results_y_session_label_time", False),
+])
+def test_sqlite_plan_rows(detail, ok):
+    assert migrations._uses_index("sqlite", [(2, 0, 0, detail)]) is ok
+
+
+def test_sqlite_sort_step_alone_does_not_count_as_index():
+    assert not migrations._uses_index("sqlite", [(2, 0, 0, "USE TEMP B-TREE FOR ORDER BY")])
+
+
+def test_unsupported_dialect_is_skipped(bind, monkeypatch):
+    monkeypatch.setattr(bind.dialect, "name", "postgresql")
+    report = migrations.check_query_plans(bind)
+    assert [name for name, _, _ in report] == list(migrations.hot_queries())
+    assert all(ok is None and plan == [] for _, ok, plan in report)
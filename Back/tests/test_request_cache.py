@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+import request_cache
+
+
+@pytest.fixture(autouse=True)
+def memory_backend(monkeypatch):
+    monkeypatch.setattr(request_cache, "_backend", request_cache._MemoryBackend())
+
+
+def _counting(value):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return value
+
+    return compute, calls
+
+
+def test_hit_until_invalidated():
+    compute, calls = _counting({"patients": [1, 2]})
+
+    async def scenario():
+        first = await request_cache.cached(7, "patients", compute)
+        second = await request_cache.cached(7, "patients", compute)
+        await request_cache.invalidate(7)
+        third = await request_cache.cached(7, "patients", compute)
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+    assert first == second == third == {"patients": [1, 2]}
+    assert len(calls) == 2
+
+
+def test_users_are_invalidated_separately():
+    compute, calls = _counting([])
+
+    async def scenario():
+        await request_cache.cached(1, "patients", compute)
+        await request_cache.cached(2, "patients", compute)
+        request_cache.invalidate_blocking(1)
+        await request_cache.cached(1, "patients", compute)
+        await request_cache.cached(2, "patients", compute)
+
+    asyncio.run(scenario())
+    assert len(calls) == 3
+
+
+def test_run_affected_resources_bypass_an_unshared_cache():
+    compute, calls = _counting({"results": []})
+
+    async def scenario():
+        for _ in range(3):
+            await request_cache.cached(1, "sessions/5/results", compute, changed_by_runs=True)
+
+    asyncio.run(scenario())
+    assert len(calls) == 3
+
+
+def test_hit_is_a_fresh_copy():
+    compute, _ = _counting({"items": [1]})
+
+    async def scenario():
+        await request_cache.cached(1, "patients", compute)
+        hit = await request_cache.cached(1, "patients", compute)
+        hit["items"].append(2)
+        return await request_cache.cached(1, "patients", compute)
+
+    assert asyncio.run(scenario()) == {"items": [1]}
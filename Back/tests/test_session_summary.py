@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("pydantic_settings")   # loadenv.Settings, via models
+pytest.importorskip("greenlet")            # database.py builds the async engine too
+pytest.importorskip("aiosqlite")
+
+import eeg_store
+import session_summary
+
+FS = eeg_store.FS
+
+
+def _feed(arr, sizes):
+    builder = session_summary.SummaryBuilder()
+    lo = 0
+    for size in sizes:
+        builder.update(arr[lo:lo + size])
+        lo += size
+    builder.update(arr[lo:])
+    return builder
+
+
+def test_moments_and_initial_cov_match_numpy():
+    rng = np.random.default_rng(3)
+    arr = (rng.normal(size=(1000, eeg_store.N_CHANNELS)) * 50 + 4000).astype("<f4").astype(np.float64)
+    result = _feed(arr, [1, 7, 60, 200, 3, 0, 500]).result()
+
+    assert result["n_samples"] == 1000
+    assert result["duration_seconds"] == pytest.approx(1000 / FS)
+    stats = result["channel_stats"]
+    for i, ch in enumerate(eeg_store.CHANNELS):
+        assert stats[ch]["mean"] == pytest.approx(arr[:, i].mean(), rel=1e-12)
+        assert stats[ch]["var"] == pytest.approx(arr[:, i].var(ddof=1), rel=1e-9)
+        assert stats[ch]["min"] == arr[:, i].min()
+        assert stats[ch]["max"] == arr[:, i].max()
+    np.testing.assert_allclose(result["first_second_cov"], np.cov(arr[:FS].T), rtol=1e-9)
+
+
+def test_initial_cov_needs_a_full_second():
+    arr = np.random.default_rng(4).normal(size=(FS - 1, eeg_store.N_CHANNELS))
+    assert _feed(arr, [10, 50]).result()["first_second_cov"] is None
+
+
+def test_flat_run_across_chunk_boundaries(monkeypatch):
+    monkeypatch.setattr(session_summary, "FLAT_SAMPLES", 40)
+    rng = np.random.default_rng(5)
+    arr = rng.normal(size=(200, eeg_store.N_CHANNELS))
+    arr[50:95, 2] = 7.0     # 45 equal samples, split by the boundaries at 60 and 90
+    arr[120:150, 5] = 1.0   # 30 equal samples: below the threshold
+    result = _feed(arr, [60, 30, 40]).result()
+
+    assert result["channel_stats"][eeg_store.CHANNELS[2]]["longest_run"] == 45
+    assert result["channel_stats"][eeg_store.CHANNELS[5]]["longest_run"] == 30
+    assert result["flat_channels"] == [eeg_store.CHANNELS[2]]
+
+
+def test_run_continuing_into_single_value_chunks():
+    arr = np.random.default_rng(6).normal(size=(20, eeg_store.N_CHANNELS))
+    arr[5:15, 0] = 2.0
+    builder = _feed(arr, [6] + [1] * 8)   # the run spans one-sample chunks
+    assert builder.result()["channel_stats"][eeg_store.CHANNELS[0]]["longest_run"] == 10
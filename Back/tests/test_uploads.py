@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+import uploads
+
+
+@pytest.fixture(autouse=True)
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", str(tmp_path))
+    yield tmp_path
+
+
+async def _chunks(*pieces, pause=0.0):
+    for piece in pieces:
+        await asyncio.sleep(pause)
+        yield piece
+
+
+def test_append_and_resume():
+    upload = uploads.create(session_id=1, user_id=2, total_size=9)
+    upload_id = upload["upload_id"]
+    assert upload["offset"] == 0
+
+    assert asyncio.run(uploads.append(upload_id, 0, _chunks(b"abc", b"def"))) == 6
+    assert uploads.get(upload_id)["offset"] == 6
+    assert asyncio.run(uploads.append(upload_id, 6, _chunks(b"ghi"))) == 9
+    with open(uploads.part_path(upload_id), "rb") as fh:
+        assert fh.read() == b"abcdefghi"
+
+
+def test_wrong_offset_reports_where_to_resume():
+    upload_id = uploads.create(1, 2)["upload_id"]
+    asyncio.run(uploads.append(upload_id, 0, _chunks(b"abcd")))
+    for offset in (0, 2, 10):
+        with pytest.raises(uploads.OffsetMismatch) as exc:
+            asyncio.run(uploads.append(upload_id, offset, _chunks(b"x")))
+        assert exc.value.expected == 4
+    assert uploads.get(upload_id)["offset"] == 4
+
+
+def test_concurrent_appends_at_same_offset():
+    upload_id = uploads.create(1, 2)["upload_id"]
+
+    async def race():
+        return await asyncio.gather(
+            uploads.append(upload_id, 0, _chunks(b"aa", b"aa", pause=0.01)),
+            uploads.append(upload_id, 0, _chunks(b"bb", b"bb", pause=0.01)),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(race())
+    assert sorted(type(r).__name__ for r in results) == ["OffsetMismatch", "int"]
+    with open(uploads.part_path(upload_id), "rb") as fh:
+        assert fh.read() in (b"aaaa", b"bbbb")
+
+
+def test_oversized_append_is_rolled_back(monkeypatch):
+    monkeypatch.setattr(uploads, "MAX_UPLOAD_BYTES", 8)
+    upload_id = uploads.create(1, 2)["upload_id"]
+    asyncio.run(uploads.append(upload_id, 0, _chunks(b"abcd")))
+    with pytest.raises(ValueError):
+        asyncio.run(uploads.append(upload_id, 4, _chunks(b"ef", b"ghi")))
+    assert uploads.get(upload_id)["offset"] == 4
+
+
+def test_dropped_stream_keeps_received_bytes():
+    upload_id = uploads.create(1, 2)["upload_id"]
+
+    async def dropped():
+        yield b"abc"
+        raise ConnectionResetError("client went away")
+
+    with pytest.raises(ConnectionResetError):
+        asyncio.run(uploads.append(upload_id, 0, dropped()))
+    assert uploads.get(upload_id)["offset"] == 3
+
+
+def test_unknown_upload():
+    assert uploads.get("does-not-exist") is None
+    assert uploads.get("0" * 32) is None
+
+
+def test_lock_waits_for_an_append_in_flight():
+    upload_id = uploads.create(1, 2)["upload_id"]
+
+    async def scenario():
+        writing = asyncio.create_task(
+            uploads.append(upload_id, 0, _chunks(b"ab", b"cd", b"ef", pause=0.01))
+        )
+        await asyncio.sleep(0.005)   # the append now holds the lock
+        async with uploads.lock(upload_id):
+            offset = uploads.get(upload_id)["offset"]
+        await writing
+        return offset
+
+    assert asyncio.run(scenario()) == 6
+
+
+def test_append_to_a_completed_upload():
+    upload_id = uploads.create(1, 2)["upload_id"]
+    uploads.discard(upload_id)
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(uploads.append(upload_id, 0, _chunks(b"x")))
@@ -19,8 +19,11 @@ def observation_matrices(m_all, m_sig, m_nsig):
     return H_all, H_sig, H_nsig
 
 def readSignal(path, samplingRate):
-    data = np.genfromtxt(path, delimiter=',')
-    data = np.delete(data, 0, axis=0)  # drop header row
+    if isinstance(path, np.ndarray):
+        data = path  # already [n_samples, n_sensors], no header
+    else:
+        data = np.genfromtxt(path, delimiter=',')
+        data = np.delete(data, 0, axis=0)  # drop header row
     sessions = []
     total = (len(data) // samplingRate) * samplingRate
     for i in range(0, total, samplingRate):
@@ -145,7 +148,7 @@ def bierman_update(S_p, H, R, x_p, y):
 
 # --- Ensemble Kalman wrapper returning all 7 outputs ---
 
-def ensamble_kalman(name_Signal, Fs, wC):
+def ensamble_kalman(name_Signal, Fs, wC, progress=None, cancel=None, initial_cov=None):
     numberSensors = len(wC)
     invertWC = np.where(wC == 1, 0, 1)
     signal = readSignal(name_Signal, Fs)
@@ -159,7 +162,7 @@ def ensamble_kalman(name_Signal, Fs, wC):
     yAll, yWC, yNWC = [], [], []
 
     # Initial full covariance & states
-    initialP = np.cov(signal[0])
+    initialP = np.cov(signal[0]) if initial_cov is None else np.array(initial_cov, dtype=float)
     pk_all   = initialP.copy()
     pk_sig   = initialP.copy()
     pk_nsig  = initialP.copy()
@@ -180,6 +183,11 @@ def ensamble_kalman(name_Signal, Fs, wC):
     S_nsig = getNextSquareRoot(pk_nsig, Q_eye, F0_nsig, 'initial')
 
     for i, block in enumerate(signal):
+        if cancel is not None and cancel.is_set():
+            # keep only the blocks processed so far
+            resultAll, resultOriginal = resultAll[:i], resultOriginal[:i]
+            resultWC, resultNWC = resultWC[:i], resultNWC[:i]
+            break
         for j in range(Fs):
             # --- TIME UPDATE ---
             F = taylor_series(Fs, numberSensors)
@@ -235,13 +243,15 @@ def ensamble_kalman(name_Signal, Fs, wC):
 
             kind = 'other'
         # end inner loop
+        if progress is not None:
+            progress(i + 1, len(signal))
     # end outer loop
 
     return resultAll, resultOriginal, resultWC, resultNWC, yAll, yWC, yNWC
 
 # --- Adapter for batch script ---
-def run(nameSignal, Fs, wC):
-    return ensamble_kalman(nameSignal, Fs, wC)
+def run(nameSignal, Fs, wC, progress=None, cancel=None, initial_cov=None):
+    return ensamble_kalman(nameSignal, Fs, wC, progress=progress, cancel=cancel, initial_cov=initial_cov)
 
 if __name__ == '__main__':
     # Prevent auto‐execution on import
@@ -20,8 +20,11 @@ def observation_matrices(m_all, m_sig, m_nsig):
 
 
 def readSignal(path, samplingRate):
-    data = np.genfromtxt(path, delimiter=',')
-    data = np.delete(data, 0, axis=0)
+    if isinstance(path, np.ndarray):
+        data = path  # already [n_samples, n_sensors], no header
+    else:
+        data = np.genfromtxt(path, delimiter=',')
+        data = np.delete(data, 0, axis=0)
     sessions = []
     total = (len(data) // samplingRate) * samplingRate
     for i in range(0, total, samplingRate):
@@ -119,7 +122,7 @@ def carlsonFilter(prevS, H, R, x_prev, y):
 
 # --- Extended EnKF to return 7 outputs ---
 
-def ensamble_kalman(nameSignal, Fs, wC):
+def ensamble_kalman(nameSignal, Fs, wC, progress=None, cancel=None, initial_cov=None):
     m = len(wC)
     invertWC = np.where(wC == 1, 0, 1)
     sig = readSignal(nameSignal, Fs)
@@ -133,7 +136,7 @@ def ensamble_kalman(nameSignal, Fs, wC):
     yAll, yWC, yNWC = [], [], []
 
     # Initial full covariance & state
-    P_all = np.cov(sig[0])
+    P_all = np.cov(sig[0]) if initial_cov is None else np.array(initial_cov, dtype=float)
     P_sig = P_all.copy()
     P_nsig = P_all.copy()
     x_all = np.zeros((m, 1))
@@ -154,6 +157,11 @@ def ensamble_kalman(nameSignal, Fs, wC):
     kind = "other"  # subsequent updates use 'other'
 
     for i, block in enumerate(sig):
+        if cancel is not None and cancel.is_set():
+            # keep only the blocks processed so far
+            resultAll, resultOriginal = resultAll[:i], resultOriginal[:i]
+            resultWC, resultNWC = resultWC[:i], resultNWC[:i]
+            break
         for j in range(Fs):
             # --- TIME UPDATE ---
             F      = taylor_series(Fs, m)
@@ -199,14 +207,16 @@ def ensamble_kalman(nameSignal, Fs, wC):
 
             kind = "other"
         # end inner loop
+        if progress is not None:
+            progress(i + 1, len(sig))
     # end outer loop
 
     return resultAll, resultOriginal, resultWC, resultNWC, yAll, yWC, yNWC
 
 
 # Adapter for batch script
-def run(nameSignal, Fs, wC):
-    return ensamble_kalman(nameSignal, Fs, wC)
+def run(nameSignal, Fs, wC, progress=None, cancel=None, initial_cov=None):
+    return ensamble_kalman(nameSignal, Fs, wC, progress=progress, cancel=cancel, initial_cov=initial_cov)
 
 
 if __name__ == '__main__':
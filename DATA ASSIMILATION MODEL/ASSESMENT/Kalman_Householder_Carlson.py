@@ -25,8 +25,11 @@ def observation_matrices(m_all, m_sig, m_nsig):
 
 
 def readSignal(path, samplingRate):
-    data = np.genfromtxt(path, delimiter=",")
-    data = np.delete(data, 0, axis=0)  # drop header
+    if isinstance(path, np.ndarray):
+        data = path  # already [n_samples, n_sensors], no header
+    else:
+        data = np.genfromtxt(path, delimiter=",")
+        data = np.delete(data, 0, axis=0)  # drop header
     sessions = []
     total = (len(data) // samplingRate) * samplingRate
     for i in range(0, total, samplingRate):
@@ -131,7 +134,7 @@ def carlsonFilter(prevS, H, R, x_prev, y):
 
 # --- Extended EnKF returning all 7 outputs ---
 
-def ensamble_kalman(nameSignal, Fs, wC):
+def ensamble_kalman(nameSignal, Fs, wC, progress=None, cancel=None, initial_cov=None):
     m = len(wC)
     invertWC = np.where(wC == 1, 0, 1)
     sig = readSignal(nameSignal, Fs)
@@ -145,7 +148,7 @@ def ensamble_kalman(nameSignal, Fs, wC):
     yAll, yWC, yNWC = [], [], []
 
     # Initial full covariance and state
-    P_all = np.cov(sig[0])
+    P_all = np.cov(sig[0]) if initial_cov is None else np.array(initial_cov, dtype=float)
     P_sig = P_all.copy()
     P_nsig = P_all.copy()
     x_all = np.zeros((m, 1))
@@ -165,6 +168,11 @@ def ensamble_kalman(nameSignal, Fs, wC):
     kind = "other"  # Subsequent calls use 'other'
 
     for i, block in enumerate(sig):
+        if cancel is not None and cancel.is_set():
+            # keep only the blocks processed so far
+            resultAll, resultOriginal = resultAll[:i], resultOriginal[:i]
+            resultWC, resultNWC = resultWC[:i], resultNWC[:i]
+            break
         # For each session block, we carry over S_all, S_sig, S_nsig, x_all, etc.
         for j in range(Fs):
             # Build F matrices at each step
@@ -218,6 +226,8 @@ def ensamble_kalman(nameSignal, Fs, wC):
             P_nsig = S_nsig @ S_nsig.T
 
         # end inner loop j
+        if progress is not None:
+            progress(i + 1, len(sig))
 
     # end outer loop i
 
@@ -225,8 +235,8 @@ def ensamble_kalman(nameSignal, Fs, wC):
 
 
 # Adapter for batch script
-def run(nameSignal, Fs, wC):
-    return ensamble_kalman(nameSignal, Fs, wC)
+def run(nameSignal, Fs, wC, progress=None, cancel=None, initial_cov=None):
+    return ensamble_kalman(nameSignal, Fs, wC, progress=progress, cancel=cancel, initial_cov=initial_cov)
 
 
 # If this file is run directly, do nothing (avoids auto‐execution on import)
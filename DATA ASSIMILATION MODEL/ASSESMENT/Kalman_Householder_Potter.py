@@ -73,7 +73,8 @@ def readSignal(nameSignal, samplingRate):
     based on the given sampling rate.
 
     Parameters:
-        - nameSignal (str): The file path of the signal data.
+        - nameSignal (str or numpy.ndarray): The file path of the signal data, or
+          an already loaded [samples, sensors] array (no header row).
         - samplingRate (int): The number of samples per second.
 
     It does so by:
@@ -85,8 +86,11 @@ def readSignal(nameSignal, samplingRate):
         - sessionMatrix (numpy.ndarray): A 3D array where each session is a 2D array
           of EEG data with dimensions [sessions, sensors, samples].
     """
-    my_data = np.genfromtxt(nameSignal, delimiter=",")
-    x = np.delete(my_data, (0), axis=0)
+    if isinstance(nameSignal, np.ndarray):
+        x = nameSignal
+    else:
+        my_data = np.genfromtxt(nameSignal, delimiter=",")
+        x = np.delete(my_data, (0), axis=0)
     sessionMatrix = []
 
     i = 0
@@ -298,7 +302,7 @@ def getNextSquareRoot(P, Q, F, typeM):
     return SnewT.T
 
 
-def ensamble_kalman(name_Signal, samplingRate, wC):
+def ensamble_kalman(name_Signal, samplingRate, wC, progress=None, cancel=None, initial_cov=None):
     """
     This function implements the Ensemble Kalman Filter (EnKF) to process EEG signals
     and generate results for different sensor configurations: all sensors, original data,
@@ -308,6 +312,13 @@ def ensamble_kalman(name_Signal, samplingRate, wC):
         - name_Signal (str): Path to the CSV file containing EEG signal data.
         - samplingRate (int): Number of samples per second (sampling frequency).
         - wC (numpy.ndarray): Binary array representing significant sensors (1 for significant, 0 otherwise).
+        - progress (callable, optional): Called as progress(seconds_done, seconds_total)
+          after every one-second block.
+        - cancel (optional): Object with is_set(); checked before every block, and when
+          it returns True only the blocks processed so far are returned.
+        - initial_cov (array-like, optional): 14×14 initial covariance, e.g. the
+          precomputed first-second covariance of a stored session; computed from
+          the first one-second block when omitted.
 
     Returns:
         - resultAll (numpy.ndarray): Filtered results for all sensors.
@@ -357,7 +368,7 @@ def ensamble_kalman(name_Signal, samplingRate, wC):
 
     matrixState = signal[0]
 
-    initialP = np.cov(matrixState)
+    initialP = np.cov(matrixState) if initial_cov is None else np.array(initial_cov, dtype=float)
     pk = initialP.copy()
     pk_WC = initialP.copy()
     pk_NWC = initialP.copy()
@@ -372,6 +383,11 @@ def ensamble_kalman(name_Signal, samplingRate, wC):
     yResult_NWC = []
 
     for i in range(len(signal)):
+        if cancel is not None and cancel.is_set():
+            # keep only the blocks processed so far
+            resultAll, resultOriginal = resultAll[:i], resultOriginal[:i]
+            resultWC, resultNWC = resultWC[:i], resultNWC[:i]
+            break
         matrixState = signal[i]
 
         for j in range(samplingRate):
@@ -436,12 +452,13 @@ def ensamble_kalman(name_Signal, samplingRate, wC):
         resultWC_Temp = np.zeros([1, samplingRate])
         resultNWC_Temp = np.zeros([1, samplingRate])
         counterN = 1
-        print(i)
+        if progress is not None:
+            progress(i + 1, len(signal))
 
     return resultAll, resultOriginal, resultWC, resultNWC, yResult, yResult_WC, yResult_NWC
 
 
 # --- Adapter for command‐line testing ---
-def run(nameSignal, Fs, wC):
-    return ensamble_kalman(nameSignal, Fs, wC)
+def run(nameSignal, Fs, wC, progress=None, cancel=None, initial_cov=None):
+    return ensamble_kalman(nameSignal, Fs, wC, progress=progress, cancel=cancel, initial_cov=initial_cov)
 
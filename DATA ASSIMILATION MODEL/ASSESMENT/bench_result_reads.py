@@ -0,0 +1,90 @@
+# bench_result_reads.py
+#
+# Read time of one stored run, old path vs new path:
+#
+#   orm       – db.query(Model).all() and a Python loop appending floats
+#               (what the results endpoints did before result_io)
+#   columnar  – result_io column-only selects into NumPy arrays
+#
+# Seeds a throwaway SQLite database unless DB_URL is already set, so it can
+# also be pointed at a MySQL copy of `datamed`.
+# Usage:  python bench_result_reads.py [seconds_of_eeg ...]     (default 3600)
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+if "DB_URL" not in os.environ:
+    os.environ["DB_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+
+import numpy as np
+
+import persistence
+import result_io
+from database import SessionLocal
+from models import Patient, ResultsAmp, ResultsWelch, Session as SessionModel, User
+
+FS = 128
+
+
+def seed(seconds: int) -> int:
+    db = SessionLocal()
+    user = User(name="bench", father_surname="b", mother_surname="b",
+                medical_department="b", email=f"bench{time.time_ns()}@x", hashed_password="x")
+    patient = Patient(user=user, name="bench", father_surname="b", mother_surname="b",
+                      birth_date=date(2000, 1, 1), sex="F",
+                      email=f"patient{time.time_ns()}@x")
+    run = SessionModel(patient=patient, flag="bench", algorithm_name="bench")
+    db.add(run)
+    db.commit()
+    run_id = run.id
+    db.close()
+
+    rng = np.random.default_rng(0)
+    n = seconds * FS
+    persistence.enqueue(
+        run_id, 1,
+        {lab: rng.normal(0, 50, n) for lab in result_io.Y_LABELS},
+        {lab: rng.normal(0, 50, n) for lab in result_io.AMP_LABELS},
+        np.linspace(0, FS / 2, FS // 2 + 1),
+        {lab: rng.normal(-20, 5, FS // 2 + 1) for lab in result_io.AMP_LABELS},
+    )
+    persistence.persist(run_id)
+    return run_id
+
+
+def read_orm(db, run_id):
+    amp = {lab: [] for lab in result_io.AMP_LABELS}
+    for r in (db.query(ResultsAmp).filter(ResultsAmp.session_id == run_id)
+              .order_by(ResultsAmp.time.asc()).all()):
+        amp[r.label].append(r.amplitude)
+    rows = (db.query(ResultsWelch).filter(ResultsWelch.session_id == run_id)
+            .order_by(ResultsWelch.frequency.asc()).all())
+    return amp, [r.frequency for r in rows]
+
+
+def read_columnar(db, run_id):
+    return result_io.load_amplitudes(db, run_id), result_io.load_welch(db, run_id)
+
+
+def bench(fn, run_id, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        db = SessionLocal()
+        start = time.perf_counter()
+        fn(db, run_id)
+        best = min(best, time.perf_counter() - start)
+        db.close()
+    return best
+
+
+if __name__ == "__main__":
+    durations = [int(a) for a in sys.argv[1:]] or [3600]
+    print(f"{'seconds':>8} {'rows':>9} {'orm s':>8} {'columnar s':>11} {'speed-up':>9}")
+    for seconds in durations:
+        run_id = seed(seconds)
+        orm = bench(read_orm, run_id)
+        columnar = bench(read_columnar, run_id)
+        rows = seconds * FS * len(result_io.AMP_LABELS)
+        print(f"{seconds:>8} {rows:>9} {orm:>8.2f} {columnar:>11.2f} {orm / columnar:>8.1f}x")
@@ -0,0 +1,80 @@
+# bench_serialization.py
+#
+# Encode time per MB of a /run-kalman response, old path vs new path:
+#
+#   pydantic  – RunResponseWithId(**.tolist()) + jsonable_encoder + json.dumps
+#               (what FastAPI did for response_model=RunResponseWithId)
+#   numpy     – transport.dumps_json on the raw arrays (orjson if installed)
+#   npz       – transport.encode_run_npz, the backend-to-Kalman binary format
+#
+# Usage:  python bench_serialization.py [seconds_of_eeg ...]
+import json
+import sys
+import time
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+
+import transport
+from schemas import RunResponseWithId
+
+FS = 128
+LABELS = ["All", "Original", "WC", "NWC"]
+
+
+def fake_run(seconds: int):
+    rng = np.random.default_rng(0)
+    n = seconds * FS
+    arrays = {name: rng.normal(0, 50, n) for name in transport.RUN_ARRAYS}
+    freqs = np.linspace(0, FS / 2, FS // 2 + 1)
+    power = {lab: rng.normal(-20, 5, freqs.size) for lab in LABELS}
+    return arrays, freqs, power
+
+
+def encode_pydantic(arrays, freqs, power) -> bytes:
+    model = RunResponseWithId(
+        session_run_id=1,
+        **{name: arr.tolist() for name, arr in arrays.items()},
+        welch={"frequencies": freqs.tolist(),
+               "power": {lab: p.tolist() for lab, p in power.items()}},
+    )
+    return json.dumps(jsonable_encoder(model)).encode()
+
+
+def encode_numpy(arrays, freqs, power) -> bytes:
+    return transport.dumps_json({
+        "session_run_id": 1,
+        **arrays,
+        "welch": {"frequencies": freqs, "power": power},
+    })
+
+
+def encode_npz(arrays, freqs, power) -> bytes:
+    return transport.encode_run_npz(arrays, freqs, power, session_run_id=1)
+
+
+def bench(fn, args, repeat: int = 5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, len(body)
+
+
+if __name__ == "__main__":
+    durations = [int(a) for a in sys.argv[1:]] or [60, 600, 3600]
+    print(f"orjson available: {transport.orjson is not None}")
+    print(f"{'seconds':>8} {'path':>9} {'size MB':>9} {'encode ms':>10} {'ms/MB':>8}")
+    for seconds in durations:
+        args = fake_run(seconds)
+        json_mb = None
+        for name, fn in (("pydantic", encode_pydantic),
+                         ("numpy", encode_numpy),
+                         ("npz", encode_npz)):
+            elapsed, size = bench(fn, args)
+            mb = size / 1e6
+            # ms/MB is normalised to the JSON payload so the paths compare 1:1
+            json_mb = json_mb or mb
+            print(f"{seconds:>8} {name:>9} {mb:>9.2f} {elapsed * 1e3:>10.1f} "
+                  f"{elapsed * 1e3 / json_mb:>8.2f}")
@@ -0,0 +1,69 @@
+# downsample.py  ────────────────────────────────────────────────────────────
+# Reduce a long series to roughly as many points as a chart has pixels.
+#
+#  · lttb    – Largest-Triangle-Three-Buckets: keeps the visual shape, one
+#              point per bucket (good default for line charts)
+#  · minmax  – the min and the max of every bucket, in time order, so spikes
+#              survive however far the chart is zoomed out
+# Both return (sample indices, values); indices are relative to the input.
+from typing import Tuple
+
+import numpy as np
+
+METHODS = ("lttb", "minmax")
+
+
+def lttb(y: np.ndarray, n_out: int) -> Tuple[np.ndarray, np.ndarray]:
+    n = y.shape[0]
+    if n_out >= n or n_out < 3:
+        idx = np.arange(n) if n_out >= n else np.linspace(0, n - 1, max(n_out, 1)).astype(np.int64)
+        return idx, y[idx]
+
+    x = np.arange(n, dtype=np.float64)
+    # bucket edges for the n - 2 inner points; first and last are always kept
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    prev = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        # average of the next bucket (or the last point for the final bucket)
+        nlo, nhi = hi, (edges[b + 2] if b + 2 < len(edges) else n)
+        avg_x = x[nlo:nhi].mean()
+        avg_y = y[nlo:nhi].mean()
+        area = np.abs(
+            (x[prev] - avg_x) * (y[lo:hi] - y[prev])
+            - (x[prev] - x[lo:hi]) * (avg_y - y[prev])
+        )
+        prev = lo + int(np.argmax(area))
+        out[b + 1] = prev
+    return out, y[out]
+
+
+def minmax(y: np.ndarray, n_out: int) -> Tuple[np.ndarray, np.ndarray]:
+    n = y.shape[0]
+    n_buckets = max(n_out // 2, 1)
+    if n <= n_out or n_buckets >= n:
+        idx = np.arange(n)
+        return idx, y[idx]
+
+    starts = np.linspace(0, n, n_buckets + 1).astype(np.int64)[:-1]
+    sizes = np.diff(np.append(starts, n))
+    # argmin/argmax per bucket via a padded [n_buckets, max_size] view
+    width = int(sizes.max())
+    cols = np.arange(width)
+    pos = starts[:, None] + np.minimum(cols, sizes[:, None] - 1)
+    block = y[pos]
+    i_min = starts + block.argmin(axis=1)
+    i_max = starts + block.argmax(axis=1)
+    idx = np.sort(np.stack([i_min, i_max], axis=1), axis=1).ravel()
+    # a flat bucket has min == max; keep it once
+    idx = idx[np.concatenate(([True], np.diff(idx) != 0))]
+    return idx, y[idx]
+
+
+def reduce(y: np.ndarray, n_out: int, method: str = "lttb") -> Tuple[np.ndarray, np.ndarray]:
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {list(METHODS)}")
+    y = np.asarray(y, dtype=np.float64)
+    return lttb(y, n_out) if method == "lttb" else minmax(y, n_out)
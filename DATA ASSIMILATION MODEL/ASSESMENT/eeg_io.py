@@ -0,0 +1,116 @@
+# eeg_io.py  ────────────────────────────────────────────────────────────────
+# Read a session's raw EEG straight from the shared `datamed` schema: the
+# compressed eeg_blocks the backend writes (see Back/src/eeg_store.py), or
+# one eeg_data row per sample for sessions uploaded before blocks existed.
+# A session that re-uploaded a known recording reads the blocks of the
+# payload's owner session, and shares its fingerprint.
+import hashlib
+import zlib
+from itertools import chain
+from typing import Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import EegBlock, EegData, EegPayload, Session as SessionModel, SessionSummary
+
+# Channel order used by the uploaded CSVs and expected by every Kalman variant
+CHANNELS = [
+    "af3", "f7", "f3", "fc5", "t7", "p7",
+    "o1", "o2", "p8", "t8", "fc6", "f4", "f8", "af4",
+]
+BLOCK_SAMPLES = 10 * 128   # longest block the backend writes
+
+
+def fingerprint(signal: np.ndarray) -> str:
+    """SHA-256 of [n, 14] samples as little-endian float32 rows, as the backend computes it."""
+    return hashlib.sha256(np.ascontiguousarray(signal, dtype="<f4").tobytes()).hexdigest()
+
+
+def _payload_of(db: Session, session_id: int):
+    """(owner session id, fingerprint) of the session's stored recording, if fingerprinted."""
+    return db.execute(
+        select(EegPayload.owner_session_id, EegPayload.fingerprint)
+        .join(SessionModel, SessionModel.eeg_payload_id == EegPayload.id)
+        .where(SessionModel.id == session_id)
+    ).first()
+
+
+def session_fingerprint(db: Session, session_id: int) -> Optional[str]:
+    """Fingerprint of a session's EEG as recorded at upload (None for legacy sessions)."""
+    payload = _payload_of(db, session_id)
+    return payload.fingerprint if payload else None
+
+
+def load_summary(db: Session, session_id: int) -> Optional[SessionSummary]:
+    """The backend's upload-time summary of a session (None for unsummarised sessions)."""
+    return db.get(SessionSummary, session_id)
+
+
+def _decode_block(blob: bytes, n_samples: int) -> np.ndarray:
+    flat = np.frombuffer(zlib.decompress(blob), dtype="<f4")
+    return flat.reshape(len(CHANNELS), n_samples).T.astype(np.float64)
+
+
+def _load_blocks(db: Session, session_id: int, start: int, stop: Optional[int]) -> Optional[np.ndarray]:
+    """Samples [start, stop) from eeg_blocks, or None if the session has no blocks."""
+    stmt = (
+        select(EegBlock.start_sample, EegBlock.n_samples, EegBlock.data)
+        .where(
+            EegBlock.session_id == session_id,
+            EegBlock.start_sample > start - BLOCK_SAMPLES,
+            EegBlock.start_sample + EegBlock.n_samples > start,
+        )
+        .order_by(EegBlock.start_sample)
+    )
+    if stop is not None:
+        stmt = stmt.where(EegBlock.start_sample < stop)
+    parts, first = [], None
+    for block_start, n, blob in db.execute(stmt):
+        if first is None:
+            first = block_start
+        parts.append(_decode_block(blob, n))
+    if not parts:
+        has_blocks = db.execute(
+            select(EegBlock.id).where(EegBlock.session_id == session_id).limit(1)
+        ).first()
+        return np.empty((0, len(CHANNELS))) if has_blocks else None
+    arr = np.concatenate(parts)
+    return arr[start - first:None if stop is None else stop - first]
+
+
+def load_session_eeg(
+    db: Session,
+    session_id: int,
+    start: Optional[int] = None,
+    stop: Optional[int] = None,
+    channels: Sequence[str] = CHANNELS,
+) -> np.ndarray:
+    """
+    Fetch the channels of a session and return them as a float64 array of
+    shape [n_samples, len(channels)] (empty if none stored), optionally only
+    samples [start, stop). Only the blocks overlapping the range are read;
+    legacy sessions use one column-only query on eeg_data.
+    """
+    payload = _payload_of(db, session_id)
+    if payload:
+        session_id = payload.owner_session_id
+    blocks = _load_blocks(db, session_id, start or 0, stop)
+    if blocks is not None:
+        if list(channels) == CHANNELS:
+            return blocks
+        return np.ascontiguousarray(blocks[:, [CHANNELS.index(ch) for ch in channels]])
+
+    stmt = (
+        select(*[getattr(EegData, ch) for ch in channels])
+        .where(EegData.session_id == session_id)
+        .order_by(EegData.id)
+    )
+    if start:
+        stmt = stmt.offset(start)
+    if stop is not None:
+        stmt = stmt.limit(max(stop - (start or 0), 0))
+    rows = db.execute(stmt)
+    flat = np.fromiter(chain.from_iterable(rows), dtype=np.float64)
+    return flat.reshape(-1, len(channels))
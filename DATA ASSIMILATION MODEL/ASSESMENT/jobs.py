@@ -0,0 +1,236 @@
+# jobs.py  ──────────────────────────────────────────────────────────────────
+# Registry of Kalman jobs and their progress, streamed to clients as SSE.
+#
+# The engine runs in a pool process, so progress travels back through a
+# multiprocessing.Manager queue; a pump thread drains it and fans snapshots
+# out to the asyncio queues of every /jobs/{id}/events subscriber. Cancellation
+# goes the other way through a manager Event that the engine polls at every
+# one-second block boundary, together with an optional wall-clock deadline.
+import asyncio
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager, suppress
+from multiprocessing import get_context
+from typing import Dict, List, Optional
+
+TERMINAL = ("done", "failed", "rejected", "cancelled")
+JOB_TTL = 3600          # seconds a finished job stays queryable
+KEEPALIVE = 15.0        # seconds between SSE keep-alive comments
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def _get_manager():
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = get_context("spawn").Manager()
+        return _manager
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobControl:
+    """Picklable handle passed to the engine inside the worker process."""
+
+    def __init__(self, queue, cancel_event, deadline: Optional[float] = None):
+        self._queue = queue
+        self._cancel_event = cancel_event
+        self._deadline = deadline
+
+    def progress(self, seconds_done: int, seconds_total: int) -> None:
+        self._queue.put((seconds_done, seconds_total))
+
+    def is_set(self) -> bool:
+        """True once the job is cancelled or its time budget is spent."""
+        if self._deadline is not None and time.time() >= self._deadline:
+            return True
+        return self._cancel_event.is_set()
+
+
+class Job:
+    def __init__(self, job_id: str, variant: str, session_id: int, fs: int):
+        self.id = job_id
+        self.variant = variant
+        self.session_id = session_id
+        self.fs = fs
+        self.status = "queued"
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.seconds_done = 0
+        self.seconds_total: Optional[int] = None
+        self.session_run_id: Optional[int] = None
+        self.error: Optional[str] = None
+        self.cancel_requested = False
+        # content hash of the input EEG (eeg_io.fingerprint), when known
+        self.eeg_fingerprint: Optional[str] = None
+
+        self._loop = asyncio.get_running_loop()
+        self._cancelled = asyncio.Event()
+        self._cancel_event = None
+        self._subscribers: List[asyncio.Queue] = []
+        self._queue = None
+        self._pump: Optional[threading.Thread] = None
+
+    # ── state ─────────────────────────────────────────────────────────────
+    def snapshot(self) -> dict:
+        now = self.finished or time.time()
+        elapsed = now - self.started if self.started else 0.0
+        rate = self.seconds_done / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if rate > 0 and self.seconds_total is not None:
+            eta = round((self.seconds_total - self.seconds_done) / rate, 1)
+        return {
+            "job_id":             self.id,
+            "variant":            self.variant,
+            "session_id":         self.session_id,
+            "status":             self.status,
+            "seconds_done":       self.seconds_done,
+            "seconds_total":      self.seconds_total,
+            "elapsed":            round(elapsed, 3),
+            "eta_seconds":        eta,
+            "samples_per_second": round(rate * self.fs, 1),
+            "session_run_id":     self.session_run_id,
+            "eeg_fingerprint":    self.eeg_fingerprint,
+            "error":              self.error,
+        }
+
+    def set_status(self, status: str, **fields) -> None:
+        self.status = status
+        for name, value in fields.items():
+            setattr(self, name, value)
+        if status == "running" and self.started is None:
+            self.started = time.time()
+        if status in TERMINAL:
+            self.finished = time.time()
+        self._publish()
+
+    @contextmanager
+    def track(self):
+        """Mark the job failed if the block raises, done if it completes."""
+        try:
+            yield self
+        except BaseException as e:
+            if self.status not in TERMINAL:
+                self.set_status("failed", error=str(getattr(e, "detail", e)))
+            raise
+        finally:
+            self.stop_pump()
+        if self.status not in TERMINAL:
+            self.set_status("done")
+
+    # ── cancellation ──────────────────────────────────────────────────────
+    def cancel(self) -> None:
+        self.cancel_requested = True
+        self._cancelled.set()
+        if self._cancel_event is not None:
+            self._cancel_event.set()
+
+    async def unless_cancelled(self, aw):
+        """Await aw, abandoning it (JobCancelled) if the job is cancelled first."""
+        task = asyncio.ensure_future(aw)
+        stop = asyncio.ensure_future(self._cancelled.wait())
+        try:
+            await asyncio.wait({task, stop}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stop.cancel()
+            if not task.done():
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
+        if task.cancelled():
+            raise JobCancelled(self.id)
+        return task.result()
+
+    # ── channel to the worker process ─────────────────────────────────────
+    def control(self, time_budget: Optional[float] = None) -> JobControl:
+        """Create the cross-process progress/cancel channel and start draining it."""
+        manager = _get_manager()
+        self._queue = manager.Queue()
+        self._cancel_event = manager.Event()
+        if self.cancel_requested:
+            self._cancel_event.set()
+        self._pump = threading.Thread(target=self._drain, daemon=True)
+        self._pump.start()
+        deadline = time.time() + time_budget if time_budget else None
+        return JobControl(self._queue, self._cancel_event, deadline)
+
+    def stop_pump(self) -> None:
+        if self._pump is not None:
+            self._queue.put(None)
+            self._pump.join(timeout=5)
+            self._pump = None
+
+    def _drain(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            self.seconds_done, self.seconds_total = item
+            try:
+                self._loop.call_soon_threadsafe(self._publish)
+            except RuntimeError:  # event loop already closed
+                return
+
+    # ── subscribers ───────────────────────────────────────────────────────
+    def _publish(self) -> None:
+        snap = self.snapshot()
+        for q in self._subscribers:
+            q.put_nowait(snap)
+
+    async def events(self):
+        """Async generator of Server-Sent Events until the job finishes."""
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.append(queue)
+        try:
+            snap = self.snapshot()
+            yield _sse(snap)
+            while snap["status"] not in TERMINAL:
+                try:
+                    snap = await asyncio.wait_for(queue.get(), KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse(snap)
+        finally:
+            self._subscribers.remove(queue)
+
+
+def _sse(snap: dict) -> str:
+    event = "end" if snap["status"] in TERMINAL else "progress"
+    return f"event: {event}\ndata: {json.dumps(snap)}\n\n"
+
+
+# ── registry ──────────────────────────────────────────────────────────────
+_jobs: Dict[str, Job] = {}
+
+
+def create_job(job_id: Optional[str], variant: str, session_id: int, fs: int) -> Job:
+    _prune()
+    job_id = job_id or uuid.uuid4().hex
+    if job_id in _jobs:
+        raise KeyError(job_id)
+    job = Job(job_id, variant, session_id, fs)
+    _jobs[job_id] = job
+    return job
+
+
+def get_job(job_id: str) -> Optional[Job]:
+    return _jobs.get(job_id)
+
+
+def list_jobs() -> List[dict]:
+    _prune()
+    return [job.snapshot() for job in _jobs.values()]
+
+
+def _prune() -> None:
+    cutoff = time.time() - JOB_TTL
+    for job_id in [j.id for j in _jobs.values() if j.finished and j.finished < cutoff]:
+        del _jobs[job_id]
@@ -4,19 +4,33 @@ import os
 import json
 import shutil
 import tempfile
-from typing import Dict
+from datetime import datetime
+from typing import Dict, Optional
 import time
+from concurrent.futures.process import BrokenProcessPool
 
 import numpy as np
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends
+from fastapi import FastAPI, UploadFile, File, Form, Header, HTTPException, Depends, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from schemas import RunResponseWithId   # ← your updated response model
 from Welch import psd_from_arrays
-from database import SessionLocal
+from database import AsyncSessionLocal, SessionLocal
+from eeg_io import CHANNELS, fingerprint, load_session_eeg, load_summary, session_fingerprint
+import transport
+from scheduler import PRIORITIES, SchedulerFull, run_in_pool, scheduler, shutdown_executor as shutdown_pool
+import jobs
+import persistence
+import result_io
+import plot_cache
+import downsample
+import migrations
+import request_cache
 
-import csv
 import io
 import matplotlib.pyplot as plt
 import matplotlib
@@ -27,10 +41,9 @@ from typing import Literal
 
 # Import your updated models
 from models import (
-    ResultsY,
     ResultsAmp,
-    ResultsWelch,
     Algorithm,
+    Patient,
     Session as SessionModel,
 )
 
@@ -55,6 +68,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def _invalidate_run_owner(run_id: int) -> None:
+    # the backend's cached results for the run were computed before its rows existed
+    with SessionLocal() as db:
+        owner_id = db.execute(
+            select(Patient.user_id)
+            .join(SessionModel, SessionModel.patient_id == Patient.id)
+            .where(SessionModel.id == run_id)
+        ).scalar_one_or_none()
+    request_cache.invalidate_blocking(owner_id)
+
+@app.on_event("startup")
+def start_persistence():
+    migrations.check()
+    # results written again for a run make its rendered plots stale
+    persistence.on_persisted(plot_cache.invalidate)
+    persistence.on_persisted(_invalidate_run_owner)
+    persistence.start()
+
+@app.on_event("shutdown")
+def shutdown_executor():
+    shutdown_pool()
+    persistence.stop()
+
 # Map variant→run()
 kalman_variants: Dict[str, callable] = {
     "Potter_GramSchmidt":    kpgs.run,
@@ -70,7 +106,6 @@ kalman_variants: Dict[str, callable] = {
 
 Fs = 128
 AMP_LABELS = ["All", "Original", "WC", "NWC"]
-MAX_FLOAT32 = 3.4e38  # MySQL FLOAT max
 
 def get_db():
     db = SessionLocal()
@@ -79,93 +114,80 @@ def get_db():
     finally:
         db.close()
 
-def get_or_create_algorithm(db: Session, variant_name: str) -> Algorithm:
-    algo = db.query(Algorithm).filter(Algorithm.name == variant_name).first()
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def _discard(tmp_path: Optional[str]) -> None:
+    if tmp_path is not None:
+        os.unlink(tmp_path)
+
+# The helpers below run in the threadpool: decoding, hashing or copying a
+# multi-hour recording would otherwise stall the event loop (SSE progress,
+# /scheduler/status, every other request) for seconds.
+
+def _read_npy(data: bytes):
+    """Decoded .npy upload and its fingerprint."""
+    signal = transport.read_npy_upload(data)
+    return signal, fingerprint(signal)
+
+def _spool_csv(fileobj) -> str:
+    """Copy an uploaded CSV to a temp file; returns its path."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".csv") as tmp:
+        shutil.copyfileobj(fileobj, tmp)
+    return tmp.name
+
+def _load_stored_eeg(session_id: int):
+    """
+    (n_samples, initial covariance, signal, fingerprint) of a stored session.
+    The upload-time summary answers the length check and supplies the
+    initial covariance without another pass; signal is None when it says
+    the session is too short.
+    """
+    with SessionLocal() as db:
+        summary = load_summary(db, session_id)
+        cov = None
+        if summary is not None:
+            if summary.n_samples < Fs:
+                return summary.n_samples, None, None, None
+            if summary.first_second_cov is not None:
+                cov = np.asarray(summary.first_second_cov, dtype=float)
+        signal = load_session_eeg(db, session_id)
+        return signal.shape[0], cov, signal, session_fingerprint(db, session_id) or fingerprint(signal)
+
+async def get_or_create_algorithm(db: AsyncSession, variant_name: str) -> Algorithm:
+    algo = (
+        await db.execute(select(Algorithm).where(Algorithm.name == variant_name))
+    ).scalars().first()
     if not algo:
         algo = Algorithm(
             name=variant_name,
             description=f"Kalman filter variant: {variant_name}"
         )
         db.add(algo)
-        db.commit()
-        db.refresh(algo)
+        await db.commit()
+        await db.refresh(algo)
     return algo
 
-def store_y_result(
-    db: Session,
-    session_id: int,
-    algorithm_id: int,
-    label: str,
-    y_value: float,
-    time_val: float,
-) -> ResultsY:
-    row = ResultsY(
-        session_id=session_id,
-        algorithm_id=algorithm_id,
-        label=label,
-        y_value=y_value,
-        time=time_val,
-    )
-    db.add(row)
-    db.commit()
-    db.refresh(row)
-    return row
-
-def store_amp_result(
-    db: Session,
-    session_id: int,
-    algorithm_id: int,
-    label: str,
-    amplitude: float,
-    time_val: float,
-) -> ResultsAmp:
-    row = ResultsAmp(
-        session_id=session_id,
-        algorithm_id=algorithm_id,
-        label=label,
-        amplitude=amplitude,
-        time=time_val,
-    )
-    db.add(row)
-    db.commit()
-    db.refresh(row)
-    return row
-
-def store_welch_result(
-    db: Session,
-    session_id: int,
-    algorithm_id: int,
-    frequency: float,
-    power_all: float,
-    power_original: float,
-    power_wc: float,
-    power_nwc: float,
-) -> ResultsWelch:
-    row = ResultsWelch(
-        session_id=session_id,
-        algorithm_id=algorithm_id,
-        frequency=frequency,
-        power_all=power_all,
-        power_original=power_original,
-        power_wc=power_wc,
-        power_nwc=power_nwc,
-    )
-    db.add(row)
-    db.commit()
-    db.refresh(row)
-    return row
-
 @app.post("/run-kalman", response_model=RunResponseWithId)
 async def run_kalman_endpoint(
     variant: str = Form(...),
     wC: str = Form(...),
     session_id: int = Form(...),
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    file: Optional[UploadFile] = File(None),
+    priority: str = Form("interactive"),
+    job_id: Optional[str] = Form(None),
+    time_budget: Optional[float] = Form(None),
+    accept: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    # 1) Validate variant
+    # 1) Validate variant and priority
     if variant not in kalman_variants:
         raise HTTPException(400, f"Unknown variant '{variant}'")
+    if priority not in PRIORITIES:
+        raise HTTPException(400, f"priority must be one of {list(PRIORITIES)}")
+    if time_budget is not None and time_budget <= 0:
+        raise HTTPException(400, "time_budget must be a positive number of seconds")
 
     # 2) Parse wC as JSON list of 14 ints
     try:
@@ -174,339 +196,423 @@ async def run_kalman_endpoint(
     except Exception:
         raise HTTPException(400, "wC must be JSON list of 14 ints")
 
-    # 3) Save incoming CSV into a temp file
-    if not file.filename.lower().endswith(".csv"):
-        raise HTTPException(400, "file must be a .csv")
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".csv") as tmp:
-        shutil.copyfileobj(file.file, tmp)
-        tmp_path = tmp.name
-    file.file.close()
-
-    # 4) Verify the base session exists
-    base_sess = db.query(SessionModel).filter(SessionModel.id == session_id).first()
+    # 3) Verify the base session exists
+    base_sess = await db.get(SessionModel, session_id)
     if not base_sess:
         raise HTTPException(404, f"Session {session_id} not found")
+    owner_id = (
+        await db.execute(select(Patient.user_id).where(Patient.id == base_sess.patient_id))
+    ).scalar_one()
+
+    # 4) EEG input: an uploaded CSV (saved to a temp file) or NPY array, or,
+    #    when no file is sent, the session's samples read from the database
+    tmp_path = None
+    eeg_fingerprint = None
+    initial_cov = None
+    if file is not None and transport.is_npy_upload(file.filename, file.content_type):
+        try:
+            signal, eeg_fingerprint = await run_in_threadpool(_read_npy, await file.read())
+        except ValueError as e:
+            raise HTTPException(400, f"Invalid .npy upload: {e}")
+        finally:
+            file.file.close()
+    elif file is not None:
+        if not file.filename.lower().endswith(".csv"):
+            raise HTTPException(400, "file must be a .csv or .npy")
+        try:
+            tmp_path = await run_in_threadpool(_spool_csv, file.file)
+        finally:
+            file.file.close()
+        signal = tmp_path
+    else:
+        n_samples, initial_cov, signal, eeg_fingerprint = await run_in_threadpool(_load_stored_eeg, session_id)
+        if n_samples < Fs:
+            raise HTTPException(404, f"Session {session_id} has less than one second of EEG data")
 
-    # 5) Create a brand‐new SessionModel row for this Kalman run
-    new_sess = SessionModel(
-        patient_id     = base_sess.patient_id,
-        flag           = base_sess.flag,
-        algorithm_name = variant,
-        # session_timestamp will default to now()
-    )
-    db.add(new_sess)
-    db.commit()
-    db.refresh(new_sess)
-
-    
-
-    # 6) Find or create the Algorithm row
-    algorithm = get_or_create_algorithm(db, variant)
-
-    # 7) Run the chosen Kalman variant
-    run_start = time.time()
-    try:
-        run_fn = kalman_variants[variant]
-        amp_all, amp_orig, amp_wc, amp_nwc, y_all, y_wc, y_nwc = run_fn(
-            tmp_path, Fs, wC_arr
-        )
-    except Exception as e:
-        raise HTTPException(500, f"Kalman error: {e}")
-    finally:
-        os.unlink(tmp_path)
-    
-    run_end = time.time()
-    elapsed = run_end - run_start
-
-    new_sess.processing_time = elapsed
-    db.add(new_sess)
-    db.commit()
-    db.refresh(new_sess)
-
-    # 8) Prepare to store everything under new_sess.id
-    sess_to_store = new_sess.id
-
-    # 9) Turn raw outputs into 1D float64 numpy arrays, replace NaN/Inf with zero
-    amps_raw = {
-        "All":      np.nan_to_num(np.array(amp_all).ravel().astype(float)),
-        "Original": np.nan_to_num(np.array(amp_orig).ravel().astype(float)),
-        "WC":       np.nan_to_num(np.array(amp_wc).ravel().astype(float)),
-        "NWC":      np.nan_to_num(np.array(amp_nwc).ravel().astype(float)),
-    }
-
-    ys_raw = {
-        "All": np.nan_to_num(np.array(y_all).ravel().astype(float)),
-        "WC":  np.nan_to_num(np.array(y_wc).ravel().astype(float)),
-        "NWC": np.nan_to_num(np.array(y_nwc).ravel().astype(float)),
-    }
-
-    # 10) Compute Welch PSD on all four amplitude arrays
     try:
-        freqs, psd = psd_from_arrays(amps_raw, fs=Fs, nperseg=Fs)
-    except Exception as e:
-        raise HTTPException(500, f"Welch error: {e}")
-
-    freqs_clean = np.nan_to_num(np.array(freqs, dtype=float))
-    psd_clean: Dict[str, np.ndarray] = {}
-    for label in AMP_LABELS:
-        psd_clean[label] = np.nan_to_num(np.array(psd[label], dtype=float))
-
-    # 11) Insert every sample of the Y‐arrays into results_y
-    n_samples = len(ys_raw["All"])
-    for label, arr in ys_raw.items():
-        for idx in range(n_samples):
-            y_val = float(arr[idx])
-            if not np.isfinite(y_val):
-                y_val = 0.0
-            if abs(y_val) > MAX_FLOAT32:
-                y_val = float(np.sign(y_val) * MAX_FLOAT32)
-
-            store_y_result(
-                db=db,
-                session_id= sess_to_store,   # ← new run’s ID
-                algorithm_id= algorithm.id,
-                label= label,
-                y_value= y_val,
-                time_val= float(idx),
+        job = jobs.create_job(job_id, variant, session_id, Fs)
+    except KeyError:
+        _discard(tmp_path)
+        raise HTTPException(409, f"Job '{job_id}' already exists")
+    job.eeg_fingerprint = eeg_fingerprint
+
+    with job.track(), persistence.Computing() as computing:
+        # 5) Wait for a compute slot (fair-shared per user, 429 when saturated)
+        try:
+            await job.unless_cancelled(scheduler.acquire(owner_id, priority))
+        except SchedulerFull as e:
+            _discard(tmp_path)
+            job.set_status("rejected", error=str(e))
+            raise HTTPException(
+                429, str(e), headers={"Retry-After": str(e.retry_after)}
             )
-
-    # 12) Insert every sample of the amplitude arrays into results_amplitude
-    for label, arr in amps_raw.items():
-        for idx in range(n_samples):
-            amp_val = float(arr[idx])
-            if not np.isfinite(amp_val):
-                amp_val = 0.0
-            if abs(amp_val) > MAX_FLOAT32:
-                amp_val = float(np.sign(amp_val) * MAX_FLOAT32)
-
-            store_amp_result(
-                db=db,
-                session_id= sess_to_store,   # ← new run’s ID
-                algorithm_id= algorithm.id,
-                label= label,
-                amplitude= amp_val,
-                time_val= float(idx),
+        except jobs.JobCancelled:
+            _discard(tmp_path)
+            job.set_status("cancelled")
+            raise HTTPException(409, f"Job '{job.id}' was cancelled")
+
+        elapsed = None
+        try:
+            # 6) Create a brand‐new SessionModel row for this Kalman run
+            new_sess = SessionModel(
+                patient_id     = base_sess.patient_id,
+                flag           = base_sess.flag,
+                algorithm_name = variant,
+                # session_timestamp will default to now()
             )
-
-    # 13) Insert one row per frequency into results_welch
-    n_bins = len(freqs_clean)
-    for bin_idx in range(n_bins):
-        freq_val = float(freqs_clean[bin_idx])
-        p_all    = float(psd_clean["All"][bin_idx])
-        p_orig   = float(psd_clean["Original"][bin_idx])
-        p_wc     = float(psd_clean["WC"][bin_idx])
-        p_nwc    = float(psd_clean["NWC"][bin_idx])
-
-        def clamp(v: float) -> float:
-            if not np.isfinite(v):
-                v = 0.0
-            if abs(v) > MAX_FLOAT32:
-                v = float(np.sign(v) * MAX_FLOAT32)
-            return v
-
-        store_welch_result(
-            db=db,
-            session_id= sess_to_store,    # ← new run’s ID
-            algorithm_id= algorithm.id,
-            frequency= freq_val,
-            power_all     = clamp(p_all),
-            power_original= clamp(p_orig),
-            power_wc      = clamp(p_wc),
-            power_nwc     = clamp(p_nwc),
-        )
-
-    # 14) Return JSON including the new run’s session_id
-    return RunResponseWithId(
-        session_run_id      = new_sess.id,
-        y_all               = ys_raw["All"].tolist(),
-        y_winningcomb       = ys_raw["WC"].tolist(),
-        y_nonwinning        = ys_raw["NWC"].tolist(),
-        amplitude_all       = amps_raw["All"].tolist(),
-        amplitude_winning   = amps_raw["WC"].tolist(),
-        amplitude_nonwinning= amps_raw["NWC"].tolist(),
-        amplitude_original  = amps_raw["Original"].tolist(),
-        welch = {
-            "frequencies": freqs_clean.tolist(),
-            "power": { lab: psd_clean[lab].tolist() for lab in AMP_LABELS },
-        },
-    )
+            db.add(new_sess)
+            await db.commit()
+            await db.refresh(new_sess)
+            await request_cache.invalidate(owner_id)
+            computing.begin(new_sess.id)
+            job.set_status("running", session_run_id=new_sess.id)
+
+            # 7) Find or create the Algorithm row
+            algorithm = await get_or_create_algorithm(db, variant)
+
+            # 8) Run the chosen Kalman variant on the process pool; it stops at
+            #    the next one-second block once cancelled or out of time budget
+            try:
+                run_fn = kalman_variants[variant]
+                control = job.control(time_budget)
+                (amp_all, amp_orig, amp_wc, amp_nwc, y_all, y_wc, y_nwc), elapsed = (
+                    await run_in_pool(run_fn, signal, Fs, wC_arr, control.progress, control, initial_cov)
+                )
+            except BrokenProcessPool:
+                # the pool has been replaced; only this run is lost
+                raise HTTPException(503, "Kalman worker died during this run (out of memory?); retry")
+            except Exception as e:
+                raise HTTPException(500, f"Kalman error: {e}")
+        finally:
+            _discard(tmp_path)
+            scheduler.release(owner_id, elapsed)
+            job.stop_pump()
+
+        # 9) A cancelled run keeps nothing; a budgeted run keeps its processed prefix
+        partial = job.seconds_total is None or job.seconds_done < job.seconds_total
+        if partial and (job.cancel_requested or len(y_all) == 0):
+            await db.delete(new_sess)
+            await db.commit()
+            await request_cache.invalidate(owner_id)
+            if job.cancel_requested:
+                job.set_status("cancelled")
+                raise HTTPException(409, f"Job '{job.id}' was cancelled")
+            raise HTTPException(
+                408, "Time budget expired before the first second of EEG was processed"
+            )
+        job.set_status("storing")
+
+        new_sess.processing_time = elapsed
+        db.add(new_sess)
+        await db.commit()
+        await db.refresh(new_sess)
+        await request_cache.invalidate(owner_id)
+
+        # 10) Prepare to store everything under new_sess.id
+        sess_to_store = new_sess.id
+
+        # 11) Turn raw outputs into 1D float64 numpy arrays, replace NaN/Inf with zero
+        amps_raw = {
+            "All":      np.nan_to_num(np.array(amp_all).ravel().astype(float)),
+            "Original": np.nan_to_num(np.array(amp_orig).ravel().astype(float)),
+            "WC":       np.nan_to_num(np.array(amp_wc).ravel().astype(float)),
+            "NWC":      np.nan_to_num(np.array(amp_nwc).ravel().astype(float)),
+        }
+
+        ys_raw = {
+            "All": np.nan_to_num(np.array(y_all).ravel().astype(float)),
+            "WC":  np.nan_to_num(np.array(y_wc).ravel().astype(float)),
+            "NWC": np.nan_to_num(np.array(y_nwc).ravel().astype(float)),
+        }
+
+        # 12) Compute Welch PSD on all four amplitude arrays
+        try:
+            freqs, psd = psd_from_arrays(amps_raw, fs=Fs, nperseg=Fs)
+        except Exception as e:
+            raise HTTPException(500, f"Welch error: {e}")
+
+        freqs_clean = np.nan_to_num(np.array(freqs, dtype=float))
+        psd_clean: Dict[str, np.ndarray] = {}
+        for label in AMP_LABELS:
+            psd_clean[label] = np.nan_to_num(np.array(psd[label], dtype=float))
+
+        # 13) Spool the run to disk and let the write-behind worker insert
+        #     results_y / results_amplitude / results_welch after we respond;
+        #     GET /runs/{id}/status reports when it has been persisted. The
+        #     multi-megabyte write + fsync runs off the event loop.
+        try:
+            await run_in_threadpool(
+                persistence.enqueue, sess_to_store, algorithm.id, ys_raw, amps_raw, freqs_clean, psd_clean
+            )
+        except OSError as e:
+            raise HTTPException(500, f"Could not spool results: {e}")
+
+        # 16) Return the run, as .npz when the caller negotiated it (backend)
+        #     or as JSON (browser), including the new run’s session_id
+        job.set_status("done")
+        compressed = transport.negotiate(accept)
+        if compressed is not None:
+            body = transport.encode_run_npz(
+                {
+                    "y_all":                ys_raw["All"],
+                    "y_winningcomb":        ys_raw["WC"],
+                    "y_nonwinning":         ys_raw["NWC"],
+                    "amplitude_all":        amps_raw["All"],
+                    "amplitude_winning":    amps_raw["WC"],
+                    "amplitude_nonwinning": amps_raw["NWC"],
+                    "amplitude_original":   amps_raw["Original"],
+                },
+                freqs_clean,
+                psd_clean,
+                compressed=compressed,
+                session_run_id=new_sess.id,
+                job_id=job.id,
+                partial=partial,
+                eeg_fingerprint=job.eeg_fingerprint,
+            )
+            return Response(content=body, media_type=transport.NPZ_MEDIA_TYPE)
+        # Same shape as RunResponseWithId, but the arrays go to the encoder as-is
+        return transport.NumpyJSONResponse({
+            "session_run_id":       new_sess.id,
+            "job_id":               job.id,
+            "partial":              partial,
+            "eeg_fingerprint":      job.eeg_fingerprint,
+            "y_all":                ys_raw["All"],
+            "y_winningcomb":        ys_raw["WC"],
+            "y_nonwinning":         ys_raw["NWC"],
+            "amplitude_all":        amps_raw["All"],
+            "amplitude_winning":    amps_raw["WC"],
+            "amplitude_nonwinning": amps_raw["NWC"],
+            "amplitude_original":   amps_raw["Original"],
+            "welch": {
+                "frequencies": freqs_clean,
+                "power": { lab: psd_clean[lab] for lab in AMP_LABELS },
+            },
+        })
 
 @app.get("/results/{session_id}")
-async def get_session_results(
+def get_session_results(
     session_id: int,
     db: Session = Depends(get_db),
 ):
-    rows = (
-        db.query(ResultsY)
-        .filter(ResultsY.session_id == session_id)
-        .order_by(ResultsY.time.asc())
-        .all()
-    )
+    rows = result_io.y_rows_with_algorithm(db, session_id)
     if not rows:
         raise HTTPException(404, f"No Y‐values found for session {session_id}")
 
-    return {
+    return transport.NumpyJSONResponse({
         "session_id": session_id,
-        "results_y": [
-            {
-                "id":             r.id,
-                "algorithm_id":   r.algorithm_id,
-                "label":          r.label,
-                "y_value":        float(r.y_value),
-                "time":           float(r.time),
-                "algorithm_name": (r.algorithm.name if r.algorithm else None),
-            }
-            for r in rows
-        ],
-    }
+        "results_y": [dict(r) for r in rows],
+    })
 
 @app.get("/sessions/{session_id}/results/csv")
 def download_results_csv(
     session_id: int,
     type: Literal["y", "amp", "welch"],
+    gzip: bool = False,
     db: Session = Depends(get_db),
 ):
-    sess = db.query(SessionModel).filter(SessionModel.id == session_id).first()
+    """
+    Stream the stored results of one type as CSV (gzip=true for .csv.gz);
+    rows are paged from the database while the response is being sent.
+    """
+    sess = db.query(SessionModel.id).filter(SessionModel.id == session_id).first()
     if not sess:
         raise HTTPException(404, detail="Session not found")
 
-    if type == "y":
-        query = (
-            db.query(ResultsY)
-            .filter(ResultsY.session_id == session_id)
-            .order_by(ResultsY.time.asc())
-            .all()
-        )
-        headers = ["id", "session_id", "algorithm_id", "label", "y_value", "time"]
-        rows = [
-            (r.id, r.session_id, r.algorithm_id, r.label, r.y_value, r.time)
-            for r in query
-        ]
-
-    elif type == "amp":
-        query = (
-            db.query(ResultsAmp)
-            .filter(ResultsAmp.session_id == session_id)
-            .order_by(ResultsAmp.time.asc())
-            .all()
-        )
-        headers = ["id", "session_id", "algorithm_id", "label", "amplitude", "time"]
-        rows = [
-            (r.id, r.session_id, r.algorithm_id, r.label, r.amplitude, r.time)
-            for r in query
-        ]
-
-    else:  # type == "welch"
-        query = (
-            db.query(ResultsWelch)
-            .filter(ResultsWelch.session_id == session_id)
-            .order_by(ResultsWelch.frequency.asc())
-            .all()
-        )
-        headers = [
-            "id",
-            "session_id",
-            "algorithm_id",
-            "frequency",
-            "power_all",
-            "power_original",
-            "power_wc",
-            "power_nwc",
-        ]
-        rows = [
-            (
-                r.id,
-                r.session_id,
-                r.algorithm_id,
-                r.frequency,
-                r.power_all,
-                r.power_original,
-                r.power_wc,
-                r.power_nwc,
-            )
-            for r in query
-        ]
-
-    buffer = io.StringIO()
-    writer = csv.writer(buffer)
-    writer.writerow(headers)
-    writer.writerows(rows)
-    csv_data = buffer.getvalue()
-    buffer.close()
-
-    return Response(
-        content=csv_data,
-        media_type="text/csv",
-        headers={
-            "Content-Disposition": f'attachment; filename="session_{session_id}_{type}.csv"'
-        },
+    filename = f"session_{session_id}_{type}.csv" + (".gz" if gzip else "")
+    return StreamingResponse(
+        result_io.iter_csv(type, session_id, gzip=gzip),
+        media_type="application/gzip" if gzip else "text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
-@app.get("/sessions/{session_id}/results/amplitude")
-def get_amplitude_arrays(session_id: int, db: Session = Depends(get_db)):
-    sess = db.query(SessionModel).filter(SessionModel.id == session_id).first()
-    if not sess:
+def _require_session(db: Session, session_id: int) -> None:
+    if db.query(SessionModel.id).filter(SessionModel.id == session_id).first() is None:
         raise HTTPException(404, detail="Session not found")
 
-    rows = (
-        db.query(ResultsAmp)
-        .filter(ResultsAmp.session_id == session_id)
-        .order_by(ResultsAmp.time.asc())
-        .all()
-    )
-
-    amp_dict = {"All": [], "Original": [], "WC": [], "NWC": []}
-    for r in rows:
-        amp_dict[r.label].append(r.amplitude)
+def _parse_names(value: Optional[str], allowed, what: str):
+    """Comma-separated query value → list of names (all of `allowed` when omitted)."""
+    if not value:
+        return list(allowed)
+    names = [v.strip() for v in value.split(",") if v.strip()]
+    unknown = [n for n in names if n not in allowed]
+    if unknown or not names:
+        raise HTTPException(400, f"Unknown {what} {unknown}; choose from {list(allowed)}")
+    return names
+
+def _check_window(start: int, end: Optional[int]) -> None:
+    if end is not None and end <= start:
+        raise HTTPException(400, "end must be greater than start")
+
+def _to_samples(value: Optional[float], unit: str) -> Optional[int]:
+    if value is None:
+        return None
+    return int(round(value * Fs)) if unit == "seconds" else int(value)
 
-    return amp_dict
+@app.get("/sessions/{session_id}/results/amplitude")
+def get_amplitude_arrays(
+    session_id: int,
+    start: float = Query(0, ge=0),
+    end: Optional[float] = Query(None, gt=0),
+    unit: Literal["samples", "seconds"] = "samples",
+    labels: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Amplitude arrays per label. start/end (in samples or seconds, end
+    exclusive) select a window, labels= a subset of labels, and fields=
+    "values" (default) and/or "time" (the window's time axis in `unit`).
+    """
+    _require_session(db, session_id)
+    first, stop = _to_samples(start, unit), _to_samples(end, unit)
+    _check_window(first, stop)
+    names = _parse_names(labels, AMP_LABELS, "labels")
+    wanted = _parse_names(fields or "values", ["values", "time"], "fields")
+
+    series = result_io.load_amplitudes(db, session_id, names, first, stop)
+    body = dict(series) if "values" in wanted else {}
+    if "time" in wanted:
+        n = max((len(v) for v in series.values()), default=0)
+        t = np.arange(first, first + n)
+        body["time"] = t / Fs if unit == "seconds" else t
+    return transport.NumpyJSONResponse(body)
 
 @app.get("/sessions/{session_id}/results/welch")
-def get_welch_arrays(session_id: int, db: Session = Depends(get_db)):
-    sess = db.query(SessionModel).filter(SessionModel.id == session_id).first()
-    if not sess:
-        raise HTTPException(404, detail="Session not found")
+def get_welch_arrays(
+    session_id: int,
+    fmin: Optional[float] = Query(None, ge=0),
+    fmax: Optional[float] = Query(None, ge=0),
+    labels: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Welch PSD of a run. fmin/fmax (Hz, inclusive) select a band, labels= a
+    subset of labels, and fields= "frequencies" and/or "power".
+    """
+    _require_session(db, session_id)
+    names = _parse_names(labels, AMP_LABELS, "labels")
+    wanted = _parse_names(fields, ["frequencies", "power"], "fields")
+    freqs, power = result_io.load_welch(db, session_id, names, fmin, fmax)
+    body = {}
+    if "frequencies" in wanted:
+        body["frequencies"] = freqs
+    if "power" in wanted:
+        body["power"] = power
+    return transport.NumpyJSONResponse(body)
+
+
+def _downsampled(series: Dict[str, np.ndarray], offset: int, points: int, method: str) -> dict:
+    out = {}
+    for name, values in series.items():
+        idx, reduced = downsample.reduce(values, points, method)
+        out[name] = {"t": idx + offset, "values": reduced}
+    return out
+
+@app.get("/sessions/{session_id}/results/amplitude/downsampled")
+def get_amplitude_downsampled(
+    session_id: int,
+    points: int = Query(2000, ge=3, le=100_000),
+    start: int = Query(0, ge=0),
+    end: Optional[int] = Query(None, gt=0),
+    method: Literal["lttb", "minmax"] = "lttb",
+    labels: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    About `points` points per label over samples [start, end) of a run's
+    amplitudes; `t` is the sample index (seconds = t / fs).
+    """
+    _require_session(db, session_id)
+    _check_window(start, end)
+    names = _parse_names(labels, AMP_LABELS, "labels")
+    series = result_io.load_amplitudes(db, session_id, names, start, end)
+    return transport.NumpyJSONResponse({
+        "session_id": session_id,
+        "fs":         Fs,
+        "method":     method,
+        "series":     _downsampled(series, start, points, method),
+    })
 
-    rows = (
-        db.query(ResultsWelch)
-        .filter(ResultsWelch.session_id == session_id)
-        .order_by(ResultsWelch.frequency.asc())
-        .all()
-    )
+@app.get("/sessions/{session_id}/eeg/downsampled")
+def get_eeg_downsampled(
+    session_id: int,
+    points: int = Query(2000, ge=3, le=100_000),
+    start: int = Query(0, ge=0),
+    end: Optional[int] = Query(None, gt=0),
+    method: Literal["lttb", "minmax"] = "minmax",
+    channels: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """Raw EEG of a session, reduced the same way per channel."""
+    _require_session(db, session_id)
+    _check_window(start, end)
+    names = _parse_names(channels, CHANNELS, "channels")
+    eeg = load_session_eeg(db, session_id, start, end, names)
+    series = {ch: eeg[:, i] for i, ch in enumerate(names)}
+    return transport.NumpyJSONResponse({
+        "session_id": session_id,
+        "fs":         Fs,
+        "method":     method,
+        "series":     _downsampled(series, start, points, method),
+    })
 
-    freqs          = [r.frequency for r in rows]
-    power_all      = [r.power_all for r in rows]
-    power_original = [r.power_original for r in rows]
-    power_wc       = [r.power_wc for r in rows]
-    power_nwc      = [r.power_nwc for r in rows]
 
-    return {
-        "frequencies": freqs,
-        "power": {
-            "All":      power_all,
-            "Original": power_original,
-            "WC":       power_wc,
-            "NWC":      power_nwc,
-        },
-    }
+# ────────────────────────────────────────────────────────────────────────────
+# Rendered plots are cached per (run, plot, size) once the run is persisted
+PLOT_CACHE_CONTROL = "public, max-age=3600"
 
+def _png_bytes(fig) -> bytes:
+    buf = io.BytesIO()
+    plt.tight_layout()
+    fig.savefig(buf, format="png", dpi=fig.dpi)
+    plt.close(fig)
+    return buf.getvalue()
 
-# ────────────────────────────────────────────────────────────────────────────
-# Single “Original vs All” PNG endpoint
-@app.get("/sessions/{session_id}/plot/amplitude_orig_vs_all.png")
-def plot_amplitude_orig_vs_all(session_id: int, db: Session = Depends(get_db)):
+def _cached_png(
+    db: Session,
+    session_id: int,
+    plot: str,
+    render,
+    width: float,
+    height: float,
+    dpi: int,
+    if_none_match: Optional[str],
+) -> Response:
     """
-    Fetch 'Original' and 'All' amplitude arrays from the database,
-    plot them on a Matplotlib figure, and stream as PNG.
+    Serve a plot from plot_cache, rendering it on a miss. Answers 304 when the
+    client's If-None-Match already holds the current ETag. The size is
+    snapped to plot_cache's grid first. Only runs whose results are
+    committed are cached; anything else (computing, spooled, failed) is
+    rendered with no-store.
     """
-    amp_dict = get_amplitude_arrays(session_id, db)
-    arr_all  = np.array(amp_dict["All"])
-    arr_orig = np.array(amp_dict["Original"])
+    _require_session(db, session_id)
+    width, height, dpi = plot_cache.quantize(width, height, dpi)
+    if not persistence.status(session_id, db)["persisted"]:
+        fig = render(db, session_id, width, height, dpi)
+        return Response(_png_bytes(fig), media_type="image/png",
+                        headers={"Cache-Control": "no-store"})
+
+    cache_key = plot_cache.key(session_id, plot, width, height, dpi)
+    entry = plot_cache.get(cache_key)
+    if entry is None:
+        entry = plot_cache.put(cache_key, _png_bytes(render(db, session_id, width, height, dpi)))
+    png, etag = entry
+    headers = {"ETag": etag, "Cache-Control": PLOT_CACHE_CONTROL}
+    if if_none_match and etag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(png, media_type="image/png", headers=headers)
+
+def _render_amplitude_orig_vs_all(db: Session, session_id: int, width: float, height: float, dpi: int):
+    amp_dict = result_io.load_amplitudes(db, session_id, ["All", "Original"])
+    arr_all  = amp_dict["All"]
+    arr_orig = amp_dict["Original"]
 
     n_samples = arr_orig.shape[0]
     times = np.arange(n_samples)
 
-    fig, ax = plt.subplots(figsize=(10, 5))
+    fig, ax = plt.subplots(figsize=(width, height), dpi=dpi)
     ax.plot(times, arr_orig, label="Original", color="black", linewidth=1)
     ax.plot(times, arr_all,  label="All",      color="magenta", alpha=0.7, linewidth=1)
     ax.set_title(f"Session {session_id} – Original vs All")
@@ -514,30 +620,16 @@ def plot_amplitude_orig_vs_all(session_id: int, db: Session = Depends(get_db)):
     ax.set_ylabel("Amplitude")
     ax.legend(loc="upper right")
     ax.grid(True)
+    return fig
 
-    buf = io.BytesIO()
-    plt.tight_layout()
-    fig.savefig(buf, format="png", dpi=150)
-    plt.close(fig)
-    buf.seek(0)
-    return StreamingResponse(buf, media_type="image/png")
-
+def _render_welch(db: Session, session_id: int, width: float, height: float, dpi: int):
+    freqs, power = result_io.load_welch(db, session_id)
+    p_all      = power["All"]
+    p_orig     = power["Original"]
+    p_wc       = power["WC"]
+    p_nwc      = power["NWC"]
 
-# ────────────────────────────────────────────────────────────────────────────
-# Welch‐PSD PNG endpoint (if you still want to keep it)
-@app.get("/sessions/{session_id}/plot/welch.png")
-def plot_welch_png(session_id: int, db: Session = Depends(get_db)):
-    """
-    Fetch Welch‐PSD arrays from the database, plot power vs frequency for all four labels, and stream as PNG.
-    """
-    welch_resp = get_welch_arrays(session_id, db)
-    freqs      = np.array(welch_resp["frequencies"])
-    p_all      = np.array(welch_resp["power"]["All"])
-    p_orig     = np.array(welch_resp["power"]["Original"])
-    p_wc       = np.array(welch_resp["power"]["WC"])
-    p_nwc      = np.array(welch_resp["power"]["NWC"])
-
-    fig, ax = plt.subplots(figsize=(10, 5))
+    fig, ax = plt.subplots(figsize=(width, height), dpi=dpi)
     ax.plot(freqs, p_orig,  label="Original", color="black", linewidth=1)
     ax.plot(freqs, p_all,   label="All",      color="red",    alpha=0.7, linewidth=1)
     ax.plot(freqs, p_wc,    label="WC",       color="green",  alpha=0.7, linewidth=1)
@@ -547,28 +639,97 @@ def plot_welch_png(session_id: int, db: Session = Depends(get_db)):
     ax.set_ylabel("Power")
     ax.legend(loc="upper right")
     ax.grid(True)
+    return fig
+
+# ────────────────────────────────────────────────────────────────────────────
+# Single “Original vs All” PNG endpoint
+@app.get("/sessions/{session_id}/plot/amplitude_orig_vs_all.png")
+def plot_amplitude_orig_vs_all(
+    session_id: int,
+    width: float = Query(10, gt=0, le=40),
+    height: float = Query(5, gt=0, le=20),
+    dpi: int = Query(150, ge=50, le=300),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """
+    'Original' and 'All' amplitude arrays of a run plotted as PNG
+    (width/height in inches), served from the plot cache when possible.
+    """
+    return _cached_png(db, session_id, "amplitude_orig_vs_all", _render_amplitude_orig_vs_all,
+                       width, height, dpi, if_none_match)
 
-    buf = io.BytesIO()
-    plt.tight_layout()
-    fig.savefig(buf, format="png", dpi=150)
-    plt.close(fig)
-    buf.seek(0)
-    return StreamingResponse(buf, media_type="image/png")
+
+# ────────────────────────────────────────────────────────────────────────────
+# Welch‐PSD PNG endpoint (if you still want to keep it)
+@app.get("/sessions/{session_id}/plot/welch.png")
+def plot_welch_png(
+    session_id: int,
+    width: float = Query(10, gt=0, le=40),
+    height: float = Query(5, gt=0, le=20),
+    dpi: int = Query(150, ge=50, le=300),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """
+    Welch‐PSD power vs frequency for all four labels as PNG, served from the
+    plot cache when possible.
+    """
+    return _cached_png(db, session_id, "welch", _render_welch,
+                       width, height, dpi, if_none_match)
+
+def _session_cursor(ts, session_id: int) -> str:
+    return f"{ts.isoformat()}_{session_id}"
 
 @app.get("/sessions")
-async def get_sessions(db: Session = Depends(get_db)):
+async def get_sessions(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    before: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
     """
-    Get all sessions from the database.
+    Get all sessions from the database, newest first, in one query.
     Maps database fields to the format expected by the frontend.
+    With `limit`, returns one page and sets X-Next-Cursor; pass it back
+    as `before` for the next page (keyset on timestamp, id).
     """
-    sessions = db.query(SessionModel).order_by(SessionModel.session_timestamp.desc()).all()
-    
+    has_amplitude_data = (
+        select(ResultsAmp.id).where(ResultsAmp.session_id == SessionModel.id).exists()
+    )
+    stmt = (
+        select(
+            SessionModel.id,
+            SessionModel.flag,
+            SessionModel.algorithm_name,
+            SessionModel.session_timestamp,
+            SessionModel.processing_time,
+            has_amplitude_data.label("has_amplitude_data"),
+        )
+        .order_by(SessionModel.session_timestamp.desc(), SessionModel.id.desc())
+    )
+    if before:
+        try:
+            ts_text, id_text = before.rsplit("_", 1)
+            ts, last_id = datetime.fromisoformat(ts_text), int(id_text)
+        except ValueError:
+            raise HTTPException(400, "Invalid cursor")
+        stmt = stmt.where(or_(
+            SessionModel.session_timestamp < ts,
+            and_(SessionModel.session_timestamp == ts, SessionModel.id < last_id),
+        ))
+    if limit:
+        stmt = stmt.limit(limit)
+    sessions = (await db.execute(stmt)).all()
+    if limit and len(sessions) == limit:
+        last = sessions[-1]
+        response.headers["X-Next-Cursor"] = _session_cursor(last.session_timestamp, last.id)
+
     # Map database fields to frontend expected format
     session_summaries = []
     for sess in sessions:
         # Calculate size based on whether session has results
-        has_amplitude_data = db.query(ResultsAmp).filter(ResultsAmp.session_id == sess.id).first() is not None
-        size = "Processing Complete" if has_amplitude_data else "No Results"
+        size = "Processing Complete" if sess.has_amplitude_data else "No Results"
         
         session_summaries.append({
             "id": str(sess.id),
@@ -580,4 +741,59 @@ async def get_sessions(db: Session = Depends(get_db)):
             "processing_time": float(sess.processing_time) if sess.processing_time else 0.0
         })
     
-    return session_summaries
\ No newline at end of file
+    return session_summaries
+
+@app.get("/runs/{run_id}/status")
+def get_run_status(run_id: int, db: Session = Depends(get_db)):
+    """Whether a run's results have reached the database yet (write-behind)."""
+    run = db.query(SessionModel).filter(SessionModel.id == run_id).first()
+    if not run:
+        raise HTTPException(404, f"Run {run_id} not found")
+    return persistence.status(run_id, db)
+
+@app.get("/jobs")
+def get_jobs():
+    """Snapshots of every known Kalman job (finished ones expire after an hour)."""
+    return jobs.list_jobs()
+
+@app.get("/jobs/{job_id}")
+def get_job_status(job_id: str):
+    job = jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(404, f"Job '{job_id}' not found")
+    return job.snapshot()
+
+@app.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    """
+    Cancel a queued or running job. A running engine stops at the next
+    one-second block, its pool worker is freed and the run is discarded.
+    """
+    job = jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(404, f"Job '{job_id}' not found")
+    if job.status not in ("queued", "running"):
+        raise HTTPException(409, f"Job '{job_id}' is {job.status} and can no longer be cancelled")
+    job.cancel()
+    return job.snapshot()
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """
+    Server-Sent Events stream of a job's progress: one `progress` event per
+    processed second of EEG (seconds done/total, ETA, samples/s) and a final
+    `end` event when the job is done, failed or rejected.
+    """
+    job = jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(404, f"Job '{job_id}' not found")
+    return StreamingResponse(
+        job.events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/scheduler/status")
+def get_scheduler_status():
+    """Running/queued Kalman jobs as seen by the admission controller."""
+    return scheduler.status()
\ No newline at end of file
@@ -0,0 +1,43 @@
+# migrations.py  ────────────────────────────────────────────────────────────
+# Schema versions this service relies on.
+#
+# The shared `datamed` schema is migrated by the backend (Back/src/migrations.py),
+# which owns the runner, the `schema_migrations` table and the query-plan
+# check. The Kalman service only lists the versions its queries need and
+# reports at startup any the backend has not applied yet.
+#
+#   python migrations.py   list required versions that are still missing
+import sys
+from typing import List
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from database import engine
+
+REQUIRED: List[str] = [
+    "0001_hot_path_indexes",      # results_* (session_id, label, time) indexes
+    "0002_session_eeg_payload",   # sessions.eeg_payload_id, read by eeg_io
+]
+
+
+def missing(bind: Engine = engine) -> List[str]:
+    """Required versions not recorded in schema_migrations yet."""
+    if not inspect(bind).has_table("schema_migrations"):
+        return list(REQUIRED)
+    with bind.connect() as conn:
+        applied = set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+    return [version for version in REQUIRED if version not in applied]
+
+
+def check(bind: Engine = engine) -> List[str]:
+    """Print a warning for missing versions; returns them."""
+    pending = missing(bind)
+    if pending:
+        print(f"schema migrations not applied yet: {', '.join(pending)} "
+              f"(start the backend or run Back/src/migrations.py)")
+    return pending
+
+
+if __name__ == "__main__":
+    sys.exit(1 if check() else 0)
@@ -0,0 +1,268 @@
+# persistence.py  ───────────────────────────────────────────────────────────
+# Write-behind storage of Kalman results.
+#
+# /run-kalman spools a finished run to an .npz file on local disk and returns;
+# a background thread then bulk-inserts it into results_y / results_amplitude
+# / results_welch in one transaction and deletes the spool file. Failed writes
+# are retried with exponential backoff up to MAX_ATTEMPTS times, after which
+# the spool file is moved to failed/ for inspection; spool files left behind
+# by a crash or restart are picked up again on startup.
+#
+# status() tells the stages of a run apart: "computing" from the moment its
+# session row is committed (Computing.begin) until it is spooled, "pending"
+# / "retrying" while spooled, "failed", and "persisted" only once its result
+# rows are in the database.
+import os
+import queue
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+from sqlalchemy import delete, insert, select
+
+from database import SessionLocal
+from models import ResultsAmp, ResultsWelch, ResultsY
+from result_io import AMP_LABELS, Y_LABELS
+
+SPOOL_DIR = os.getenv(
+    "KALMAN_SPOOL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "spool")
+)
+MAX_FLOAT32 = 3.4e38      # MySQL FLOAT max
+BATCH_SIZE = 10_000       # rows per executemany
+MAX_BACKOFF = 60.0        # seconds
+MAX_ATTEMPTS = int(os.getenv("KALMAN_PERSIST_MAX_ATTEMPTS", "8"))
+
+_queue: "queue.Queue[Optional[int]]" = queue.Queue()
+_worker: Optional[threading.Thread] = None
+_attempts: Dict[int, int] = {}
+_errors: Dict[int, str] = {}
+_computing = set()        # run ids created by this process and not yet spooled
+_listeners = []
+
+
+def on_persisted(fn) -> None:
+    """Register fn(run_id), called from the worker after a run is committed."""
+    _listeners.append(fn)
+
+
+def _spool_path(run_id: int) -> str:
+    return os.path.join(SPOOL_DIR, f"run_{run_id}.npz")
+
+
+def _failed_path(run_id: int) -> str:
+    return os.path.join(SPOOL_DIR, "failed", f"run_{run_id}.npz")
+
+
+class Computing:
+    """
+    `with Computing() as computing:` around a run; computing.begin(run_id)
+    once its session row exists. If the block ends without the run having
+    been spooled (error, cancellation), the run stops counting as computing.
+    """
+
+    def __init__(self):
+        self.run_id: Optional[int] = None
+
+    def begin(self, run_id: int) -> None:
+        self.run_id = run_id
+        _computing.add(run_id)
+
+    def __enter__(self) -> "Computing":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self.run_id is not None and not os.path.exists(_spool_path(self.run_id)):
+            _computing.discard(self.run_id)
+
+
+def _clean(arr) -> np.ndarray:
+    """Non-finite → 0 and clamp to the MySQL FLOAT range."""
+    arr = np.nan_to_num(np.asarray(arr, dtype=np.float64), nan=0.0, posinf=0.0, neginf=0.0)
+    return np.clip(arr, -MAX_FLOAT32, MAX_FLOAT32)
+
+
+# ── producer side ─────────────────────────────────────────────────────────
+def enqueue(
+    run_id: int,
+    algorithm_id: int,
+    ys: Dict[str, np.ndarray],
+    amps: Dict[str, np.ndarray],
+    freqs: np.ndarray,
+    psd: Dict[str, np.ndarray],
+) -> None:
+    """Durably spool one run (atomic rename) and hand it to the worker."""
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    fields = {"algorithm_id": np.asarray(algorithm_id), "freqs": _clean(freqs)}
+    fields.update({f"y_{lab}": _clean(ys[lab]) for lab in Y_LABELS})
+    fields.update({f"amp_{lab}": _clean(amps[lab]) for lab in AMP_LABELS})
+    fields.update({f"psd_{lab}": _clean(psd[lab]) for lab in AMP_LABELS})
+
+    final = _spool_path(run_id)
+    tmp = final + ".part"
+    with open(tmp, "wb") as fh:
+        np.savez(fh, **fields)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, final)
+    _queue.put(run_id)
+
+
+def _has_results(db, run_id: int) -> bool:
+    return db.execute(
+        select(ResultsY.id).where(ResultsY.session_id == run_id).limit(1)
+    ).first() is not None
+
+
+def status(run_id: int, db=None) -> dict:
+    """
+    Where a run's results are: computing | pending | retrying | failed |
+    persisted | unknown. "persisted" needs `db`, to see the committed rows.
+    """
+    if os.path.exists(_spool_path(run_id)):
+        state = "retrying" if run_id in _errors else "pending"
+    elif run_id in _computing:
+        state = "computing"
+    elif os.path.exists(_failed_path(run_id)):
+        state = "failed"
+    elif db is not None and _has_results(db, run_id):
+        state = "persisted"
+    else:
+        state = "unknown"
+    return {
+        "session_run_id": run_id,
+        "persisted":      state == "persisted",
+        "status":         state,
+        "attempts":       _attempts.get(run_id, 0),
+        "error":          _errors.get(run_id) if state in ("retrying", "failed") else None,
+    }
+
+
+# ── worker side ───────────────────────────────────────────────────────────
+def _label_rows(run_id, algorithm_id, arrays, labels, value_col):
+    """Yield results_y / results_amplitude rows, one per sample and label."""
+    for lab in labels:
+        for idx, value in enumerate(arrays[lab].tolist()):
+            yield {
+                "session_id":   run_id,
+                "algorithm_id": algorithm_id,
+                "label":        lab,
+                value_col:      value,
+                "time":         float(idx),
+            }
+
+
+def _insert_batched(db, table, rows) -> None:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            db.execute(insert(table), batch)
+            batch = []
+    if batch:
+        db.execute(insert(table), batch)
+
+
+def persist(run_id: int) -> None:
+    """Write one spooled run to the database in a single transaction."""
+    with np.load(_spool_path(run_id), allow_pickle=False) as npz:
+        data = {key: npz[key] for key in npz.files}
+    algorithm_id = int(data["algorithm_id"])
+    ys = {lab: data[f"y_{lab}"] for lab in Y_LABELS}
+    amps = {lab: data[f"amp_{lab}"] for lab in AMP_LABELS}
+
+    db = SessionLocal()
+    try:
+        # clear a half-applied earlier attempt so replays stay idempotent
+        for table in (ResultsY, ResultsAmp, ResultsWelch):
+            db.execute(delete(table).where(table.session_id == run_id))
+        _insert_batched(db, ResultsY, _label_rows(run_id, algorithm_id, ys, Y_LABELS, "y_value"))
+        _insert_batched(db, ResultsAmp, _label_rows(run_id, algorithm_id, amps, AMP_LABELS, "amplitude"))
+        _insert_batched(db, ResultsWelch, (
+            {
+                "session_id":     run_id,
+                "algorithm_id":   algorithm_id,
+                "frequency":      freq,
+                "power_all":      p_all,
+                "power_original": p_orig,
+                "power_wc":       p_wc,
+                "power_nwc":      p_nwc,
+            }
+            for freq, p_all, p_orig, p_wc, p_nwc in zip(
+                data["freqs"].tolist(),
+                data["psd_All"].tolist(),
+                data["psd_Original"].tolist(),
+                data["psd_WC"].tolist(),
+                data["psd_NWC"].tolist(),
+            )
+        ))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    # committed: stop reporting "computing" before the spool file disappears
+    _computing.discard(run_id)
+    os.unlink(_spool_path(run_id))
+
+
+def _give_up(run_id: int) -> None:
+    """Park a run that keeps failing (corrupt spool, session gone) in failed/."""
+    os.makedirs(os.path.dirname(_failed_path(run_id)), exist_ok=True)
+    os.replace(_spool_path(run_id), _failed_path(run_id))
+    _computing.discard(run_id)
+    print(f"persist run {run_id} failed {_attempts[run_id]} times, moved to {_failed_path(run_id)}")
+
+
+def _retry_later(run_id: int) -> None:
+    delay = min(MAX_BACKOFF, 2.0 ** (_attempts[run_id] - 1))
+    timer = threading.Timer(delay, _queue.put, args=(run_id,))
+    timer.daemon = True
+    timer.start()
+
+
+def _work() -> None:
+    while True:
+        run_id = _queue.get()
+        if run_id is None:
+            return
+        if not os.path.exists(_spool_path(run_id)):
+            continue  # already written by an earlier queue entry
+        _attempts[run_id] = _attempts.get(run_id, 0) + 1
+        try:
+            persist(run_id)
+        except Exception as e:
+            _errors[run_id] = str(e)
+            print(f"persist run {run_id} failed (attempt {_attempts[run_id]}): {e}")
+            if _attempts[run_id] >= MAX_ATTEMPTS:
+                _give_up(run_id)
+            else:
+                _retry_later(run_id)
+            continue
+        _errors.pop(run_id, None)
+        _attempts.pop(run_id, None)
+        for fn in _listeners:
+            fn(run_id)
+
+
+def start() -> None:
+    """Start the worker and re-queue runs spooled before the last shutdown."""
+    global _worker
+    if _worker is not None:
+        return
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    for name in sorted(os.listdir(SPOOL_DIR)):
+        if name.startswith("run_") and name.endswith(".npz"):
+            _queue.put(int(name[len("run_"):-len(".npz")]))
+    _worker = threading.Thread(target=_work, name="kalman-persistence", daemon=True)
+    _worker.start()
+
+
+def stop(timeout: float = 30.0) -> None:
+    """Let the current write finish; anything still spooled resumes on start()."""
+    global _worker
+    if _worker is None:
+        return
+    _queue.put(None)
+    _worker.join(timeout)
+    _worker = None
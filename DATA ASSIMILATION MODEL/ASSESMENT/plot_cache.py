@@ -0,0 +1,126 @@
+# plot_cache.py  ────────────────────────────────────────────────────────────
+# Rendered PNGs of stored runs. A run's results never change once persisted,
+# so each (run, plot, size) is rendered once and then served from a memory
+# LRU, backed by files on disk that survive restarts. Entries of a run are
+# dropped when its results are written again (persistence.on_persisted).
+#
+# Requested sizes are snapped to a grid (quantize) so clients can't mint
+# unbounded keys, and the disk tier is an LRU too: files are touched when
+# served, and put() deletes the least recently used beyond
+# MAX_DISK_ENTRIES files or MAX_DISK_BYTES bytes. The limits hold across
+# processes because they are applied to the directory itself.
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+CACHE_DIR = os.getenv(
+    "KALMAN_PLOT_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "plot_cache")
+)
+MAX_ENTRIES = int(os.getenv("KALMAN_PLOT_CACHE_ENTRIES", "256"))
+MAX_DISK_ENTRIES = int(os.getenv("KALMAN_PLOT_CACHE_DISK_ENTRIES", "2048"))
+MAX_DISK_BYTES = int(os.getenv("KALMAN_PLOT_CACHE_DISK_BYTES", str(512 * 1024 ** 2)))
+
+SIZE_STEP = 0.5                       # inches
+DPI_STEPS = (72, 100, 150, 200, 300)
+
+# (png bytes, etag)
+Entry = Tuple[bytes, str]
+
+_memory: "OrderedDict[str, Entry]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def quantize(width: float, height: float, dpi: int) -> Tuple[float, float, int]:
+    """The nearest cached size: inches in SIZE_STEP steps, dpi from DPI_STEPS."""
+    def snap(inches: float) -> float:
+        return max(SIZE_STEP, round(inches / SIZE_STEP) * SIZE_STEP)
+    return snap(width), snap(height), min(DPI_STEPS, key=lambda step: abs(step - dpi))
+
+
+def key(run_id: int, plot: str, width: float, height: float, dpi: int) -> str:
+    return f"{run_id}_{plot}_{width:g}x{height:g}_{dpi}"
+
+
+def etag_for(png: bytes) -> str:
+    return '"' + hashlib.sha1(png).hexdigest()[:20] + '"'
+
+
+def _path(cache_key: str) -> str:
+    return os.path.join(CACHE_DIR, cache_key + ".png")
+
+
+def _remember(cache_key: str, entry: Entry) -> None:
+    with _lock:
+        _memory[cache_key] = entry
+        _memory.move_to_end(cache_key)
+        while len(_memory) > MAX_ENTRIES:
+            _memory.popitem(last=False)
+
+
+def get(cache_key: str) -> Optional[Entry]:
+    """Memory first, then disk (promoting the file back into memory)."""
+    with _lock:
+        entry = _memory.get(cache_key)
+        if entry is not None:
+            _memory.move_to_end(cache_key)
+            return entry
+    try:
+        with open(_path(cache_key), "rb") as fh:
+            png = fh.read()
+        os.utime(_path(cache_key))   # recently used, for _trim_disk
+    except FileNotFoundError:
+        return None
+    entry = (png, etag_for(png))
+    _remember(cache_key, entry)
+    return entry
+
+
+def put(cache_key: str, png: bytes) -> Entry:
+    entry = (png, etag_for(png))
+    _remember(cache_key, entry)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = _path(cache_key) + ".part"
+    with open(tmp, "wb") as fh:
+        fh.write(png)
+    os.replace(tmp, _path(cache_key))
+    _trim_disk()
+    return entry
+
+
+def _trim_disk() -> None:
+    """Delete the least recently used files beyond the disk limits."""
+    files = []
+    for item in os.scandir(CACHE_DIR):
+        if item.name.endswith(".png"):
+            try:
+                stat = item.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, item.path))
+    files.sort(reverse=True)   # newest first
+    total = 0
+    for kept, (_, size, path) in enumerate(files):
+        total += size
+        if kept >= MAX_DISK_ENTRIES or total > MAX_DISK_BYTES:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+
+def invalidate(run_id: int) -> None:
+    """Forget every rendered plot of a run, in memory and on disk."""
+    prefix = f"{run_id}_"
+    with _lock:
+        for cache_key in [k for k in _memory if k.startswith(prefix)]:
+            del _memory[cache_key]
+    if not os.path.isdir(CACHE_DIR):
+        return
+    for name in os.listdir(CACHE_DIR):
+        if name.startswith(prefix):
+            try:
+                os.unlink(os.path.join(CACHE_DIR, name))
+            except FileNotFoundError:
+                pass
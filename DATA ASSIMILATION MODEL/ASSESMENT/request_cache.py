@@ -0,0 +1,45 @@
+# request_cache.py  ─────────────────────────────────────────────────────────
+# Invalidation half of the backend's request cache (Back/src/request_cache.py).
+# The backend caches listings per user under a generation counter. When both
+# services share a Redis-compatible server (REQUEST_CACHE_REDIS_URL, set to
+# the same URL for both), a run created, finished or persisted here bumps its
+# owner's counter so their listings and results refresh at once.
+#
+# Without Redis this module is a no-op, and nothing needs it: the backend
+# then leaves everything runs can change (session listings, results)
+# uncached, and only caches what this service never writes.
+import os
+from typing import Optional
+
+try:
+    import redis
+    import redis.asyncio
+except ImportError:  # optional: without it this module is a no-op
+    redis = None
+
+REQUEST_CACHE_REDIS_URL = os.getenv("REQUEST_CACHE_REDIS_URL")
+
+_enabled = bool(REQUEST_CACHE_REDIS_URL and redis is not None)
+# redis.asyncio for the request path, a blocking client for the persistence thread
+_client = redis.asyncio.Redis.from_url(REQUEST_CACHE_REDIS_URL) if _enabled else None
+_blocking = redis.Redis.from_url(REQUEST_CACHE_REDIS_URL) if _enabled else None
+
+
+async def invalidate(user_id: Optional[int]) -> None:
+    """Drop everything the backend has cached for a user."""
+    if _client is None or user_id is None:
+        return
+    try:
+        await _client.incr(f"rc:gen:{user_id}")
+    except Exception as e:   # a cache outage must not fail the run
+        print(f"request cache invalidation failed for user {user_id}: {e}")
+
+
+def invalidate_blocking(user_id: Optional[int]) -> None:
+    """invalidate() for worker threads."""
+    if _blocking is None or user_id is None:
+        return
+    try:
+        _blocking.incr(f"rc:gen:{user_id}")
+    except Exception as e:
+        print(f"request cache invalidation failed for user {user_id}: {e}")
@@ -0,0 +1,176 @@
+# result_io.py  ─────────────────────────────────────────────────────────────
+# Read stored Kalman results with column-only Core selects, straight into
+# NumPy arrays, instead of hydrating one ORM object per sample, and stream
+# the CSV export without holding it in memory.
+import csv
+import io
+import zlib
+from itertools import chain
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import Algorithm, ResultsAmp, ResultsWelch, ResultsY
+
+Y_LABELS = ["All", "WC", "NWC"]
+AMP_LABELS = ["All", "Original", "WC", "NWC"]
+WELCH_COLUMNS = ["power_all", "power_original", "power_wc", "power_nwc"]
+
+# CSV export columns per result type, in file order
+CSV_COLUMNS = {
+    "y":     [ResultsY.id, ResultsY.session_id, ResultsY.algorithm_id,
+              ResultsY.label, ResultsY.y_value, ResultsY.time],
+    "amp":   [ResultsAmp.id, ResultsAmp.session_id, ResultsAmp.algorithm_id,
+              ResultsAmp.label, ResultsAmp.amplitude, ResultsAmp.time],
+    "welch": [ResultsWelch.id, ResultsWelch.session_id, ResultsWelch.algorithm_id,
+              ResultsWelch.frequency, ResultsWelch.power_all, ResultsWelch.power_original,
+              ResultsWelch.power_wc, ResultsWelch.power_nwc],
+}
+
+
+def _series(
+    db: Session,
+    value_col,
+    model,
+    session_id: int,
+    label: str,
+    start: Optional[int] = None,
+    stop: Optional[int] = None,
+) -> np.ndarray:
+    stmt = (
+        select(value_col)
+        .where(model.session_id == session_id, model.label == label)
+        .order_by(model.time)
+    )
+    # `time` holds the sample index, so a window is a range on it
+    if start is not None:
+        stmt = stmt.where(model.time >= start)
+    if stop is not None:
+        stmt = stmt.where(model.time < stop)
+    return np.fromiter(db.scalars(stmt), dtype=np.float64)
+
+
+def load_amplitudes(
+    db: Session,
+    session_id: int,
+    labels: Sequence[str] = AMP_LABELS,
+    start: Optional[int] = None,
+    stop: Optional[int] = None,
+) -> Dict[str, np.ndarray]:
+    """Amplitude series per label, each ordered by time, optionally samples [start, stop)."""
+    return {
+        lab: _series(db, ResultsAmp.amplitude, ResultsAmp, session_id, lab, start, stop)
+        for lab in labels
+    }
+
+
+def load_ys(
+    db: Session,
+    session_id: int,
+    labels: Sequence[str] = Y_LABELS,
+    start: Optional[int] = None,
+    stop: Optional[int] = None,
+) -> Dict[str, np.ndarray]:
+    """Y series per label, each ordered by time, optionally samples [start, stop)."""
+    return {
+        lab: _series(db, ResultsY.y_value, ResultsY, session_id, lab, start, stop)
+        for lab in labels
+    }
+
+
+def load_welch(
+    db: Session,
+    session_id: int,
+    labels: Sequence[str] = AMP_LABELS,
+    fmin: Optional[float] = None,
+    fmax: Optional[float] = None,
+) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Welch frequencies and the power per label, ordered by frequency, optionally [fmin, fmax]."""
+    power_cols = [getattr(ResultsWelch, WELCH_COLUMNS[AMP_LABELS.index(lab)]) for lab in labels]
+    cols = [ResultsWelch.frequency] + power_cols
+    stmt = (
+        select(*cols)
+        .where(ResultsWelch.session_id == session_id)
+        .order_by(ResultsWelch.frequency)
+    )
+    if fmin is not None:
+        stmt = stmt.where(ResultsWelch.frequency >= fmin)
+    if fmax is not None:
+        stmt = stmt.where(ResultsWelch.frequency <= fmax)
+    flat = np.fromiter(chain.from_iterable(db.execute(stmt)), dtype=np.float64)
+    table = flat.reshape(-1, len(cols))
+    power = {lab: np.ascontiguousarray(table[:, i + 1]) for i, lab in enumerate(labels)}
+    return np.ascontiguousarray(table[:, 0]), power
+
+
+def y_rows_with_algorithm(db: Session, session_id: int):
+    """results_y rows of a session joined to their algorithm name, ordered by time."""
+    stmt = (
+        select(
+            ResultsY.id,
+            ResultsY.algorithm_id,
+            ResultsY.label,
+            ResultsY.y_value,
+            ResultsY.time,
+            Algorithm.name.label("algorithm_name"),
+        )
+        .outerjoin(Algorithm, Algorithm.id == ResultsY.algorithm_id)
+        .where(ResultsY.session_id == session_id)
+        .order_by(ResultsY.time)
+    )
+    return db.execute(stmt).mappings().all()
+
+
+def csv_select(kind: str, session_id: int):
+    """Column-only select behind the CSV export of one result type."""
+    cols = CSV_COLUMNS[kind]
+    model = cols[0].class_
+    order = model.frequency if kind == "welch" else model.time
+    return select(*cols).where(model.session_id == session_id).order_by(order)
+
+
+def csv_header(kind: str):
+    return [col.key for col in CSV_COLUMNS[kind]]
+
+
+CSV_BATCH_ROWS = 5_000
+
+
+def iter_csv(kind: str, session_id: int, gzip: bool = False) -> Iterator[bytes]:
+    """
+    Yield the CSV export of one result type in chunks of CSV_BATCH_ROWS rows,
+    fetched through a server-side cursor so memory stays flat whatever the
+    session length. With gzip=True the chunks form one .gz stream.
+
+    Opens its own database session: it runs after the endpoint has returned,
+    when the request's get_db session is already closed.
+    """
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> bytes:
+        data = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        return gz.compress(data) if gz else data
+
+    writer.writerow(csv_header(kind))
+    db = SessionLocal()
+    try:
+        stmt = csv_select(kind, session_id).execution_options(yield_per=CSV_BATCH_ROWS)
+        for rows in db.execute(stmt).partitions():
+            writer.writerows(rows)
+            chunk = flush()
+            if chunk:
+                yield chunk
+    finally:
+        db.close()
+    tail = flush()
+    if gz:
+        tail += gz.flush()
+    if tail:
+        yield tail
@@ -0,0 +1,205 @@
+# scheduler.py  ─────────────────────────────────────────────────────────────
+# Admission control in front of the Kalman process pool.
+#
+#  · at most `max_concurrency` runs execute at once (defaults to the CPU count)
+#  · at most `max_queue` runs wait for a slot; past that callers get 429
+#  · "interactive" waiters are always served before "batch" waiters
+#  · inside a priority level the next slot goes to the user with the fewest
+#    running jobs, round-robin on ties, so one doctor cannot starve the rest
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from typing import Deque, Dict, Optional
+
+PRIORITIES = ("interactive", "batch")
+
+
+class SchedulerFull(Exception):
+    """Raised when the wait queue is full; carries a Retry-After estimate."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Kalman queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class KalmanScheduler:
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        max_queue: Optional[int] = None,
+    ):
+        self.max_concurrency = max_concurrency or os.cpu_count() or 1
+        self.max_queue = max_queue if max_queue is not None else 4 * self.max_concurrency
+
+        self._running = 0
+        self._running_by_user: Dict[int, int] = {}
+        # priority -> user_id -> FIFO of waiters (OrderedDict gives round-robin)
+        self._waiting: Dict[str, "OrderedDict[int, Deque[asyncio.Future]]"] = {
+            p: OrderedDict() for p in PRIORITIES
+        }
+        self._queued = 0
+        self._avg_runtime = 60.0  # seconds, EWMA of finished runs
+
+    # ── public API ────────────────────────────────────────────────────────
+    async def acquire(self, user_id: int, priority: str = "interactive") -> None:
+        """Wait for a compute slot. Raises SchedulerFull when the queue is full."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"priority must be one of {PRIORITIES}")
+
+        if self._running < self.max_concurrency and self._queued == 0:
+            self._start(user_id)
+            return
+        if self._queued >= self.max_queue:
+            raise SchedulerFull(self.retry_after())
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiting[priority].setdefault(user_id, deque()).append(fut)
+        self._queued += 1
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # slot was handed over just as the caller went away
+                self.release(user_id)
+            else:
+                self._drop_waiter(priority, user_id, fut)
+            raise
+
+    def release(self, user_id: int, elapsed: Optional[float] = None) -> None:
+        """Give a slot back and hand it to the next waiter, if any."""
+        self._running -= 1
+        left = self._running_by_user.get(user_id, 1) - 1
+        if left > 0:
+            self._running_by_user[user_id] = left
+        else:
+            self._running_by_user.pop(user_id, None)
+        if elapsed is not None:
+            self._avg_runtime = 0.8 * self._avg_runtime + 0.2 * elapsed
+        self._dispatch()
+
+    def retry_after(self) -> int:
+        """Rough number of seconds until the current backlog drains."""
+        backlog = self._running + self._queued
+        return max(1, math.ceil(self._avg_runtime * backlog / self.max_concurrency))
+
+    def status(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue":       self.max_queue,
+            "running":         self._running,
+            "queued":          self._queued,
+            "running_by_user": dict(self._running_by_user),
+            "queued_by_priority": {
+                p: sum(len(q) for q in users.values())
+                for p, users in self._waiting.items()
+            },
+            "avg_runtime":     round(self._avg_runtime, 3),
+        }
+
+    # ── internals ─────────────────────────────────────────────────────────
+    def _start(self, user_id: int) -> None:
+        self._running += 1
+        self._running_by_user[user_id] = self._running_by_user.get(user_id, 0) + 1
+
+    def _dispatch(self) -> None:
+        while self._running < self.max_concurrency:
+            picked = self._next_waiter()
+            if picked is None:
+                return
+            user_id, fut = picked
+            self._queued -= 1
+            if fut.cancelled():
+                continue
+            self._start(user_id)
+            fut.set_result(None)
+
+    def _next_waiter(self):
+        for priority in PRIORITIES:
+            users = self._waiting[priority]
+            if not users:
+                continue
+            # fewest running jobs wins; min() keeps insertion order on ties
+            user_id = min(users, key=lambda u: self._running_by_user.get(u, 0))
+            queue = users.pop(user_id)
+            fut = queue.popleft()
+            if queue:
+                users[user_id] = queue  # back of the line
+            return user_id, fut
+        return None
+
+    def _drop_waiter(self, priority: str, user_id: int, fut: asyncio.Future) -> None:
+        queue = self._waiting[priority].get(user_id)
+        if queue and fut in queue:
+            queue.remove(fut)
+            self._queued -= 1
+            if not queue:
+                del self._waiting[priority][user_id]
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+scheduler = KalmanScheduler(
+    max_concurrency=_env_int("KALMAN_MAX_CONCURRENCY"),
+    max_queue=_env_int("KALMAN_MAX_QUEUE"),
+)
+
+# Kalman variants are pure-Python loops over small matrices, so they need
+# separate processes (not threads) to use more than one core.
+def _new_executor() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=scheduler.max_concurrency,
+        mp_context=get_context("spawn"),
+    )
+
+
+executor = _new_executor()
+_executor_lock = threading.Lock()
+
+
+def _replace_executor(broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+    """
+    Swap a broken pool (a worker was OOM-killed or crashed) for a fresh one.
+    Only the first caller for a given pool rebuilds it; the rest get the new one.
+    """
+    global executor
+    with _executor_lock:
+        if executor is broken:
+            broken.shutdown(wait=False, cancel_futures=True)
+            executor = _new_executor()
+            print("Kalman process pool was broken by a dead worker; started a new one")
+        return executor
+
+
+def shutdown_executor() -> None:
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_in_pool(fn, *args):
+    """
+    Run fn(*args) on the Kalman process pool and return (result, elapsed).
+    A job submitted to a pool that is already broken is resubmitted once to
+    its replacement; a job whose own worker died fails with BrokenProcessPool,
+    and the pool is replaced for the jobs after it.
+    """
+    start = time.time()
+    pool = executor
+    try:
+        future = pool.submit(fn, *args)
+    except BrokenProcessPool:
+        pool = _replace_executor(pool)
+        future = pool.submit(fn, *args)
+    try:
+        result = await asyncio.wrap_future(future)
+    except BrokenProcessPool:
+        _replace_executor(pool)
+        raise
+    return result, time.time() - start
@@ -1,6 +1,6 @@
 # schemas.py
 
-from typing import List, Dict
+from typing import List, Dict, Optional
 from pydantic import BaseModel
 
 class WelchBlock(BaseModel):
@@ -25,3 +25,6 @@ class RunResponse(BaseModel):
 # New: include session_run_id so callers know which SessionModel row was created
 class RunResponseWithId(RunResponse):
     session_run_id: int
+    job_id: Optional[str] = None   # id for /jobs/{job_id} and its SSE stream
+    partial: bool = False          # True when a time budget cut the run short
+    eeg_fingerprint: Optional[str] = None  # SHA-256 of the input EEG (float32 rows)
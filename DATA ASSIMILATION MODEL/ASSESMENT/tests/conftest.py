@@ -0,0 +1,9 @@
+# The service is a flat set of modules run from ASSESMENT/; make them importable.
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# database.py reads DB_URL at import time: point it at a throwaway SQLite file.
+os.environ.setdefault("DB_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "assesment_test.db"))
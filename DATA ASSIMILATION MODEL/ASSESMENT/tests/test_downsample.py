@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+import downsample
+
+
+def _series(n, seed=0):
+    return np.random.default_rng(seed).normal(size=n).cumsum()
+
+
+@pytest.mark.parametrize("n, n_out", [(1000, 3), (1000, 10), (1000, 999), (10, 9), (5000, 137), (12, 11)])
+def test_lttb_shape(n, n_out):
+    y = _series(n)
+    idx, values = downsample.lttb(y, n_out)
+    assert len(idx) == n_out
+    assert idx[0] == 0 and idx[-1] == n - 1
+    assert np.all(np.diff(idx) > 0)
+    np.testing.assert_array_equal(values, y[idx])
+
+
+@pytest.mark.parametrize("method", downsample.METHODS)
+@pytest.mark.parametrize("n_out", [50, 51, 500])
+def test_passthrough_when_output_is_not_smaller(method, n_out):
+    y = _series(50)
+    idx, values = downsample.reduce(y, n_out, method)
+    np.testing.assert_array_equal(idx, np.arange(50))
+    np.testing.assert_array_equal(values, y)
+
+
+def test_lttb_keeps_a_spike():
+    y = np.zeros(1000)
+    y[417] = 100.0
+    idx, _ = downsample.lttb(y, 20)
+    assert 417 in idx
+
+
+@pytest.mark.parametrize("n, n_out", [(1000, 10), (1001, 64), (10_000, 300)])
+def test_minmax_keeps_bucket_extremes(n, n_out):
+    y = _series(n, seed=1)
+    idx, values = downsample.minmax(y, n_out)
+    assert len(idx) <= n_out
+    assert np.all(np.diff(idx) > 0)
+    np.testing.assert_array_equal(values, y[idx])
+    starts = np.linspace(0, n, n_out // 2 + 1).astype(np.int64)
+    kept = set(idx.tolist())
+    for lo, hi in zip(starts[:-1], starts[1:]):
+        bucket = y[lo:hi]
+        assert lo + int(bucket.argmin()) in kept
+        assert lo + int(bucket.argmax()) in kept
+    assert y.min() in values and y.max() in values
+
+
+def test_minmax_flat_bucket_kept_once():
+    y = np.concatenate([np.full(10, 3.0), np.arange(10.0)])
+    idx, _ = downsample.minmax(y, 4)
+    assert len(idx) == 3 and np.all(np.diff(idx) > 0)
+
+
+def test_reduce_rejects_unknown_method():
+    with pytest.raises(ValueError):
+        downsample.reduce(np.arange(10.0), 5, "mean")
@@ -0,0 +1,96 @@
+import threading
+
+import numpy as np
+import pytest
+
+pytest.importorskip("greenlet")     # database.py builds the async engine too
+pytest.importorskip("aiosqlite")
+
+import persistence
+from database import Base, engine
+from result_io import AMP_LABELS, Y_LABELS
+
+
+@pytest.fixture(autouse=True)
+def spool(tmp_path, monkeypatch):
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(persistence, "SPOOL_DIR", str(tmp_path))
+    monkeypatch.setattr(persistence, "_queue", persistence.queue.Queue())
+    for state in (persistence._computing, persistence._errors, persistence._attempts):
+        state.clear()
+    yield tmp_path
+
+
+def _enqueue(run_id, n=8):
+    series = np.linspace(0.0, 1.0, n)
+    persistence.enqueue(
+        run_id, 1,
+        {lab: series for lab in Y_LABELS},
+        {lab: series for lab in AMP_LABELS},
+        np.arange(4.0),
+        {lab: np.ones(4) for lab in AMP_LABELS},
+    )
+
+
+def _drain():
+    """Run the worker until everything queued so far has been handled."""
+    persistence._queue.put(None)
+    worker = threading.Thread(target=persistence._work)
+    worker.start()
+    worker.join(10)
+
+
+def _status(run_id):
+    db = persistence.SessionLocal()
+    try:
+        return persistence.status(run_id, db)
+    finally:
+        db.close()
+
+
+def test_unknown_run_is_not_persisted():
+    state = _status(9001)
+    assert state["status"] == "unknown"
+    assert not state["persisted"]
+
+
+def test_computing_pending_persisted():
+    with persistence.Computing() as computing:
+        computing.begin(101)
+        assert _status(101)["status"] == "computing"
+        _enqueue(101)
+    assert _status(101)["status"] == "pending"
+
+    persisted = []
+    persistence._listeners.append(persisted.append)
+    try:
+        _drain()
+    finally:
+        persistence._listeners.remove(persisted.append)
+    assert persisted == [101]
+    state = _status(101)
+    assert state["status"] == "persisted" and state["persisted"]
+    assert 101 not in persistence._computing
+
+
+def test_run_abandoned_before_spooling_is_forgotten():
+    with pytest.raises(RuntimeError):
+        with persistence.Computing() as computing:
+            computing.begin(102)
+            raise RuntimeError("kalman failed")
+    assert _status(102)["status"] == "unknown"
+
+
+def test_gives_up_after_max_attempts(spool, monkeypatch):
+    monkeypatch.setattr(persistence, "MAX_ATTEMPTS", 1)
+    with persistence.Computing() as computing:
+        computing.begin(103)
+        (spool / "run_103.npz").write_bytes(b"not an npz file")
+    persistence._queue.put(103)
+    _drain()
+
+    state = _status(103)
+    assert state["status"] == "failed"
+    assert state["error"]
+    assert (spool / "failed" / "run_103.npz").exists()
+    assert not (spool / "run_103.npz").exists()
@@ -0,0 +1,73 @@
+import os
+import time
+
+import pytest
+
+import plot_cache
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(plot_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(plot_cache, "_memory", plot_cache.OrderedDict())
+    yield tmp_path
+
+
+def test_quantize_snaps_to_grid():
+    assert plot_cache.quantize(10.0, 5.0, 150) == (10.0, 5.0, 150)
+    assert plot_cache.quantize(10.26, 4.74, 160) == (10.5, 4.5, 150)
+    assert plot_cache.quantize(0.01, 19.99, 299) == (0.5, 20.0, 300)
+    assert plot_cache.quantize(3.1, 3.1, 50) == (3.0, 3.0, 72)
+
+
+def test_quantized_keys_are_bounded():
+    keys = {
+        plot_cache.key(1, "welch", *plot_cache.quantize(w / 100, h / 100, dpi))
+        for w in range(1, 4001, 23) for h in range(1, 2001, 23) for dpi in range(50, 301, 25)
+    }
+    assert len(keys) <= 80 * 40 * len(plot_cache.DPI_STEPS)
+
+
+def _age(path, seconds_ago):
+    past = time.time() - seconds_ago
+    os.utime(path, (past, past))
+
+
+def test_disk_keeps_most_recent_entries(cache_dir, monkeypatch):
+    monkeypatch.setattr(plot_cache, "MAX_DISK_ENTRIES", 2)
+    plot_cache.put("1_a", b"a")
+    _age(cache_dir / "1_a.png", 30)
+    plot_cache.put("1_b", b"b")
+    _age(cache_dir / "1_b.png", 20)
+    plot_cache.put("1_c", b"c")
+    assert sorted(os.listdir(cache_dir)) == ["1_b.png", "1_c.png"]
+
+
+def test_disk_hit_counts_as_use(cache_dir, monkeypatch):
+    monkeypatch.setattr(plot_cache, "MAX_DISK_ENTRIES", 2)
+    plot_cache.put("1_a", b"a")
+    _age(cache_dir / "1_a.png", 30)
+    plot_cache.put("1_b", b"b")
+    _age(cache_dir / "1_b.png", 20)
+    plot_cache._memory.clear()
+    assert plot_cache.get("1_a")[0] == b"a"   # served from disk, touched
+    plot_cache.put("1_c", b"c")
+    assert sorted(os.listdir(cache_dir)) == ["1_a.png", "1_c.png"]
+
+
+def test_disk_bytes_limit(cache_dir, monkeypatch):
+    monkeypatch.setattr(plot_cache, "MAX_DISK_BYTES", 250)
+    for age, name in ((30, "1_a"), (20, "1_b")):
+        plot_cache.put(name, b"x" * 100)
+        _age(cache_dir / f"{name}.png", age)
+    plot_cache.put("1_c", b"x" * 100)
+    assert sorted(os.listdir(cache_dir)) == ["1_b.png", "1_c.png"]
+    assert plot_cache.get("1_c") is not None
+
+
+def test_invalidate_drops_run(cache_dir):
+    plot_cache.put("1_a", b"a")
+    plot_cache.put("2_a", b"b")
+    plot_cache.invalidate(1)
+    assert plot_cache.get("1_a") is None
+    assert plot_cache.get("2_a") is not None
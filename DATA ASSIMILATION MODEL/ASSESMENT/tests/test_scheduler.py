@@ -0,0 +1,96 @@
+import asyncio
+import operator
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import scheduler
+from scheduler import KalmanScheduler, SchedulerFull
+
+
+def test_runs_immediately_while_slots_are_free():
+    async def main():
+        s = KalmanScheduler(max_concurrency=2, max_queue=1)
+        await s.acquire(1)
+        await s.acquire(2)
+        assert s.status()["running"] == 2
+        assert s.status()["queued"] == 0
+
+    asyncio.run(main())
+
+
+def test_full_queue_raises_with_retry_after():
+    async def main():
+        s = KalmanScheduler(max_concurrency=1, max_queue=1)
+        await s.acquire(1)
+        waiter = asyncio.create_task(s.acquire(2))
+        await asyncio.sleep(0)
+        with pytest.raises(SchedulerFull) as exc:
+            await s.acquire(3)
+        assert exc.value.retry_after >= 1
+        s.release(1)
+        await waiter
+        assert s.status()["running_by_user"] == {2: 1}
+
+    asyncio.run(main())
+
+
+def test_interactive_before_batch_and_fewest_running_user_first():
+    async def main():
+        s = KalmanScheduler(max_concurrency=2, max_queue=10)
+        await s.acquire(1)
+        await s.acquire(1)
+        order = []
+
+        async def wait(user, priority):
+            await s.acquire(user, priority)
+            order.append(user)
+
+        tasks = [
+            asyncio.create_task(wait(9, "batch")),
+            asyncio.create_task(wait(1, "interactive")),
+            asyncio.create_task(wait(2, "interactive")),
+        ]
+        await asyncio.sleep(0)
+        # user 1 still runs one job, user 2 none: user 2 is served first
+        s.release(1)
+        await asyncio.sleep(0)
+        assert order == [2]
+        s.release(1)
+        await asyncio.sleep(0)
+        assert order == [2, 1]
+        s.release(2)
+        await asyncio.sleep(0)
+        assert order == [2, 1, 9]
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def main():
+        s = KalmanScheduler(max_concurrency=1, max_queue=1)
+        await s.acquire(1)
+        waiter = asyncio.create_task(s.acquire(2))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert s.status()["queued"] == 0
+        s.release(1)
+        assert s.status()["running"] == 0
+
+    asyncio.run(main())
+
+
+def test_pool_is_replaced_after_a_worker_dies():
+    async def main():
+        broken = scheduler.executor
+        with pytest.raises(BrokenProcessPool):
+            await scheduler.run_in_pool(os._exit, 1)
+        assert scheduler.executor is not broken
+        result, _ = await scheduler.run_in_pool(operator.add, 2, 3)
+        assert result == 5
+
+    asyncio.run(main())
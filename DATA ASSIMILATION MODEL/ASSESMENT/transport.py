@@ -0,0 +1,101 @@
+# transport.py  ─────────────────────────────────────────────────────────────
+# Binary formats for service-to-service traffic. The browser keeps JSON.
+#
+#  · upload:   a single [n_samples, 14] float array as .npy (optionally .npy.gz)
+#  · response: an .npz archive with one array per RunResponseWithId field,
+#              chosen with `Accept: application/x-npz`; add the media-type
+#              parameter `compressed=1` for a deflated archive
+#  · JSON:     NumpyJSONResponse encodes NumPy arrays directly (orjson when it
+#              is installed) instead of validating .tolist() through pydantic
+import gzip
+import io
+import json
+from typing import Any, Dict, Optional
+
+import numpy as np
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional speed-up; json + tolist() is the fallback
+    orjson = None
+
+NPY_MEDIA_TYPE = "application/x-npy"
+NPZ_MEDIA_TYPE = "application/x-npz"
+
+RUN_ARRAYS = [
+    "y_all", "y_winningcomb", "y_nonwinning",
+    "amplitude_all", "amplitude_winning", "amplitude_nonwinning", "amplitude_original",
+]
+
+
+def is_npy_upload(filename: str, content_type: Optional[str]) -> bool:
+    name = (filename or "").lower()
+    return name.endswith((".npy", ".npy.gz")) or content_type == NPY_MEDIA_TYPE
+
+
+def read_npy_upload(raw: bytes) -> np.ndarray:
+    """Parse an uploaded .npy (gzip detected by magic bytes) into [n, 14] float64."""
+    if raw[:2] == b"\x1f\x8b":
+        raw = gzip.decompress(raw)
+    arr = np.load(io.BytesIO(raw), allow_pickle=False)
+    if arr.ndim != 2 or arr.shape[1] != 14:
+        raise ValueError(f"expected a [n_samples, 14] array, got shape {arr.shape}")
+    return np.ascontiguousarray(arr, dtype=np.float64)
+
+
+def negotiate(accept: Optional[str]) -> Optional[bool]:
+    """
+    None when the client wants JSON, otherwise whether the .npz it asked for
+    should be compressed.
+    """
+    for part in (accept or "").split(","):
+        media_type, *params = [p.strip() for p in part.split(";")]
+        if media_type == NPZ_MEDIA_TYPE:
+            return any(p.replace(" ", "") in ("compressed=1", "compressed=true") for p in params)
+    return None
+
+
+def encode_run_npz(
+    arrays: Dict[str, np.ndarray],
+    frequencies: np.ndarray,
+    power: Dict[str, np.ndarray],
+    *,
+    compressed: bool = False,
+    **scalars,
+) -> bytes:
+    """Pack one Kalman run into .npz bytes; Welch power becomes welch_power_<label>."""
+    fields = {name: np.asarray(arrays[name], dtype=np.float64) for name in RUN_ARRAYS}
+    fields["welch_frequencies"] = np.asarray(frequencies, dtype=np.float64)
+    for label, values in power.items():
+        fields[f"welch_power_{label}"] = np.asarray(values, dtype=np.float64)
+    for name, value in scalars.items():
+        if value is not None:
+            fields[name] = np.asarray(value)
+    buf = io.BytesIO()
+    (np.savez_compressed if compressed else np.savez)(buf, **fields)
+    return buf.getvalue()
+
+
+def _json_default(obj: Any):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def dumps_json(content: Any) -> bytes:
+    """Encode trusted content that may contain NumPy arrays and scalars."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY, default=_json_default)
+    return json.dumps(content, default=_json_default, separators=(",", ":")).encode()
+
+
+class NumpyJSONResponse(Response):
+    """JSON response that skips pydantic/jsonable_encoder for internal data."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)